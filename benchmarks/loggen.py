@@ -0,0 +1,112 @@
+import heapq
+import random
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+
+from src.log_parser import MOBILE_POSITION_CODES, STATIONARY_POSITION_CODE
+from utils.log_watcher import LOG_SUFFIX
+
+
+def log_name(stamp: str = "2024_01_01__00_00_00") -> str:
+    return stamp + LOG_SUFFIX
+
+
+def header(mobiles: Iterable[int], anchors: Iterable[int]) -> str:
+    """
+    Dashboard-style header: one [beacon N] section per beacon with its
+    Hedgehog_mode (1 for mobile hedgehogs, 0 for stationary anchors).
+    """
+    lines = ["Marvelmind dashboard log", ""]
+    mobiles = list(mobiles)
+    for bid in sorted(set(mobiles) | set(anchors)):
+        lines.append(f"[beacon {bid}]")
+        lines.append(f"Hedgehog_mode= {1 if bid in mobiles else 0}")
+        lines.append("Radio_frequency= 915")
+    lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def rows(
+    duration: float,
+    mobiles: Iterable[int] = (5, 6, 7, 8),
+    anchors: Iterable[int] = (1, 2, 3, 4),
+    mobile_rate_hz: float = 16.0,
+    anchor_rate_hz: float = 1.0,
+    other_ratio: float = 0.2,
+    start_ms: int = 1_700_000_000_000,
+    seed: int = 1,
+) -> Iterator[str]:
+    """
+    Yield data lines in timestamp order: type 41 position rows (codes 17
+    and 129 for hedgehogs, 18 for anchors) at the given per-beacon rates,
+    interleaved with other_ratio non-position lines.
+    """
+    rng = random.Random(seed)
+    mobiles = list(mobiles)
+    anchors = list(anchors)
+    pos = {bid: [rng.uniform(0, 10), rng.uniform(0, 10), rng.uniform(0, 2)] for bid in mobiles + anchors}
+    velocity = {bid: [rng.uniform(-0.5, 0.5), rng.uniform(-0.5, 0.5)] for bid in mobiles}
+
+    # (next time in ms, beacon id, period in ms)
+    schedule: List[Tuple[float, int, float]] = []
+    for bid in mobiles:
+        period = 1000.0 / mobile_rate_hz
+        schedule.append((rng.uniform(0, period), bid, period))
+    for bid in anchors:
+        period = 1000.0 / anchor_rate_hz
+        schedule.append((rng.uniform(0, period), bid, period))
+    heapq.heapify(schedule)
+
+    end = duration * 1000.0
+    date = "2024_01_01__00_00_00"
+    while schedule and schedule[0][0] < end:
+        t, bid, period = heapq.heappop(schedule)
+        heapq.heappush(schedule, (t + period * rng.uniform(0.9, 1.1), bid, period))
+        ts = start_ms + int(t)
+
+        if rng.random() < other_ratio:
+            yield f"{date},{ts},40,3,{bid},{rng.randint(0, 255)},{rng.randint(0, 255)},0,0\n"
+
+        p = pos[bid]
+        if bid in velocity:
+            v = velocity[bid]
+            dt = period / 1000.0
+            p[0] += v[0] * dt + rng.gauss(0, 0.01)
+            p[1] += v[1] * dt + rng.gauss(0, 0.01)
+            if rng.random() < 0.01:
+                v[0], v[1] = rng.uniform(-0.5, 0.5), rng.uniform(-0.5, 0.5)
+            code = MOBILE_POSITION_CODES[rng.random() < 0.5]
+        else:
+            code = STATIONARY_POSITION_CODE
+        yield f"{date},{ts},41,{code},{bid},{p[0]:.3f},{p[1]:.3f},{p[2]:.3f},0,1\n"
+
+
+def generate_log(
+    path: Path,
+    duration: float,
+    mobiles: Iterable[int] = (5, 6, 7, 8),
+    anchors: Iterable[int] = (1, 2, 3, 4),
+    mobile_rate_hz: float = 16.0,
+    anchor_rate_hz: float = 1.0,
+    other_ratio: float = 0.2,
+    seed: int = 1,
+) -> int:
+    """
+    Write a synthetic Marvelmind log covering `duration` seconds.
+    Returns the number of data lines written.
+    """
+    mobiles = list(mobiles)
+    anchors = list(anchors)
+    count = 0
+    with path.open("w", newline="") as f:
+        f.write(header(mobiles, anchors))
+        batch = []
+        for line in rows(duration, mobiles, anchors, mobile_rate_hz, anchor_rate_hz, other_ratio, seed=seed):
+            batch.append(line)
+            if len(batch) >= 10000:
+                f.write("".join(batch))
+                count += len(batch)
+                batch = []
+        f.write("".join(batch))
+        count += len(batch)
+    return count
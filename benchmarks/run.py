@@ -0,0 +1,395 @@
+import argparse
+import csv
+import json
+import platform
+import selectors
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from utils.logging_setup import setup_logging, get_logger
+
+from benchmarks.loggen import generate_log, header, log_name, rows
+from src.position_tracker import BeaconType, PositionTracker, np
+from utils.async_broadcaster import AsyncPositionBroadcaster
+from utils.broadcaster import PositionBroadcaster
+from utils.csv_writer import PositionCSVWriter
+from utils.sink import PositionSink
+from utils.snapshot import Snapshot
+
+logger = get_logger("benchmarks")
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+MOBILES = (5, 6, 7, 8, 9, 10, 11, 12)
+ANCHORS = (1, 2, 3, 4)
+
+
+class _NullBroadcaster:
+    def __init__(self):
+        self.latest = None
+
+    def update(self, snapshot):
+        self.latest = snapshot
+
+
+def _rate(count: int, seconds: float) -> float:
+    return count / seconds if seconds > 0 else float("inf")
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+
+    def pick(q):
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    return {
+        "count": len(values),
+        "p50_ms": pick(0.50) * 1e3,
+        "p95_ms": pick(0.95) * 1e3,
+        "p99_ms": pick(0.99) * 1e3,
+        "max_ms": values[-1] * 1e3,
+        "mean_ms": statistics.fmean(values) * 1e3,
+    }
+
+
+def _loaded_tracker(logs_dir: Path) -> PositionTracker:
+    tracker = PositionTracker(logs_dir=logs_dir, use_inotify=False)
+    tracker.update()
+    return tracker
+
+
+def bench_ingest(work: Path, duration: float) -> Dict[str, object]:
+    """
+    Rows/sec for reading a whole log (_read_new_data, bulk path when NumPy
+    is available), for tailing it in small appends, and for _process_row.
+    """
+    logs_dir = work / "ingest"
+    logs_dir.mkdir()
+    log = logs_dir / log_name()
+    lines = generate_log(log, duration, MOBILES, ANCHORS)
+    size = log.stat().st_size
+
+    tracker = PositionTracker(logs_dir=logs_dir, use_inotify=False)
+    started = time.perf_counter()
+    tracker.update()
+    full = time.perf_counter() - started
+    tracker.close()
+
+    # Tail: the dashboard appends a few lines at a time
+    tail_dir = work / "tail"
+    tail_dir.mkdir()
+    tail_log = tail_dir / log_name()
+    tail_log.write_text(header(MOBILES, ANCHORS))
+    tracker = PositionTracker(logs_dir=tail_dir, use_inotify=False)
+    tracker.update()
+    data = list(rows(duration, MOBILES, ANCHORS))
+    chunk = 20
+    tail = 0.0
+    with tail_log.open("a") as f:
+        for i in range(0, len(data), chunk):
+            f.write("".join(data[i : i + chunk]))
+            f.flush()
+            started = time.perf_counter()
+            tracker._read_new_data()
+            tail += time.perf_counter() - started
+    tracker.close()
+
+    parsed = list(csv.reader(data))
+    tracker = PositionTracker(logs_dir=tail_dir, use_inotify=False)
+    tracker.beacon_types = {bid: BeaconType.MOBILE for bid in MOBILES}
+    started = time.perf_counter()
+    for row in parsed:
+        tracker._process_row(row)
+    per_row = time.perf_counter() - started
+    tracker.close()
+
+    return {
+        "lines": lines,
+        "bytes": size,
+        "read_new_data_full": {"seconds": full, "rows_per_s": _rate(lines, full), "mb_per_s": size / full / 1e6},
+        "read_new_data_tail": {"chunk_lines": chunk, "seconds": tail, "rows_per_s": _rate(len(data), tail)},
+        "process_row": {"seconds": per_row, "rows_per_s": _rate(len(parsed), per_row)},
+    }
+
+
+def bench_publish(work: Path, iterations: int) -> Dict[str, object]:
+    """
+    Cost of PositionSink.publish() per call, alone and including the JSON
+    and binary encodings the broadcasters would build.
+    """
+    logs_dir = work / "publish"
+    logs_dir.mkdir()
+    generate_log(logs_dir / log_name(), 30.0, MOBILES, ANCHORS)
+    tracker = _loaded_tracker(logs_dir)
+    broadcaster = _NullBroadcaster()
+    sink = PositionSink(broadcaster=broadcaster)
+
+    def run(encode: Callable[[Snapshot], None]) -> float:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            sink._last_version = None  # force a publish every call
+            sink.publish(tracker)
+            encode(broadcaster.latest)
+        return (time.perf_counter() - started) / iterations
+
+    results = {
+        "beacons": len(tracker.beacons),
+        "publish_us": run(lambda s: None) * 1e6,
+        "publish_json_us": run(lambda s: s.json_bytes()) * 1e6,
+        "publish_binary_us": run(lambda s: s.binary_bytes()) * 1e6,
+    }
+    tracker.close()
+    return results
+
+
+def bench_csv(work: Path, snapshots: int) -> Dict[str, object]:
+    """
+    CSV writer throughput inline and with the background writer thread.
+    """
+    logs_dir = work / "csv"
+    logs_dir.mkdir()
+    generate_log(logs_dir / log_name(), 30.0, MOBILES, ANCHORS)
+    tracker = _loaded_tracker(logs_dir)
+    beacons = [(BeaconType.MOBILE, bid, pos) for bid, pos in tracker.get_mobile_positions().items()]
+    beacons += [(BeaconType.STATIONARY, bid, pos) for bid, pos in tracker.get_stationary_map().items()]
+    tracker.close()
+
+    results: Dict[str, object] = {"beacons": len(beacons)}
+    for name, kwargs in (
+        ("inline_always", {}),
+        ("inline_bytes", {"flush_policy": "bytes"}),
+        ("background_time", {"background": True, "flush_policy": "time", "queue_size": snapshots}),
+    ):
+        writer = PositionCSVWriter(work / f"{name}.csv", rate_hz=1e9, **kwargs)
+        started = time.perf_counter()
+        for i in range(snapshots):
+            writer.write_snapshot(1_700_000_000.0 + i, beacons)
+        caller = time.perf_counter() - started
+        writer.close()
+        total = time.perf_counter() - started
+        results[name] = {
+            "caller_us_per_snapshot": caller / snapshots * 1e6,
+            "snapshots_per_s": _rate(snapshots, total),
+            "rows_per_s": _rate(snapshots * len(beacons), total),
+            "dropped": getattr(writer, "dropped", 0),
+        }
+    return results
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _fanout(broadcaster, clients: int, messages: int, beacons) -> Dict[str, object]:
+    socks = [socket.create_connection(("127.0.0.1", broadcaster.port)) for _ in range(clients)]
+    latencies: List[float] = []
+    received = [0]
+    done = threading.Event()
+
+    def receive():
+        sel = selectors.DefaultSelector()
+        buffers = {}
+        for s in socks:
+            s.setblocking(False)
+            sel.register(s, selectors.EVENT_READ)
+            buffers[s] = b""
+        while not done.is_set():
+            for key, _ in sel.select(timeout=0.05):
+                s = key.fileobj
+                try:
+                    data = s.recv(1 << 20)
+                except BlockingIOError:
+                    continue
+                now = time.time()
+                buf = buffers[s] + data
+                *lines, buffers[s] = buf.split(b"\n")
+                for line in lines:
+                    latencies.append(now - json.loads(line)["ts_pub"])
+                    received[0] += 1
+        sel.close()
+
+    thread = threading.Thread(target=receive, daemon=True)
+    thread.start()
+    time.sleep(0.2)
+
+    for _ in range(messages):
+        broadcaster.update(Snapshot(time.time(), beacons))
+        time.sleep(0.01)
+
+    deadline = time.monotonic() + 2.0
+    while received[0] < clients * messages and time.monotonic() < deadline:
+        time.sleep(0.01)
+    done.set()
+    thread.join()
+    for s in socks:
+        s.close()
+
+    result = _percentiles(latencies)
+    result["expected"] = clients * messages
+    return result
+
+
+def bench_fanout(work: Path, client_counts: List[int], messages: int) -> Dict[str, object]:
+    """
+    Latency from update() to receipt across N local clients, for the
+    threaded and the asyncio broadcaster. Includes up to one broadcast
+    period (rate_hz=200) of scheduling delay.
+    """
+    logs_dir = work / "fanout"
+    logs_dir.mkdir()
+    generate_log(logs_dir / log_name(), 30.0, MOBILES, ANCHORS)
+    tracker = _loaded_tracker(logs_dir)
+    beacons = [(BeaconType.MOBILE, bid, pos) for bid, pos in tracker.get_mobile_positions().items()]
+    beacons += [(BeaconType.STATIONARY, bid, pos) for bid, pos in tracker.get_stationary_map().items()]
+    tracker.close()
+
+    results: Dict[str, object] = {}
+    for name, make in (
+        ("threaded", lambda: PositionBroadcaster(host="127.0.0.1", port=_free_port(), rate_hz=200)),
+        ("asyncio", lambda: AsyncPositionBroadcaster(host="127.0.0.1", port=0, rate_hz=200, queue_size=64)),
+    ):
+        per_count = {}
+        for clients in client_counts:
+            broadcaster = make()
+            broadcaster.start()
+            time.sleep(0.1)
+            try:
+                per_count[str(clients)] = _fanout(broadcaster, clients, messages, beacons)
+            finally:
+                broadcaster.stop()
+        results[name] = per_count
+    return results
+
+
+def bench_filters(batches: int, fleet_sizes: List[int]) -> Dict[str, object]:
+    """
+    FilterBank cost per row for each filter, with one row per beacon per
+    batch as when tailing a live log.
+    """
+    if np is None:
+        return {"skipped": "NumPy not available"}
+    from src.filters import FILTERS, FilterBank
+
+    rng = np.random.default_rng(1)
+    results: Dict[str, object] = {}
+    for name, cls in FILTERS.items():
+        per_size = {}
+        for beacons in fleet_sizes:
+            bank = FilterBank(cls())
+            ids = np.arange(beacons)
+            xyz = rng.uniform(0, 10, (batches, beacons, 3))
+            started = time.perf_counter()
+            for k in range(batches):
+                bank.filter(ids, np.full(beacons, k / 16), xyz[k])
+            elapsed = time.perf_counter() - started
+            per_size[str(beacons)] = {"us_per_row": elapsed / (batches * beacons) * 1e6}
+        results[name] = per_size
+    return results
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _flatten(prefix: str, value, out: Dict[str, float]) -> None:
+    if isinstance(value, dict):
+        for k, v in value.items():
+            _flatten(f"{prefix}.{k}" if prefix else k, v, out)
+    elif isinstance(value, (int, float)):
+        out[prefix] = float(value)
+
+
+def compare(previous: dict, current: dict) -> None:
+    """
+    Print every numeric metric next to its value in a previous results file.
+    """
+    old: Dict[str, float] = {}
+    new: Dict[str, float] = {}
+    _flatten("", previous.get("results", {}), old)
+    _flatten("", current.get("results", {}), new)
+    print(f"Compared with {previous.get('revision', '?')} ({previous.get('timestamp', '?')}):")
+    for key in sorted(new):
+        if key in old and old[key]:
+            print(f"  {key:<60} {old[key]:>14.3f} -> {new[key]:>14.3f}  ({new[key] / old[key] - 1:+.1%})")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the tracker, sink, CSV writer, broadcasters and filters.")
+    parser.add_argument("--quick", action="store_true", help="smaller inputs for a fast smoke run")
+    parser.add_argument("--only", default="ingest,publish,csv,fanout,filters", help="comma-separated benchmarks to run")
+    parser.add_argument("--output", type=Path, help="results JSON path (default: benchmarks/results/)")
+    parser.add_argument("--compare", type=Path, help="previous results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    setup_logging(Path("logs"))
+    selected = [name.strip() for name in args.only.split(",") if name.strip()]
+    quick = args.quick
+
+    work = Path(tempfile.mkdtemp(prefix="marvelmind-bench-"))
+    results: Dict[str, object] = {}
+    try:
+        for name in selected:
+            started = time.perf_counter()
+            if name == "ingest":
+                results[name] = bench_ingest(work, 60.0 if quick else 600.0)
+            elif name == "publish":
+                results[name] = bench_publish(work, 1000 if quick else 10000)
+            elif name == "csv":
+                results[name] = bench_csv(work, 2000 if quick else 20000)
+            elif name == "fanout":
+                results[name] = bench_fanout(work, [1, 10] if quick else [1, 10, 50, 100], 50 if quick else 200)
+            elif name == "filters":
+                results[name] = bench_filters(200 if quick else 2000, [8, 64, 512])
+            else:
+                parser.error(f"unknown benchmark {name!r}")
+            print(f"{name}: done in {time.perf_counter() - started:.1f}s")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np is not None,
+        "quick": quick,
+        "results": results,
+    }
+
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        output = RESULTS_DIR / f"bench-{datetime.now():%Y%m%d-%H%M%S}-{report['revision']}.json"
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {output}")
+
+    if args.compare is not None:
+        compare(json.loads(args.compare.read_text()), report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+import io
+import math
+import re
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from src.log_parser import MOBILE_POSITION_CODES, STATIONARY_POSITION_CODE
+
+# Same prefilter as log_parser, but captures the numeric span of the row in one group
+# so the whole chunk can be handed to NumPy's text parser at once. Data code and beacon
+# id must be integers here, as int() requires on the row-by-row path.
+_INT_FIELD = rb"[ \t\r\f\v]*+[+-]?[0-9]++[ \t\r\f\v]*+"
+_POSITION_SPAN = re.compile(
+    rb"\n[^,\n]*+,([^,\n]*+,(?:41|[ \t\r\f\v]*+\+?0*+41[ \t\r\f\v]*+),"
+    + _INT_FIELD
+    + rb","
+    + _INT_FIELD
+    + rb",[^,\n]*+,[^,\n]*+,[^,\n]*+)"
+)
+
+_POSITION_CODES = MOBILE_POSITION_CODES + (STATIONARY_POSITION_CODE,)
+
+
+class PositionArrays(NamedTuple):
+    beacon_id: np.ndarray  # int64
+    data_code: np.ndarray  # int64
+    ts_mm: np.ndarray      # float64 seconds, NaN if missing
+    xyz: np.ndarray        # float64, shape (N, 3)
+
+
+def load_position_arrays(data: bytes) -> Optional[PositionArrays]:
+    """
+    Parse complete log lines into column arrays of accepted position rows.
+
+    Returns None if a prefiltered row does not parse as numbers (e.g. an empty
+    timestamp); callers should fall back to the row-by-row parser for that chunk.
+    """
+    spans = _POSITION_SPAN.findall(b"\n" + data)
+    if not spans:
+        return PositionArrays(
+            np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0), np.empty((0, 3))
+        )
+
+    try:
+        table = np.loadtxt(io.BytesIO(b"\n".join(spans)), delimiter=",", dtype=np.float64, ndmin=2)
+    except ValueError:
+        return None
+
+    # Columns: ts, line type, data code, beacon id, x, y, z
+    codes = table[:, 2]
+    ids = table[:, 3]
+    mask = np.isin(codes, _POSITION_CODES) & (ids == np.floor(ids))
+    table = table[mask]
+
+    return PositionArrays(
+        beacon_id=table[:, 3].astype(np.int64),
+        data_code=table[:, 2].astype(np.int64),
+        ts_mm=table[:, 0] * 1e-3,
+        xyz=table[:, 4:7],
+    )
+
+
+def group_by_beacon(beacon_ids: np.ndarray) -> List[Tuple[int, np.ndarray]]:
+    """
+    Return (beacon_id, row indices) pairs in order of each beacon's first row,
+    with the indices of each group in file order.
+    """
+    if not len(beacon_ids):
+        return []
+
+    order = np.argsort(beacon_ids, kind="stable")
+    sorted_ids = beacon_ids[order]
+    starts = np.flatnonzero(np.diff(sorted_ids)) + 1
+    groups = np.split(order, starts)
+    groups.sort(key=lambda rows: rows[0])
+    return [(int(beacon_ids[rows[0]]), rows) for rows in groups]
+
+
+def ema_filter(
+    raw: np.ndarray,
+    alpha: float,
+    initial: Optional[Tuple[float, float, float]],
+) -> Tuple[np.ndarray, Tuple[float, float, float]]:
+    """
+    Apply PositionTracker's EMA to an (N, 3) array of raw positions.
+
+    The recurrence is evaluated in the same order and precision as the
+    row-by-row path so results are bit-identical.
+    Returns the filtered array and the final EMA state.
+    """
+    rows = raw.tolist()
+    if initial is None:
+        ex, ey, ez = rows[0]
+        out = [(ex, ey, ez)]
+        rows = rows[1:]
+    else:
+        ex, ey, ez = initial
+        out = []
+
+    a = alpha
+    b = 1 - a
+    append = out.append
+    for x, y, z in rows:
+        ex = a * x + b * ex
+        ey = a * y + b * ey
+        ez = a * z + b * ez
+        append((ex, ey, ez))
+
+    return np.array(out, dtype=np.float64).reshape(-1, 3), (ex, ey, ez)
+
+
+def movement_filter(
+    xyz: np.ndarray,
+    min_movement: float,
+    last: Optional[Tuple[float, float, float]],
+) -> np.ndarray:
+    """
+    Return the indices of rows that move at least min_movement away from the
+    previously kept position (or from `last`, the current history tail).
+    """
+    kept = []
+    rows = xyz.tolist()
+    start = 0
+
+    if last is None:
+        kept.append(0)
+        lx, ly, lz = rows[0]
+        start = 1
+    else:
+        lx, ly, lz = last
+
+    sqrt = math.sqrt
+    for i in range(start, len(rows)):
+        x, y, z = rows[i]
+        if sqrt((lx - x) ** 2 + (ly - y) ** 2 + (lz - z) ** 2) >= min_movement:
+            kept.append(i)
+            lx, ly, lz = x, y, z
+
+    return np.array(kept, dtype=np.int64)
@@ -0,0 +1,42 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from utils.logging_setup import get_logger
+logger = get_logger(__name__)
+
+CHECKPOINT_VERSION = 1
+
+
+def save_checkpoint(path: Path, state: Dict[str, Any]) -> None:
+    """
+    Atomically write a tracker checkpoint as compact JSON.
+    """
+    tmp = path.with_name(path.name + ".tmp")
+    payload = dict(state, version=CHECKPOINT_VERSION)
+
+    with tmp.open("w") as f:
+        json.dump(payload, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path: Path) -> Optional[Dict[str, Any]]:
+    """
+    Load a tracker checkpoint, or None if it is missing, unreadable or from
+    an incompatible version.
+    """
+    try:
+        with path.open("r") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable checkpoint %s: %s", path, e)
+        return None
+
+    if state.get("version") != CHECKPOINT_VERSION:
+        logger.warning("Ignoring checkpoint %s with version %s", path, state.get("version"))
+        return None
+
+    return state
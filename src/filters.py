@@ -0,0 +1,384 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utils.logging_setup import get_logger
+logger = get_logger(__name__)
+
+
+class FilterState:
+    """
+    Filter state of every beacon in a FilterBank, one row per slot.
+
+    pos / vel are (capacity, 3); p00, p01, p11 hold each axis's 2x2
+    position/velocity covariance for the Kalman filter; ts is the
+    Marvelmind time of the last sample (NaN if unknown).
+    """
+
+    FIELDS = ("pos", "vel", "p00", "p01", "p11")
+
+    def __init__(self, capacity: int = 16):
+        self.pos = np.zeros((capacity, 3))
+        self.vel = np.zeros((capacity, 3))
+        self.p00 = np.zeros((capacity, 3))
+        self.p01 = np.zeros((capacity, 3))
+        self.p11 = np.zeros((capacity, 3))
+        self.ts = np.full(capacity, np.nan)
+        self.initialized = np.zeros(capacity, dtype=bool)
+
+    @property
+    def capacity(self) -> int:
+        return len(self.ts)
+
+    def grow(self, capacity: int) -> None:
+        old = self.capacity
+        for name in self.FIELDS:
+            grown = np.zeros((capacity, 3))
+            grown[:old] = getattr(self, name)
+            setattr(self, name, grown)
+        ts = np.full(capacity, np.nan)
+        ts[:old] = self.ts
+        self.ts = ts
+        initialized = np.zeros(capacity, dtype=bool)
+        initialized[:old] = self.initialized
+        self.initialized = initialized
+
+
+class BeaconFilter:
+    """
+    A smoothing filter applied by FilterBank to many beacons at once.
+
+    Both methods get the slots of distinct beacons, their measurements z
+    (m, 3) and, for step(), the time since each beacon's previous sample
+    dt (m,), which may be 0. They update `state` in place and return the
+    filtered positions (m, 3).
+    """
+
+    name = "filter"
+
+    def init(self, state: FilterState, slots: np.ndarray, z: np.ndarray) -> np.ndarray:
+        state.pos[slots] = z
+        state.vel[slots] = 0.0
+        return z
+
+    def step(self, state: FilterState, slots: np.ndarray, z: np.ndarray, dt: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+
+class EmaFilter(BeaconFilter):
+    """
+    Exponential moving average, the same recurrence (and results) as
+    PositionTracker's built-in EMA.
+    """
+
+    name = "ema"
+
+    def __init__(self, alpha: float = 0.3):
+        if not 0.0 < alpha <= 1.0:
+            raise ValueError(f"alpha must be in (0, 1], got {alpha}")
+        self.alpha = alpha
+
+    def step(self, state, slots, z, dt):
+        a = self.alpha
+        pos = a * z + (1 - a) * state.pos[slots]
+        state.pos[slots] = pos
+        return pos
+
+
+class AlphaBetaFilter(BeaconFilter):
+    """
+    Alpha-beta (g-h) filter: constant-velocity prediction over dt, then
+    fixed-gain corrections of position (alpha) and velocity (beta).
+    """
+
+    name = "alpha_beta"
+
+    def __init__(self, alpha: float = 0.5, beta: float = 0.1):
+        if not 0.0 < alpha <= 1.0:
+            raise ValueError(f"alpha must be in (0, 1], got {alpha}")
+        if not 0.0 <= beta < 2.0:
+            raise ValueError(f"beta must be in [0, 2), got {beta}")
+        self.alpha = alpha
+        self.beta = beta
+
+    def step(self, state, slots, z, dt):
+        dt = dt[:, None]
+        vel = state.vel[slots]
+        predicted = state.pos[slots] + vel * dt
+        residual = z - predicted
+
+        pos = predicted + self.alpha * residual
+        # No velocity correction for samples with the same timestamp
+        moving = dt > 0
+        vel = vel + np.divide(self.beta * residual, dt, out=np.zeros_like(residual), where=moving)
+
+        state.pos[slots] = pos
+        state.vel[slots] = vel
+        return pos
+
+
+class KalmanFilter(BeaconFilter):
+    """
+    Constant-velocity Kalman filter, each axis independent.
+
+    process_noise is the spectral density of the unmodelled acceleration
+    (m^2/s^3), measurement_noise the variance of a position fix (m^2) and
+    initial_velocity_var the velocity variance of a new track ((m/s)^2).
+    """
+
+    name = "kalman"
+
+    def __init__(
+        self,
+        process_noise: float = 1.0,
+        measurement_noise: float = 0.02 ** 2,
+        initial_velocity_var: float = 1.0,
+    ):
+        if process_noise < 0 or measurement_noise <= 0 or initial_velocity_var < 0:
+            raise ValueError("Kalman noise parameters must be positive")
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.initial_velocity_var = initial_velocity_var
+
+    def init(self, state, slots, z):
+        state.pos[slots] = z
+        state.vel[slots] = 0.0
+        state.p00[slots] = self.measurement_noise
+        state.p01[slots] = 0.0
+        state.p11[slots] = self.initial_velocity_var
+        return z
+
+    def step(self, state, slots, z, dt):
+        q = self.process_noise
+        dt = dt[:, None]
+        dt2 = dt * dt
+
+        # Predict: x = F x, P = F P F' + Q
+        vel = state.vel[slots]
+        pos = state.pos[slots] + vel * dt
+        p00 = state.p00[slots]
+        p01 = state.p01[slots]
+        p11 = state.p11[slots]
+        p00 = p00 + 2 * dt * p01 + dt2 * p11 + q * dt2 * dt / 3
+        p01 = p01 + dt * p11 + q * dt2 / 2
+        p11 = p11 + q * dt
+
+        # Update with the position fix
+        s = p00 + self.measurement_noise
+        k0 = p00 / s
+        k1 = p01 / s
+        residual = z - pos
+        pos = pos + k0 * residual
+        vel = vel + k1 * residual
+        p11 = p11 - k1 * p01
+        p00 = (1 - k0) * p00
+        p01 = (1 - k0) * p01
+
+        state.pos[slots] = pos
+        state.vel[slots] = vel
+        state.p00[slots] = p00
+        state.p01[slots] = p01
+        state.p11[slots] = p11
+        return pos
+
+
+FILTERS = {cls.name: cls for cls in (EmaFilter, AlphaBetaFilter, KalmanFilter)}
+
+
+def make_filter(name: str, **params) -> BeaconFilter:
+    try:
+        cls = FILTERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown filter {name!r}, expected one of {sorted(FILTERS)}") from None
+    return cls(**params)
+
+
+class FilterBank:
+    """
+    Smooths the positions of many beacons with per-beacon filters, keeping
+    all state in NumPy arrays.
+
+    filter() takes a batch of rows in file order. Rows of one beacon are
+    sequential, so the batch is processed in rounds: round k holds the
+    k-th row of every beacon in the batch, and each filter handles all its
+    beacons of a round in one vectorized step. The number of Python-level
+    steps grows with rows per beacon, not with the number of beacons.
+
+    dt comes from ts_mm deltas; rows without a Marvelmind timestamp use
+    default_dt. A beacon silent for more than reset_gap seconds, or going
+    back in time by more than that, starts a new track (reset_gap=None
+    never restarts one).
+    """
+
+    def __init__(
+        self,
+        default: Optional[BeaconFilter] = None,
+        per_beacon: Optional[Dict[int, BeaconFilter]] = None,
+        default_dt: float = 1.0 / 16,
+        reset_gap: Optional[float] = 2.0,
+    ):
+        self.default = default if default is not None else EmaFilter()
+        self.default_dt = default_dt
+        self.reset_gap = reset_gap
+
+        self.state = FilterState()
+        self._slots: Dict[int, int] = {}
+        self._filters: List[BeaconFilter] = [self.default]
+        self._kind = np.zeros(self.state.capacity, dtype=np.int64)
+        self._overrides: Dict[int, BeaconFilter] = dict(per_beacon or {})
+
+    def filter_for(self, beacon_id: int) -> BeaconFilter:
+        return self._overrides.get(beacon_id, self.default)
+
+    def set_filter(self, beacon_id: int, beacon_filter: BeaconFilter) -> None:
+        """
+        Switch a beacon to another filter; its track restarts.
+        """
+        self._overrides[beacon_id] = beacon_filter
+        slot = self._slots.get(beacon_id)
+        if slot is not None:
+            self._kind[slot] = self._filter_index(beacon_filter)
+            self.state.initialized[slot] = False
+
+    def reset(self, beacon_id: int) -> None:
+        slot = self._slots.get(beacon_id)
+        if slot is not None:
+            self.state.initialized[slot] = False
+
+    def clear(self) -> None:
+        self.state.initialized[:] = False
+        self.state.ts[:] = np.nan
+
+    def filter(self, beacon_ids: np.ndarray, ts_mm: np.ndarray, xyz: np.ndarray) -> np.ndarray:
+        """
+        Filter a batch of rows (beacon ids, ts_mm seconds with NaN for
+        missing, (N, 3) raw positions) and return the (N, 3) filtered
+        positions.
+        """
+        n = len(beacon_ids)
+        out = np.empty((n, 3))
+        if not n:
+            return out
+
+        slots = self._slots_for(beacon_ids)
+        if n == 1 or len(np.unique(slots)) == n:
+            # One row per beacon, the usual case when tailing a live log
+            return self._round(slots, ts_mm, xyz)
+
+        # Rank of each row among its beacon's rows, then rows grouped by rank
+        order = np.argsort(slots, kind="stable")
+        sorted_slots = slots[order]
+        first = np.empty(n, dtype=bool)
+        first[0] = True
+        np.not_equal(sorted_slots[1:], sorted_slots[:-1], out=first[1:])
+        group_start = np.maximum.accumulate(np.where(first, np.arange(n), 0))
+        rank = np.empty(n, dtype=np.int64)
+        rank[order] = np.arange(n) - group_start
+
+        by_rank = np.argsort(rank, kind="stable")
+        bounds = np.cumsum(np.bincount(rank))
+        start = 0
+        for end in bounds.tolist():
+            rows = by_rank[start:end]
+            start = end
+            out[rows] = self._round(slots[rows], ts_mm[rows], xyz[rows])
+        return out
+
+    def export(self, beacon_id: int) -> Optional[list]:
+        """
+        A beacon's state as a JSON-friendly list (for checkpoints), or None.
+        """
+        slot = self._slots.get(beacon_id)
+        state = self.state
+        if slot is None or not state.initialized[slot]:
+            return None
+        values = []
+        for name in FilterState.FIELDS:
+            values.extend(getattr(state, name)[slot].tolist())
+        ts = float(state.ts[slot])
+        values.append(None if np.isnan(ts) else ts)
+        return values
+
+    def restore(self, beacon_id: int, values: list) -> None:
+        """
+        Restore a beacon's state from export().
+        """
+        slot = self._slots_for(np.array([beacon_id]))[0]
+        state = self.state
+        for i, name in enumerate(FilterState.FIELDS):
+            getattr(state, name)[slot] = values[3 * i : 3 * i + 3]
+        state.ts[slot] = np.nan if values[-1] is None else values[-1]
+        state.initialized[slot] = True
+
+    def _filter_index(self, beacon_filter: BeaconFilter) -> int:
+        for i, f in enumerate(self._filters):
+            if f is beacon_filter:
+                return i
+        self._filters.append(beacon_filter)
+        return len(self._filters) - 1
+
+    def _slots_for(self, beacon_ids: np.ndarray) -> np.ndarray:
+        if len(beacon_ids) == 1:
+            bid = int(beacon_ids[0])
+            slot = self._slots.get(bid)
+            return np.array([self._add(bid) if slot is None else slot])
+        unique, inverse = np.unique(beacon_ids, return_inverse=True)
+        unique_slots = np.empty(len(unique), dtype=np.int64)
+        for i, bid in enumerate(unique.tolist()):
+            slot = self._slots.get(bid)
+            if slot is None:
+                slot = self._add(bid)
+            unique_slots[i] = slot
+        return unique_slots[inverse.reshape(-1)]
+
+    def _add(self, beacon_id: int) -> int:
+        slot = len(self._slots)
+        if slot == self.state.capacity:
+            self.state.grow(slot * 2)
+            kind = np.zeros(slot * 2, dtype=np.int64)
+            kind[:slot] = self._kind
+            self._kind = kind
+        self._slots[beacon_id] = slot
+        self._kind[slot] = self._filter_index(self.filter_for(beacon_id))
+        return slot
+
+    def _round(self, slots: np.ndarray, ts: np.ndarray, z: np.ndarray) -> np.ndarray:
+        """
+        One sample for each of `slots` (distinct beacons).
+        """
+        state = self.state
+        out = np.empty_like(z)
+
+        dt = ts - state.ts[slots]
+        dt[np.isnan(dt)] = self.default_dt
+        start = ~state.initialized[slots]
+        if self.reset_gap is not None:
+            start |= np.abs(dt) > self.reset_gap
+        np.maximum(dt, 0.0, out=dt)
+
+        known = ~np.isnan(ts)
+        state.ts[slots[known]] = ts[known]
+        state.initialized[slots] = True
+
+        if len(self._filters) == 1:
+            self._apply(self.default, slots, z, dt, start, out)
+            return out
+
+        kinds = self._kind[slots]
+        for index in np.unique(kinds).tolist():
+            mask = kinds == index
+            rows = np.flatnonzero(mask)
+            self._apply(self._filters[index], slots[rows], z[rows], dt[rows], start[rows], out, rows)
+        return out
+
+    def _apply(self, beacon_filter, slots, z, dt, start, out, rows=None) -> None:
+        if rows is None:
+            rows = np.arange(len(slots))
+        if start.all():
+            out[rows] = beacon_filter.init(self.state, slots, z)
+        elif not start.any():
+            out[rows] = beacon_filter.step(self.state, slots, z, dt)
+        else:
+            cont = ~start
+            out[rows[start]] = beacon_filter.init(self.state, slots[start], z[start])
+            out[rows[cont]] = beacon_filter.step(self.state, slots[cont], z[cont], dt[cont])
@@ -0,0 +1,120 @@
+import re
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from utils.logging_setup import get_logger
+logger = get_logger(__name__)
+
+POSITION_LINE_TYPE = 41
+MOBILE_POSITION_CODES = (17, 129)
+STATIONARY_POSITION_CODE = 18
+
+# (beacon_id, data_code, ts_mm, x, y, z)
+PositionRecord = Tuple[int, int, Optional[float], float, float, float]
+
+# Matches only line type 41 rows with at least 8 fields, capturing columns 1 and 3-7.
+# Non-41 lines are rejected inside the regex engine and never reach Python.
+# The line type may be padded with whitespace and carry a "+" or leading zeros, as int() allows.
+# The leading newline gives the engine a literal to scan for; one is prepended to each chunk.
+_POSITION_LINE = re.compile(
+    rb"\n[^,\n]*+,([^,\n]*+),(?:41,|[ \t\r\f\v]*+\+?0*+41[ \t\r\f\v]*+,)"
+    rb"([^,\n]*+),([^,\n]*+),([^,\n]*+),([^,\n]*+),([^,\n]*+)"
+)
+
+_DATA_CODES = {b"17": 17, b"18": 18, b"129": 129}
+
+
+def parse_position_records(data: bytes) -> List[PositionRecord]:
+    """
+    Parse complete log lines from raw bytes into pre-typed position records.
+
+    Accepts the same rows as the csv.reader path in PositionTracker._process_row
+    for the unquoted logs the dashboard writes: line type 41, data codes
+    17/18/129, an integer beacon id and float coordinates. ts_mm is None if
+    column 1 is not a number. The one difference is in the line type field:
+    padding other than ASCII whitespace and "_" digit separators, which
+    int() would accept, are rejected.
+    """
+    records: List[PositionRecord] = []
+    append = records.append
+    data_codes = _DATA_CODES
+
+    for ts, code, bid, x, y, z in _POSITION_LINE.findall(b"\n" + data):
+        data_code = data_codes.get(code)
+        if data_code is None:
+            try:
+                data_code = int(code)
+            except ValueError:
+                continue
+            if data_code not in (17, 18, 129):
+                continue
+
+        try:
+            beacon_id = int(bid)
+        except ValueError:
+            continue
+
+        try:
+            fx = float(x)
+            fy = float(y)
+            fz = float(z)
+        except ValueError:
+            continue
+
+        try:
+            ts_mm: Optional[float] = float(ts) * 1e-3
+        except ValueError:
+            logger.debug("Failed to parse Marvelmind timestamp %r for beacon %d", ts, beacon_id)
+            ts_mm = None
+
+        append((beacon_id, data_code, ts_mm, fx, fy, fz))
+
+    return records
+
+
+def last_line_end(f: BinaryIO, start: int, end: int, block_size: int = 64 * 1024) -> int:
+    """
+    Return the offset just past the last newline in [start, end), or start if none.
+    """
+    pos = end
+    while pos > start:
+        read_from = max(start, pos - block_size)
+        f.seek(read_from)
+        block = f.read(pos - read_from)
+        cut = block.rfind(b"\n")
+        if cut >= 0:
+            return read_from + cut + 1
+        pos = read_from
+    return start
+
+
+def iter_reverse_chunks(
+    f: BinaryIO,
+    start: int,
+    end: int,
+    block_size: int = 64 * 1024,
+) -> Iterator[bytes]:
+    """
+    Yield chunks of complete lines from [start, end), last lines first.
+    `end` must sit on a line boundary; lines within each chunk keep file order.
+    """
+    pos = end
+    carry = b""
+    while pos > start:
+        read_from = max(start, pos - block_size)
+        f.seek(read_from)
+        block = f.read(pos - read_from) + carry
+        pos = read_from
+
+        if pos > start:
+            # The first line may be cut by the block boundary; finish it with the next block
+            cut = block.find(b"\n") + 1
+            if cut == 0:
+                carry = block
+                continue
+            carry = block[:cut]
+            block = block[cut:]
+        else:
+            carry = b""
+
+        if block:
+            yield block
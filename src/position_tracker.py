@@ -1,16 +1,48 @@
+import asyncio
+import os
+import struct
 import time
-import csv
 import math
-from collections import deque
+from array import array
+from itertools import chain
 from dataclasses import dataclass, field
 from enum import Enum
 from pathlib import Path
-from typing import Dict, Optional
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from utils.logging_setup import get_logger
 logger = get_logger(__name__)
 
 from utils.log_watcher import LogTracker
+from utils.file_tail import FileTailer
+from utils.latency import STAGE_MM_TO_READ, STAGE_WRITE_TO_READ
+
+from src.checkpoint import load_checkpoint, save_checkpoint
+from src.subscriptions import AsyncSubscription, BeaconUpdate, Subscription
+from src.log_parser import (
+    PositionRecord,
+    STATIONARY_POSITION_CODE,
+    iter_reverse_chunks,
+    last_line_end,
+    parse_position_records,
+)
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; large backlogs then use the row-by-row path
+    np = None
+
+if np is not None:
+    from src import bulk_ingest
+else:
+    bulk_ingest = None
+
+if TYPE_CHECKING:
+    from src.filters import FilterBank
+    from utils.latency import LatencyTracker
+
+
+HISTORY_LEN = 50
 
 
 class BeaconType(Enum):
@@ -19,7 +51,7 @@ class BeaconType(Enum):
     UNKNOWN = "unknown"
 
 
-@dataclass
+@dataclass(slots=True)
 class PositionSample:
     ts_mm: Optional[float]  # Marvelmind timestamp (seconds) if available
     ts_read: float          # when parsed by this process (monotonic seconds)
@@ -33,12 +65,116 @@ class PositionSample:
         return self.ts_read
 
 
+_ROW = struct.Struct("5d")
+_TS = struct.Struct("2d")
+_XYZ = struct.Struct("3d")
+
+_NAN = float("nan")
+
+
+class SampleRing:
+    """
+    Fixed-capacity sample history backed by a preallocated array of doubles.
+
+    Each sample is a row of (ts_mm, ts_read, x, y, z), with ts_mm NaN when
+    unknown. Rows are written twice, `capacity` rows apart, so the most recent
+    samples always form one contiguous slice that array() can expose without
+    copying. Indexing and iteration build PositionSample objects on demand.
+    """
+
+    __slots__ = ("capacity", "_buf", "_head", "_len")
+
+    COLUMNS = ("ts_mm", "ts_read", "x", "y", "z")
+
+    def __init__(self, capacity: int = HISTORY_LEN):
+        self.capacity = capacity
+        self._buf = array("d", bytes(_ROW.size * 2 * capacity))
+        self._head = 0
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, index: int) -> PositionSample:
+        n = self._len
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("SampleRing index out of range")
+
+        ts_mm, ts_read, x, y, z = _ROW.unpack_from(self._buf, self._offset(n - index))
+        return PositionSample(
+            ts_mm=None if ts_mm != ts_mm else ts_mm,
+            ts_read=ts_read,
+            x=x,
+            y=y,
+            z=z,
+        )
+
+    def __iter__(self) -> Iterator[PositionSample]:
+        for i in range(self._len):
+            yield self[i]
+
+    def push(self, ts_mm: Optional[float], ts_read: float, x: float, y: float, z: float) -> None:
+        if ts_mm is None:
+            ts_mm = _NAN
+
+        buf = self._buf
+        head = self._head
+        _ROW.pack_into(buf, head * _ROW.size, ts_mm, ts_read, x, y, z)
+        _ROW.pack_into(buf, (head + self.capacity) * _ROW.size, ts_mm, ts_read, x, y, z)
+
+        self._head = head + 1 if head + 1 < self.capacity else 0
+        if self._len < self.capacity:
+            self._len += 1
+
+    def append(self, sample: PositionSample) -> None:
+        self.push(sample.ts_mm, sample.ts_read, sample.x, sample.y, sample.z)
+
+    def touch(self, ts_mm: Optional[float], ts_read: float) -> None:
+        """
+        Refresh the timestamps of the latest sample in place.
+        """
+        if ts_mm is None:
+            ts_mm = _NAN
+
+        head = self._head - 1 if self._head else self.capacity - 1
+        _TS.pack_into(self._buf, head * _ROW.size, ts_mm, ts_read)
+        _TS.pack_into(self._buf, (head + self.capacity) * _ROW.size, ts_mm, ts_read)
+
+    def last_position(self) -> Tuple[float, float, float]:
+        return _XYZ.unpack_from(self._buf, self._offset(1) + 16)
+
+    def clear(self) -> None:
+        self._head = 0
+        self._len = 0
+
+    def array(self) -> "np.ndarray":
+        """
+        Return the history as an (N, 5) float64 array in COLUMNS order, oldest first.
+
+        This is a view into the ring, not a copy: it reflects later writes and
+        is only stable until the next push. Copy it to keep a snapshot.
+        """
+        if np is None:
+            raise RuntimeError("SampleRing.array() requires NumPy")
+
+        rows = np.frombuffer(self._buf, dtype=np.float64).reshape(-1, 5)
+        end = self._head + self.capacity
+        return rows[end - self._len:end]
+
+    def _offset(self, back: int) -> int:
+        # Byte offset of the row `back` samples before the head, in the upper copy
+        return (self._head + self.capacity - back) * _ROW.size
+
+
 @dataclass
 class BeaconState:
     beacon_id: int
     beacon_type: BeaconType
-    history: deque = field(default_factory=lambda: deque(maxlen=50))
+    history: SampleRing = field(default_factory=SampleRing)
     last_seen: float = 0.0
+    version: int = 0
     ema_x: Optional[float] = None
     ema_y: Optional[float] = None
     ema_z: Optional[float] = None
@@ -48,70 +184,263 @@ class PositionTrackerException(Exception):
     pass
 
 
+def _optional_ts(ts_mm: float) -> Optional[float]:
+    return None if math.isnan(ts_mm) else float(ts_mm)
+
+
 class PositionTracker:
     MIN_MOBILE_MOVEMENT = 0.01
     EMA_ALPHA = 0.3
 
+    # Chunks at least this large (backlog catch-up, log switches, restarts) use bulk ingest
+    BULK_INGEST_BYTES = 256 * 1024
+
+    # Fast start scans backwards in blocks until each known beacon has enough rows
+    FAST_START_BLOCK = 64 * 1024
+    FAST_START_MAX_BYTES = 16 * 1024 * 1024
+
+    CHECKPOINT_INTERVAL = 5.0
+
     WARN_INTERVAL = 5.0
     RESTART_TIMEOUT = 60.0
     EXCEPTION_TIMEOUT = 120.0
 
-    def __init__(self, use_ema: bool = True):
+    def __init__(
+        self,
+        use_ema: bool = True,
+        use_inotify: bool = True,
+        fast_start: bool = False,
+        checkpoint_path: Optional[Path] = None,
+        logs_dir: Optional[Path] = None,
+        clock: Callable[[], float] = time.monotonic,
+        filters: Optional["FilterBank"] = None,
+        latency: Optional["LatencyTracker"] = None,
+    ):
+        # All timeouts and ts_read values come from this clock; replay injects its own
+        self._clock = clock
         self.use_ema = use_ema
-
-        self.log_tracker = LogTracker()
+        # A FilterBank replaces the built-in EMA for mobile beacons (use_ema is then ignored)
+        self.filters = filters
+        # Records how long rows sat in the log before being read, if set
+        self.latency = latency
+        self.use_inotify = use_inotify
+        self.fast_start = fast_start
+
+        self.checkpoint_path = checkpoint_path
+        self._checkpoint: Optional[dict] = None
+        self._last_checkpoint_time = 0.0
+
+        self.log_tracker = LogTracker(logs_dir, use_inotify=use_inotify)
+        self.log_tracker.add_listener(self._switch_log)
         self.current_log: Optional[Path] = None
         self.file_offset = 0
+        self._tailer: Optional[FileTailer] = None
+        # Set until a read reaches the end of the log from where the tailer was (re)positioned
+        self._catching_up = True
 
         self.beacons: Dict[int, BeaconState] = {}
         self.beacon_types: Dict[int, BeaconType] = {}
 
-        self.last_data_time = time.monotonic()
+        # Global change counter; each beacon records the value of its last change.
+        # reset_version is the version at which all beacons were last dropped.
+        self.version = 0
+        self.reset_version = 0
+        self._by_type: Dict[BeaconType, Dict[int, BeaconState]] = {t: {} for t in BeaconType}
+        self._position_cache: Dict[BeaconType, Tuple[int, Dict[int, PositionSample]]] = {}
+
+        self._subscriptions: List[Subscription] = []
+        self._pending_updates: List[BeaconUpdate] = []
+
+        self.last_data_time = self._clock()
         self.last_warn_time = 0.0
 
     def update(self) -> None:
         self._check_log_switch()
         self._read_new_data()
         self._check_timeouts()
+        self._maybe_checkpoint()
+        self._dispatch_updates()
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Block until the current log may have grown or the timeout expires.
+        Lets callers replace a fixed sleep between update() calls.
+        """
+        if self._tailer is None:
+            time.sleep(timeout)
+            return False
+        return self._tailer.wait(timeout)
+
+    def close(self) -> None:
+        if self.checkpoint_path is not None and self.current_log is not None:
+            self._save_checkpoint()
+        if self._tailer is not None:
+            self._tailer.close()
+            self._tailer = None
+        self.log_tracker.close()
+
+    def now(self) -> float:
+        """
+        Current time on the clock ts_read values are taken from.
+        """
+        return self._clock()
 
     def get_mobile_positions(self) -> Dict[int, PositionSample]:
-        return {
-            bid: b.history[-1]
-            for bid, b in self.beacons.items()
-            if b.beacon_type == BeaconType.MOBILE and b.history
-        }
+        return self._latest_positions(BeaconType.MOBILE)
 
     def get_stationary_map(self) -> Dict[int, PositionSample]:
-        return {
-            bid: b.history[-1]
-            for bid, b in self.beacons.items()
-            if b.beacon_type == BeaconType.STATIONARY and b.history
-        }
+        return self._latest_positions(BeaconType.STATIONARY)
+
+    def subscribe(
+        self,
+        callback: Callable[[BeaconUpdate], None],
+        beacon_ids: Optional[Iterable[int]] = None,
+        beacon_types: Optional[Iterable[BeaconType]] = None,
+        coalesce: bool = False,
+    ) -> Subscription:
+        """
+        Call `callback(update)` for every beacon update ingested by update().
+        See Subscription for filtering and coalescing.
+        """
+        return self._add_subscription(Subscription(callback, beacon_ids, beacon_types, coalesce))
+
+    def stream(
+        self,
+        beacon_ids: Optional[Iterable[int]] = None,
+        beacon_types: Optional[Iterable[BeaconType]] = None,
+        coalesce: bool = True,
+        maxsize: int = 1024,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+    ) -> AsyncSubscription:
+        """
+        Return an async iterator of beacon updates bound to `loop` (by default
+        the running loop). update() may run in another thread.
+        """
+        if loop is None:
+            loop = asyncio.get_running_loop()
+        return self._add_subscription(AsyncSubscription(loop, beacon_ids, beacon_types, coalesce, maxsize))
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        try:
+            self._subscriptions.remove(subscription)
+        except ValueError:
+            pass
+
+    def changed_since(self, version: int) -> Dict[int, BeaconState]:
+        """
+        Return the beacons that changed after `version` (a previous value of
+        self.version). If version < reset_version, beacons may also have been
+        removed since, and callers should rebuild their view from scratch.
+        """
+        if version >= self.version:
+            return {}
+        return {bid: b for bid, b in self.beacons.items() if b.version > version}
+
+    def get_trail(self, beacon_id: int) -> Optional["np.ndarray"]:
+        """
+        Return a beacon's history as an (N, 5) array view, columns as in
+        SampleRing.COLUMNS, or None if the beacon is unknown.
+        """
+        beacon = self.beacons.get(beacon_id)
+        return None if beacon is None else beacon.history.array()
+
+    def _latest_positions(self, beacon_type: BeaconType) -> Dict[int, PositionSample]:
+        cached_version, positions = self._position_cache.get(beacon_type, (-1, {}))
+
+        if cached_version != self.version:
+            if cached_version < self.reset_version:
+                positions = {}
+            # Only beacons that changed since the last call are re-read from their rings
+            for bid, b in self._by_type[beacon_type].items():
+                if b.version > cached_version and b.history:
+                    positions[bid] = b.history[-1]
+            self._position_cache[beacon_type] = (self.version, positions)
+
+        return dict(positions)
+
+    def _add_subscription(self, subscription: Subscription) -> Subscription:
+        subscription._unsubscribe = self.unsubscribe
+        self._subscriptions.append(subscription)
+        return subscription
+
+    def _queue_update(self, beacon: BeaconState) -> None:
+        self._pending_updates.append(
+            BeaconUpdate(beacon.beacon_id, beacon.beacon_type, beacon.history[-1], beacon.version)
+        )
+
+    def _dispatch_updates(self) -> None:
+        if not self._pending_updates:
+            return
+
+        updates = self._pending_updates
+        self._pending_updates = []
+        for subscription in tuple(self._subscriptions):
+            subscription.deliver(updates)
+
+    def _add_beacon(self, beacon: BeaconState) -> BeaconState:
+        self.beacons[beacon.beacon_id] = beacon
+        self._by_type[beacon.beacon_type][beacon.beacon_id] = beacon
+        return beacon
+
+    def _clear_beacons(self) -> None:
+        self.beacons.clear()
+        for index in self._by_type.values():
+            index.clear()
+        if self.filters is not None:
+            self.filters.clear()
+        self.version += 1
+        self.reset_version = self.version
+
+    def _touch_beacon(self, beacon: BeaconState) -> None:
+        self.version += 1
+        beacon.version = self.version
 
     def _check_log_switch(self) -> None:
-        new_log = self.log_tracker.update()
-        if new_log and new_log != self.current_log:
+        # Cheap unless the logs directory changed; new logs arrive via _switch_log
+        self.log_tracker.update()
+
+    def _switch_log(self, new_log: Path) -> None:
+        if new_log != self.current_log:
             print(f"[INFO] Switching to new log: {new_log.name}")
             logger.info("Switching to new Marvelmind log: %s", new_log.name)
             self.current_log = new_log
             self.file_offset = 0
-            self.beacons.clear()
-            self.beacon_types = self._parse_beacon_types(new_log)
-            self.last_data_time = time.monotonic()
+            self._clear_beacons()
+            self.beacon_types, data_start = self._parse_header(new_log)
+            if not self._restore_checkpoint(new_log) and self.fast_start:
+                self._fast_start(new_log, data_start)
+            self._open_tailer(new_log)
+            self.last_data_time = self._clock()
+
+    def _open_tailer(self, log_path: Path) -> None:
+        if self._tailer is not None:
+            self._tailer.close()
+        self._tailer = FileTailer(log_path, self.file_offset, use_inotify=self.use_inotify)
+        self._catching_up = True
 
     def _parse_beacon_types(self, log_path: Path) -> Dict[int, BeaconType]:
+        return self._parse_header(log_path)[0]
+
+    def _parse_header(self, log_path: Path) -> Tuple[Dict[int, BeaconType], int]:
+        """
+        Parse beacon types from the log header.
+        Also returns the byte offset where the CSV numeric section begins.
+        """
         beacon_types: Dict[int, BeaconType] = {}
         current_beacon_id: Optional[int] = None
+        data_start = 0
 
-        with log_path.open("r", encoding="latin-1", errors="ignore") as f:
-            for line in f:
-                line = line.strip()
+        with log_path.open("rb") as f:
+            for raw in f:
+                line = raw.decode("latin-1").strip()
                 if not line:
+                    data_start += len(raw)
                     continue
 
                 # Stop once the CSV numeric section begins
                 if line[0].isdigit():
                     break
+                data_start += len(raw)
 
                 if line.startswith("[beacon"):
                     try:
@@ -127,25 +456,99 @@ class PositionTracker:
                     )
                     current_beacon_id = None
 
-        return beacon_types
+        return beacon_types, data_start
+
+    def _fast_start(self, log_path: Path, data_start: int) -> None:
+        """
+        Recover recent positions by scanning backwards from the end of the log
+        until every known beacon has enough rows, instead of replaying it all.
+        The tailer then continues forward from the end.
+        """
+        started = time.perf_counter()
+        wanted = {
+            bid: HISTORY_LEN if btype == BeaconType.MOBILE else 1
+            for bid, btype in self.beacon_types.items()
+        }
+        counts: Dict[int, int] = {}
+        chunks: List[List[PositionRecord]] = []
+        scanned = 0
+
+        with log_path.open("rb") as f:
+            end = last_line_end(f, data_start, f.seek(0, os.SEEK_END))
+            for chunk in iter_reverse_chunks(f, data_start, end, self.FAST_START_BLOCK):
+                records = parse_position_records(chunk)
+                chunks.append(records)
+                scanned += len(chunk)
+                for record in records:
+                    counts[record[0]] = counts.get(record[0], 0) + 1
+
+                if scanned >= self.FAST_START_MAX_BYTES:
+                    break
+                if all(counts.get(bid, 0) >= n for bid, n in wanted.items()):
+                    break
+
+        self._process_records(chain.from_iterable(reversed(chunks)))
+        self.file_offset = end
+
+        logger.info(
+            "Fast start recovered %d beacons from the last %d of %d bytes in %.1f ms",
+            len(self.beacons),
+            scanned,
+            end,
+            (time.perf_counter() - started) * 1e3,
+        )
 
     def _read_new_data(self) -> None:
-        if not self.current_log:
+        if self._tailer is None:
             return
 
-        start_offset = self.file_offset
+        # file_offset may have been reset externally (e.g. by _check_timeouts)
+        if self.file_offset != self._tailer.offset:
+            self._tailer.seek(self.file_offset)
+            self._catching_up = True
 
-        with self.current_log.open("r", encoding="latin-1", errors="ignore") as f:
-            f.seek(self.file_offset)
-            reader = csv.reader(f)
-            for row in reader:
-                self._process_row(row)
-            self.file_offset = f.tell()
+        data = self._tailer.read()
+        if not data:
+            return
+
+        version = self.version
+        # Backlogs (startup, checkpoint resume, restarts) hold old rows; they are not live latency
+        catching_up = self._catching_up or self._tailer.more or len(data) >= self.BULK_INGEST_BYTES
+        self._catching_up = False
+        while data:
+            self._ingest(data)
+            self.file_offset = self._tailer.offset
+
+            if not self._tailer.more:
+                break
+            data = self._tailer.read()
 
-        # "data arrived" means the file grew,
+        # "data arrived" means the file grew by complete lines,
         # regardless of whether positions changed.
-        if self.file_offset > start_offset:
-            self.last_data_time = time.monotonic()
+        self.last_data_time = self._clock()
+
+        if self.latency is not None and not catching_up:
+            self._record_read_latency(version)
+
+    def _record_read_latency(self, version: int) -> None:
+        # Marvelmind timestamps and file mtimes are wall clock, unlike ts_read
+        now = time.time()
+        changed = self.changed_since(version)
+        self.latency.record_beacons(STAGE_WRITE_TO_READ, now - self._tailer.mtime, list(changed))
+
+        samples = []
+        for beacon_id, beacon in changed.items():
+            # One sample per beacon per read: its newest row, however many rows the read held
+            ts_mm = beacon.history[-1].ts_mm if beacon.history else None
+            if ts_mm is not None:
+                samples.append((beacon_id, now - ts_mm))
+        self.latency.record_many(STAGE_MM_TO_READ, samples)
+
+    def _ingest(self, data: bytes) -> None:
+        if bulk_ingest is not None and len(data) >= self.BULK_INGEST_BYTES:
+            self._ingest_bulk(data)
+        else:
+            self._process_records(parse_position_records(data))
 
     def _process_row(self, row: list[str]) -> None:
         if len(row) < 8:
@@ -168,6 +571,126 @@ class PositionTracker:
         elif data_code == 18:
             self._handle_position_row(row, BeaconType.STATIONARY)
 
+    def _process_records(self, records: Iterable[PositionRecord]) -> None:
+        if self.filters is not None:
+            records = self._filter_records(records)
+
+        beacon_types = self.beacon_types
+        for beacon_id, data_code, ts_mm, x, y, z in records:
+            if data_code == STATIONARY_POSITION_CODE:
+                beacon_type = BeaconType.STATIONARY
+            else:
+                beacon_type = beacon_types.get(beacon_id, BeaconType.UNKNOWN)
+            self._apply_position(beacon_id, beacon_type, ts_mm, x, y, z)
+
+    def _filter_records(self, records: Iterable[PositionRecord]) -> List[PositionRecord]:
+        """
+        Run the mobile rows of a batch through the filter bank at once and
+        return the records with their positions replaced by filtered ones.
+        """
+        records = list(records)
+        types: Dict[int, BeaconType] = {}
+        mobile = []
+        for i, (beacon_id, data_code, _, _, _, _) in enumerate(records):
+            beacon_type = types.get(beacon_id)
+            if beacon_type is None:
+                beacon_type = types[beacon_id] = self._row_beacon_type(beacon_id, data_code)
+            if beacon_type == BeaconType.MOBILE:
+                mobile.append(i)
+        if not mobile:
+            return records
+
+        rows = [records[i] for i in mobile]
+        filtered = self.filters.filter(
+            np.array([r[0] for r in rows], dtype=np.int64),
+            np.array([np.nan if r[2] is None else r[2] for r in rows]),
+            np.array([r[3:] for r in rows], dtype=np.float64),
+        )
+        for i, (x, y, z) in zip(mobile, filtered.tolist()):
+            beacon_id, data_code, ts_mm, _, _, _ = records[i]
+            records[i] = (beacon_id, data_code, ts_mm, x, y, z)
+        return records
+
+    def _row_beacon_type(self, beacon_id: int, data_code: int) -> BeaconType:
+        # The type _apply_position / _ingest_bulk will use for this row
+        beacon = self.beacons.get(beacon_id)
+        if beacon is not None:
+            return beacon.beacon_type
+        if data_code == STATIONARY_POSITION_CODE:
+            return BeaconType.STATIONARY
+        return self.beacon_types.get(beacon_id, BeaconType.UNKNOWN)
+
+    def _ingest_bulk(self, data: bytes) -> None:
+        arrays = bulk_ingest.load_position_arrays(data)
+        if arrays is None:
+            self._process_records(parse_position_records(data))
+            return
+
+        now = self._clock()
+        groups = bulk_ingest.group_by_beacon(arrays.beacon_id)
+        xyz = arrays.xyz if self.filters is None else self._filter_bulk(arrays, groups)
+
+        for beacon_id, rows in groups:
+            beacon = self.beacons.get(beacon_id)
+            if beacon is None:
+                if arrays.data_code[rows[0]] == STATIONARY_POSITION_CODE:
+                    beacon_type = BeaconType.STATIONARY
+                else:
+                    beacon_type = self.beacon_types.get(beacon_id, BeaconType.UNKNOWN)
+                beacon = self._add_beacon(BeaconState(beacon_id, beacon_type))
+
+            beacon.last_seen = now
+            self._touch_beacon(beacon)
+            ts = arrays.ts_mm[rows]
+            history = beacon.history
+
+            if beacon.beacon_type != BeaconType.MOBILE:
+                # Non-mobile beacons keep their first position and only refresh timestamps
+                if not history:
+                    history.push(None, now, *xyz[rows[0]].tolist())
+                history.touch(_optional_ts(ts[-1]), now)
+            else:
+                self._ingest_bulk_mobile(beacon, xyz[rows], ts, now)
+
+            if self._subscriptions:
+                self._queue_update(beacon)
+
+    def _filter_bulk(self, arrays: "bulk_ingest.PositionArrays", groups: List[Tuple[int, "np.ndarray"]]) -> "np.ndarray":
+        mobile = [
+            rows
+            for beacon_id, rows in groups
+            if self._row_beacon_type(beacon_id, int(arrays.data_code[rows[0]])) == BeaconType.MOBILE
+        ]
+        if not mobile:
+            return arrays.xyz
+
+        rows = np.sort(np.concatenate(mobile))
+        xyz = arrays.xyz.copy()
+        xyz[rows] = self.filters.filter(arrays.beacon_id[rows], arrays.ts_mm[rows], arrays.xyz[rows])
+        return xyz
+
+    def _ingest_bulk_mobile(self, beacon: BeaconState, xyz: "np.ndarray", ts: "np.ndarray", now: float) -> None:
+        history = beacon.history
+
+        if self.use_ema and self.filters is None:
+            initial = None if beacon.ema_x is None else (beacon.ema_x, beacon.ema_y, beacon.ema_z)
+            xyz, (beacon.ema_x, beacon.ema_y, beacon.ema_z) = bulk_ingest.ema_filter(
+                xyz, self.EMA_ALPHA, initial
+            )
+
+        last_pos = history.last_position() if history else None
+        kept = bulk_ingest.movement_filter(xyz, self.MIN_MOBILE_MOVEMENT, last_pos)
+
+        # Each kept sample carries the timestamp of the last row deduplicated into it
+        if history and (not len(kept) or kept[0] > 0):
+            refresh = (kept[0] if len(kept) else len(ts)) - 1
+            history.touch(_optional_ts(ts[refresh]), now)
+
+        kept = kept[-history.capacity:]
+        ends = np.append(kept[1:], len(ts)) - 1
+        for t, (x, y, z) in zip(ts[ends].tolist(), xyz[kept].tolist()):
+            history.push(_optional_ts(t), now, x, y, z)
+
     def _handle_position_row(self, row: list[str], beacon_type: BeaconType) -> None:
         try:
             beacon_id = int(row[4])
@@ -185,16 +708,29 @@ class PositionTracker:
             logger.debug("Failed to parse Marvelmind timestamp from row: %s", row)
             ts_mm = None
 
-        now = time.monotonic()
+        self._apply_position(beacon_id, beacon_type, ts_mm, raw_x, raw_y, raw_z)
+
+    def _apply_position(
+        self,
+        beacon_id: int,
+        beacon_type: BeaconType,
+        ts_mm: Optional[float],
+        raw_x: float,
+        raw_y: float,
+        raw_z: float,
+    ) -> None:
+        now = self._clock()
 
         beacon = self.beacons.get(beacon_id)
         if beacon is None:
-            beacon = BeaconState(beacon_id, beacon_type)
-            self.beacons[beacon_id] = beacon
+            beacon = self._add_beacon(BeaconState(beacon_id, beacon_type))
 
         beacon.last_seen = now
+        # Inlined _touch_beacon; this runs for every row
+        self.version += 1
+        beacon.version = self.version
 
-        if beacon.beacon_type == BeaconType.MOBILE and self.use_ema:
+        if beacon.beacon_type == BeaconType.MOBILE and self.use_ema and self.filters is None:
             if beacon.ema_x is None:
                 beacon.ema_x = raw_x
                 beacon.ema_y = raw_y
@@ -208,33 +744,26 @@ class PositionTracker:
         else:
             x, y, z = raw_x, raw_y, raw_z
 
-        sample = PositionSample(ts_mm=ts_mm, ts_read=now, x=x, y=y, z=z)
         history = beacon.history
 
-        if history:
-            last = history[-1]
-
-            if beacon.beacon_type == BeaconType.MOBILE:
-                if self._distance(last, sample) < self.MIN_MOBILE_MOVEMENT:
-                    # Same position; keep timestamps fresh so consumers can see activity
-                    history[-1] = PositionSample(ts_mm=ts_mm, ts_read=now, x=last.x, y=last.y, z=last.z)
-                    return
+        if not history:
+            history.push(ts_mm, now, x, y, z)
+        elif beacon.beacon_type != BeaconType.MOBILE:
+            # Stationary: same behaviour as before (do not grow the trail)
+            history.touch(ts_mm, now)
+        else:
+            lx, ly, lz = history.last_position()
+            if math.sqrt((lx - x) ** 2 + (ly - y) ** 2 + (lz - z) ** 2) < self.MIN_MOBILE_MOVEMENT:
+                # Same position; keep timestamps fresh so consumers can see activity
+                history.touch(ts_mm, now)
             else:
-                # Stationary: same behaviour as before (do not grow the trail)
-                history[-1] = PositionSample(ts_mm=ts_mm, ts_read=now, x=last.x, y=last.y, z=last.z)
-                return
+                history.push(ts_mm, now, x, y, z)
 
-        history.append(sample)
-
-    def _distance(self, a: PositionSample, b: PositionSample) -> float:
-        return math.sqrt(
-            (a.x - b.x) ** 2 +
-            (a.y - b.y) ** 2 +
-            (a.z - b.z) ** 2
-        )
+        if self._subscriptions:
+            self._queue_update(beacon)
 
     def _check_timeouts(self) -> None:
-        now = time.monotonic()
+        now = self._clock()
         since_data = now - self.last_data_time
 
         if since_data >= self.WARN_INTERVAL and (now - self.last_warn_time) >= self.WARN_INTERVAL:
@@ -245,10 +774,112 @@ class PositionTracker:
         if since_data >= self.RESTART_TIMEOUT:
             print("[INFO] Restarting tracker due to Marvelmind silence")
             logger.error("Restarting tracker due to Marvelmind silence")
-            self.file_offset = 0
-            self.beacons.clear()
+            if not (self.current_log and self._restore_checkpoint(self.current_log)):
+                self.file_offset = 0
+                self._clear_beacons()
             self.last_data_time = now
 
         if since_data >= self.EXCEPTION_TIMEOUT:
             logger.critical("Marvelmind silent for 120s, raising exception")
             raise PositionTrackerException("No Marvelmind data received for 120 seconds")
+
+    def _maybe_checkpoint(self) -> None:
+        if self.checkpoint_path is None or self.current_log is None:
+            return
+
+        now = self._clock()
+        if now - self._last_checkpoint_time < self.CHECKPOINT_INTERVAL:
+            return
+        self._last_checkpoint_time = now
+
+        if self._checkpoint is not None and self._checkpoint["offset"] == self.file_offset:
+            return
+        self._save_checkpoint()
+
+    def _save_checkpoint(self) -> None:
+        try:
+            st = os.stat(self.current_log)
+        except OSError as e:
+            logger.warning("Skipping checkpoint, cannot stat %s: %s", self.current_log, e)
+            return
+
+        state = {
+            # last_seen and ts_read are on the tracker clock, which does not survive a
+            # restart; the wall clock at save time lets a later process rebase them
+            "clock": self._clock(),
+            "wall": time.time(),
+            "log": str(self.current_log),
+            "inode": st.st_ino,
+            "size": st.st_size,
+            "offset": self.file_offset,
+            "beacon_types": {str(bid): t.value for bid, t in self.beacon_types.items()},
+            "beacons": [
+                {
+                    "id": b.beacon_id,
+                    "type": b.beacon_type.value,
+                    "last_seen": b.last_seen,
+                    "ema": None if b.ema_x is None else [b.ema_x, b.ema_y, b.ema_z],
+                    "filter": None if self.filters is None else self.filters.export(b.beacon_id),
+                    "history": [[s.ts_mm, s.ts_read, s.x, s.y, s.z] for s in b.history],
+                }
+                for b in self.beacons.values()
+            ],
+        }
+
+        try:
+            save_checkpoint(self.checkpoint_path, state)
+        except OSError as e:
+            logger.warning("Failed to write checkpoint %s: %s", self.checkpoint_path, e)
+            return
+        self._checkpoint = state
+
+    def _restore_checkpoint(self, log_path: Path) -> bool:
+        """
+        Resume beacon state and file offset from the last checkpoint if it
+        was taken on this log. Returns False if there is nothing to resume.
+        """
+        if self.checkpoint_path is None:
+            return False
+
+        state = self._checkpoint or load_checkpoint(self.checkpoint_path)
+        if state is None or state["log"] != str(log_path):
+            return False
+
+        try:
+            st = os.stat(log_path)
+        except OSError:
+            return False
+        if st.st_ino != state["inode"] or st.st_size < state["size"]:
+            logger.info("Checkpoint for %s no longer matches the log, ignoring it", log_path.name)
+            return False
+
+        shift = 0.0
+        if state is not self._checkpoint:
+            # Saved by another process: keep every age, as of now on this clock
+            elapsed = max(0.0, time.time() - state["wall"])
+            shift = self._clock() - elapsed - state["clock"]
+
+        self.beacon_types = {int(bid): BeaconType(t) for bid, t in state["beacon_types"].items()}
+        self._clear_beacons()
+        for b in state["beacons"]:
+            beacon = BeaconState(b["id"], BeaconType(b["type"]), last_seen=b["last_seen"] + shift)
+            if b["ema"] is not None:
+                beacon.ema_x, beacon.ema_y, beacon.ema_z = b["ema"]
+            if self.filters is not None and b.get("filter") is not None:
+                self.filters.restore(beacon.beacon_id, b["filter"])
+            for ts_mm, ts_read, x, y, z in b["history"]:
+                beacon.history.push(ts_mm, ts_read + shift, x, y, z)
+            self._touch_beacon(self._add_beacon(beacon))
+            if self._subscriptions and beacon.history:
+                self._queue_update(beacon)
+
+        self.file_offset = state["offset"]
+        self._checkpoint = state
+
+        logger.info(
+            "Resumed %d beacons from checkpoint at offset %d of %s",
+            len(self.beacons),
+            self.file_offset,
+            log_path.name,
+        )
+        return True
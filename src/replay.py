@@ -0,0 +1,192 @@
+import time
+from pathlib import Path
+from typing import Callable, Iterator, List, NamedTuple, Optional, Tuple
+
+from utils.logging_setup import get_logger
+logger = get_logger(__name__)
+
+from src.position_tracker import PositionTracker
+
+
+class ReplayClock:
+    """
+    Manually driven clock for PositionTracker(clock=...). Replay sets it to
+    the log's own timeline, so timeouts and ts_read values depend only on
+    the log, never on how fast the replay runs.
+    """
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, dt: float) -> None:
+        self.now += dt
+
+    def set(self, now: float) -> None:
+        self.now = now
+
+
+class ReplayStats(NamedTuple):
+    lines: int
+    bytes: int
+    updates: int
+    log_seconds: float
+    wall_seconds: float
+
+    @property
+    def lines_per_second(self) -> float:
+        return self.lines / self.wall_seconds if self.wall_seconds > 0 else float("inf")
+
+
+def _line_ts(line: bytes) -> Optional[float]:
+    # Column 1 holds the Marvelmind timestamp in milliseconds
+    parts = line.split(b",", 2)
+    if len(parts) < 2:
+        return None
+    try:
+        return float(parts[1]) * 1e-3
+    except ValueError:
+        return None
+
+
+class LogReplayer:
+    """
+    Replays a recorded Marvelmind log through PositionTracker.
+
+    The header is written to a log file in `replay_dir` and the data lines
+    are appended in batches of `batch_interval` seconds of log time, with
+    tracker.update() after each batch, so the tracker exercises its normal
+    log discovery, tailing and parsing. The clock is moved to each batch's
+    log time before the update.
+
+    speed=1.0 replays in real time, speed=N N times faster, and speed=None
+    as fast as possible. Results do not depend on the speed.
+    """
+
+    def __init__(
+        self,
+        source: Path,
+        replay_dir: Path,
+        speed: Optional[float] = 1.0,
+        batch_interval: float = 0.05,
+        clock: Optional[ReplayClock] = None,
+    ):
+        if speed is not None and speed <= 0:
+            raise ValueError(f"speed must be positive or None, got {speed!r}")
+
+        self.source = source
+        self.replay_dir = replay_dir
+        self.speed = speed
+        self.batch_interval = batch_interval
+        self.clock = clock if clock is not None else ReplayClock()
+
+        self.header, self._data = self._split(source.read_bytes())
+        self.target = replay_dir / source.name
+
+    def make_tracker(self, **kwargs) -> PositionTracker:
+        """
+        PositionTracker wired to the replay directory and clock.
+        """
+        kwargs.setdefault("use_inotify", False)
+        return PositionTracker(logs_dir=self.replay_dir, clock=self.clock, **kwargs)
+
+    def batches(self) -> Iterator[Tuple[float, bytes]]:
+        """
+        Yield (log time, bytes) for consecutive batches of data lines. Lines
+        without a timestamp join the batch of the line before them.
+        """
+        batch: List[bytes] = []
+        batch_end: Optional[float] = None
+        last_ts: Optional[float] = None
+
+        for line in self._data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break  # Trailing partial line: the dashboard had not finished it
+            ts = _line_ts(line)
+            if ts is not None:
+                if batch_end is None:
+                    batch_end = ts + self.batch_interval
+                elif ts >= batch_end:
+                    yield last_ts, b"".join(batch)
+                    batch = []
+                    while ts >= batch_end:
+                        batch_end += self.batch_interval
+                last_ts = ts
+            batch.append(line)
+
+        if batch:
+            yield (last_ts if last_ts is not None else 0.0), b"".join(batch)
+
+    def run(
+        self,
+        tracker: PositionTracker,
+        on_batch: Optional[Callable[[PositionTracker], None]] = None,
+    ) -> ReplayStats:
+        """
+        Replay the whole log into `tracker` (usually from make_tracker()).
+        on_batch is called after each tracker.update().
+        """
+        self.replay_dir.mkdir(parents=True, exist_ok=True)
+        with self.target.open("wb") as f:
+            f.write(self.header)
+
+        log_start: Optional[float] = None
+        clock_start = self.clock.now
+        wall_start = time.perf_counter()
+        lines = 0
+        size = 0
+        updates = 0
+
+        tracker.update()
+        updates += 1
+
+        with self.target.open("ab") as f:
+            for ts, data in self.batches():
+                if log_start is None:
+                    log_start = ts
+                elapsed = ts - log_start
+
+                if self.speed is not None:
+                    delay = wall_start + elapsed / self.speed - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+
+                f.write(data)
+                f.flush()
+                lines += data.count(b"\n")
+                size += len(data)
+
+                self.clock.set(clock_start + elapsed)
+                tracker.update()
+                updates += 1
+                if on_batch is not None:
+                    on_batch(tracker)
+
+        stats = ReplayStats(
+            lines=lines,
+            bytes=size,
+            updates=updates,
+            log_seconds=self.clock.now - clock_start,
+            wall_seconds=time.perf_counter() - wall_start,
+        )
+        logger.info(
+            "Replayed %s: %d lines, %.1fs of log in %.2fs (%.0f lines/s)",
+            self.source.name,
+            stats.lines,
+            stats.log_seconds,
+            stats.wall_seconds,
+            stats.lines_per_second,
+        )
+        return stats
+
+    @staticmethod
+    def _split(content: bytes) -> Tuple[bytes, bytes]:
+        # Same rule as PositionTracker._parse_header: data starts at the first line beginning with a digit
+        pos = 0
+        for line in content.splitlines(keepends=True):
+            if line.strip()[:1].isdigit():
+                break
+            pos += len(line)
+        return content[:pos], content[pos:]
@@ -0,0 +1,142 @@
+import asyncio
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, Callable, Iterable, List, NamedTuple, Optional
+
+from utils.logging_setup import get_logger
+logger = get_logger(__name__)
+
+if TYPE_CHECKING:
+    from src.position_tracker import BeaconType, PositionSample
+
+
+class BeaconUpdate(NamedTuple):
+    beacon_id: int
+    beacon_type: "BeaconType"
+    sample: "PositionSample"
+    version: int
+
+
+class Subscription:
+    """
+    Delivers beacon updates to a callback from the thread running
+    PositionTracker.update(), once per ingested batch.
+
+    beacon_ids / beacon_types restrict which beacons are delivered. With
+    coalesce=True only the latest update per beacon in each batch is sent.
+    """
+
+    def __init__(
+        self,
+        callback: Optional[Callable[[BeaconUpdate], None]],
+        beacon_ids: Optional[Iterable[int]] = None,
+        beacon_types: Optional[Iterable["BeaconType"]] = None,
+        coalesce: bool = False,
+    ):
+        self.callback = callback
+        self.beacon_ids = None if beacon_ids is None else frozenset(beacon_ids)
+        self.beacon_types = None if beacon_types is None else frozenset(beacon_types)
+        self.coalesce = coalesce
+
+        self._unsubscribe: Optional[Callable[["Subscription"], None]] = None
+
+    def wants(self, update: BeaconUpdate) -> bool:
+        if self.beacon_ids is not None and update.beacon_id not in self.beacon_ids:
+            return False
+        if self.beacon_types is not None and update.beacon_type not in self.beacon_types:
+            return False
+        return True
+
+    def deliver(self, updates: List[BeaconUpdate]) -> None:
+        selected = [u for u in updates if self.wants(u)]
+        if not selected:
+            return
+
+        if self.coalesce:
+            latest = OrderedDict()
+            for u in selected:
+                latest.pop(u.beacon_id, None)
+                latest[u.beacon_id] = u
+            selected = list(latest.values())
+
+        self._dispatch(selected)
+
+    def close(self) -> None:
+        if self._unsubscribe is not None:
+            self._unsubscribe(self)
+            self._unsubscribe = None
+
+    def _dispatch(self, updates: List[BeaconUpdate]) -> None:
+        for u in updates:
+            try:
+                self.callback(u)
+            except Exception:
+                logger.exception("Subscriber callback failed for beacon %d", u.beacon_id)
+
+
+class AsyncSubscription(Subscription):
+    """
+    Async iterator over beacon updates for consumers running an event loop:
+
+        async for update in tracker.stream():
+            ...
+
+    Updates are handed to the loop thread-safely. With coalesce=True a slow
+    consumer only sees the latest update per beacon; otherwise at most
+    `maxsize` updates are buffered and the oldest are dropped.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        beacon_ids: Optional[Iterable[int]] = None,
+        beacon_types: Optional[Iterable["BeaconType"]] = None,
+        coalesce: bool = True,
+        maxsize: int = 1024,
+    ):
+        super().__init__(None, beacon_ids, beacon_types, coalesce)
+        self._loop = loop
+        self._pending_by_beacon: "OrderedDict[int, BeaconUpdate]" = OrderedDict()
+        self._queue: deque = deque(maxlen=maxsize)
+        self._ready = asyncio.Event()
+        self._closed = False
+        self.dropped = 0
+
+    def __aiter__(self) -> "AsyncSubscription":
+        return self
+
+    async def __anext__(self) -> BeaconUpdate:
+        while True:
+            if self._pending_by_beacon:
+                return self._pending_by_beacon.popitem(last=False)[1]
+            if self._queue:
+                return self._queue.popleft()
+            if self._closed:
+                raise StopAsyncIteration
+            self._ready.clear()
+            await self._ready.wait()
+
+    def close(self) -> None:
+        super().close()
+        if not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._finish)
+
+    def _dispatch(self, updates: List[BeaconUpdate]) -> None:
+        if self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._push, updates)
+
+    def _push(self, updates: List[BeaconUpdate]) -> None:
+        if self.coalesce:
+            for u in updates:
+                self._pending_by_beacon.pop(u.beacon_id, None)
+                self._pending_by_beacon[u.beacon_id] = u
+        else:
+            overflow = len(self._queue) + len(updates) - self._queue.maxlen
+            if overflow > 0:
+                self.dropped += overflow
+            self._queue.extend(updates)
+        self._ready.set()
+
+    def _finish(self) -> None:
+        self._closed = True
+        self._ready.set()
@@ -9,14 +9,18 @@ setup_logging(Path("logs"))
 logger = get_logger("test")
 
 from src.position_tracker import PositionTracker
-from utils.plotter import PositionPlotter
+from utils.plot_process import PlotProcess
 from utils.csv_writer import PositionCSVWriter
 from utils.broadcaster import PositionBroadcaster
+from utils.latency import LatencyTracker
+from utils.shared_positions import SharedPositionTable
 from utils.sink import PositionSink
 
 # Helpers for console printing (only on change)
 EPS = 1e-4
 
+LATENCY_LOG_INTERVAL = 10.0
+
 
 def _pos_tuple(p) -> Tuple[float, float, float]:
     return (round(p.x, 4), round(p.y, 4), round(p.z, 4))
@@ -40,56 +44,82 @@ def _print_snapshot(snap: Dict[Tuple[str, int], Tuple[float, float, float]]) ->
 
 
 # Component setup
-tracker = PositionTracker(use_ema=True)
+# Latency histograms for every stage from log write to socket send, shared by all components
+latency = LatencyTracker()
+
+tracker = PositionTracker(
+    use_ema=True,
+    fast_start=True,
+    checkpoint_path=Path("tracker_checkpoint.json"),
+    latency=latency,
+)
 
-csv_writer = PositionCSVWriter(Path("positions_out.csv"))
-broadcaster = PositionBroadcaster(port=5555, rate_hz=20)
+# Written on a background thread so disk stalls never reach tracker.update()
+csv_writer = PositionCSVWriter(
+    Path("positions_out.csv"),
+    background=True,
+    flush_policy="time",
+    rotate_bytes=64 * 1024 * 1024,
+    compression="gzip",
+)
+broadcaster = PositionBroadcaster(port=5555, rate_hz=20, latency=latency)
 broadcaster.start()
 
 sink = PositionSink(
     csv_writer=csv_writer,
     broadcaster=broadcaster,
+    latency=latency,
 )
+# CSV + broadcaster are fed by tracker updates, not by the loop below
+sink.attach(tracker)
+
+# Latest positions in shared memory for the plot process and other local readers
+shared_table = SharedPositionTable()
+shared_table.attach(tracker)
 
-plotter = PositionPlotter(
+# Plotting runs in its own process so the GUI can never stall tracking
+plotter = PlotProcess(
+    shared_table.name,
     trail_seconds=50.0,
     decay_seconds=30.0,
     refresh_interval=0.2,
     show_pos=True,
 )
+plotter.start()
 
 logger.info("Test loop started")
 
 last_snapshot: Dict[Tuple[str, int], Tuple[float, float, float]] = {}
+last_version = -1
+last_latency_log = time.monotonic()
 
 # Main loop
 try:
     while True:
         tracker.update()
 
-        # Publish to CSV + broadcaster
-        sink.publish(tracker)
-
-        # Update plotter (always)
-        for bid, pos in tracker.get_mobile_positions().items():
-            plotter.update("MOBILE", bid, pos.x, pos.y, pos.z)
-
-        for bid, pos in tracker.get_stationary_map().items():
-            plotter.update("STATIONARY", bid, pos.x, pos.y, pos.z)
-
         # Console printing only when data changes
-        current_snapshot = _snapshot(tracker)
-        if current_snapshot != last_snapshot:
-            _print_snapshot(current_snapshot)
-            last_snapshot = current_snapshot
+        if tracker.version != last_version:
+            last_version = tracker.version
+            current_snapshot = _snapshot(tracker)
+            if current_snapshot != last_snapshot:
+                _print_snapshot(current_snapshot)
+                last_snapshot = current_snapshot
+
+        if time.monotonic() - last_latency_log >= LATENCY_LOG_INTERVAL:
+            latency.log_summary()
+            last_latency_log = time.monotonic()
 
-        time.sleep(0.02)
+        # Wakes early when the log grows instead of always sleeping 20 ms
+        tracker.wait(0.02)
 
 except KeyboardInterrupt:
     logger.info("Shutting down test loop")
 
 finally:
+    plotter.stop()
     broadcaster.stop()
+    shared_table.stop()
+    tracker.close()
     csv_writer.close()
-    plotter.close()
     logger.info("Shutdown complete")
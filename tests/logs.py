@@ -0,0 +1,55 @@
+"""
+Small synthetic Marvelmind logs for the tests.
+"""
+import random
+from pathlib import Path
+from typing import Iterable, List
+
+DATE = "2024_01_01__00_00_00"
+LOG_NAME = DATE + "__Marvelmind_log.csv"
+START_MS = 1_700_000_000_000
+
+
+def header(mobiles: Iterable[int], anchors: Iterable[int]) -> str:
+    lines = ["Marvelmind dashboard log", ""]
+    mobiles = list(mobiles)
+    for bid in sorted(set(mobiles) | set(anchors)):
+        lines.append(f"[beacon {bid}]")
+        lines.append(f"Hedgehog_mode= {1 if bid in mobiles else 0}")
+    lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def position_row(ts_ms: int, beacon_id: int, x: float, y: float, z: float, code: int = 17) -> str:
+    return f"{DATE},{ts_ms},41,{code},{beacon_id},{x:.3f},{y:.3f},{z:.3f},0,1\n"
+
+
+def rows(count: int, mobiles: Iterable[int], anchors: Iterable[int], start_ms: int = START_MS, seed: int = 1) -> List[str]:
+    """
+    count data lines, 20 ms apart, cycling through the beacons: position
+    rows (code 17 or 129 for mobiles, 18 for anchors) with every fifth line
+    a non-position one.
+    """
+    rng = random.Random(seed)
+    mobiles = list(mobiles)
+    beacons = mobiles + list(anchors)
+    lines = []
+    for i in range(count):
+        ts = start_ms + 20 * i
+        bid = beacons[i % len(beacons)]
+        if i % 5 == 4:
+            lines.append(f"{DATE},{ts},40,3,{bid},{rng.randint(0, 255)},0,0,0\n")
+        elif bid in mobiles:
+            code = 17 if rng.random() < 0.5 else 129
+            lines.append(position_row(ts, bid, rng.uniform(0, 10), rng.uniform(0, 10), rng.uniform(0, 2), code))
+        else:
+            lines.append(position_row(ts, bid, bid, 2.0 * bid, 0.5, 18))
+    return lines
+
+
+def write_log(directory: Path, lines: Iterable[str], mobiles: Iterable[int], anchors: Iterable[int], name: str = LOG_NAME) -> Path:
+    path = directory / name
+    with path.open("w", newline="") as f:
+        f.write(header(mobiles, anchors))
+        f.write("".join(lines))
+    return path
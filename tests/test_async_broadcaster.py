@@ -0,0 +1,127 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.position_tracker import BeaconType, PositionSample
+from utils.async_broadcaster import AsyncPositionBroadcaster, _Client
+from utils.snapshot import Snapshot
+from utils.subscription_classes import ClientOptions
+from utils.wire import DeltaState, decode_frame
+
+
+class _Writer:
+    """
+    Stands in for a client's StreamWriter; nothing ever drains the queue.
+    """
+
+    def __init__(self):
+        self.aborted = False
+        self.transport = SimpleNamespace(abort=self._abort, get_write_buffer_size=lambda: 0)
+
+    def get_extra_info(self, name):
+        return ("127.0.0.1", 40000)
+
+    def _abort(self):
+        self.aborted = True
+
+
+def _connect(broadcaster, options=None):
+    options = options or broadcaster.default_options
+    client = _Client(_Writer(), broadcaster.queue_size, options, broadcaster._classes.join(options))
+    broadcaster._clients.append(client)
+    return client
+
+
+def _messages(client):
+    return [msg for msg, _, _ in client.queue]
+
+
+@pytest.mark.parametrize("policy", ["drop_oldest", "latest_only", "disconnect"])
+def test_full_queue_follows_the_policy(policy):
+    broadcaster = AsyncPositionBroadcaster(port=0, queue_size=3, slow_client_policy=policy)
+    client = _connect(broadcaster)
+    for i in range(3):
+        broadcaster._offer(client, b"%d" % i, float(i))
+    assert _messages(client) == [b"0", b"1", b"2"]
+    assert client.dropped == 0 and not client.closed
+
+    broadcaster._offer(client, b"3", 3.0)
+    if policy == "disconnect":
+        assert client.closed and client.writer.aborted
+        assert client not in broadcaster._clients
+        assert broadcaster.metrics()["disconnected_slow"] == 1
+        return
+
+    broadcaster._offer(client, b"4", 4.0)
+    if policy == "drop_oldest":
+        assert _messages(client) == [b"2", b"3", b"4"]
+        assert client.dropped == 2
+    elif policy == "latest_only":
+        # The first overflow empties the queue; "4" still fits after "3"
+        assert _messages(client) == [b"3", b"4"]
+        assert client.dropped == 3
+    assert client.max_depth == 3
+
+
+def test_invalid_policy_is_rejected():
+    with pytest.raises(ValueError):
+        AsyncPositionBroadcaster(slow_client_policy="block")
+
+
+def _run_loop(broadcaster, seconds):
+    async def run():
+        try:
+            await asyncio.wait_for(broadcaster._broadcast_loop(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    asyncio.run(run())
+
+
+def _snapshot(ts_pub):
+    return Snapshot(ts_pub, [(BeaconType.MOBILE, 1, PositionSample(None, ts_pub, 1.0, 2.0, 0.5))], 1)
+
+
+def test_overflowing_delta_client_restarts_from_a_keyframe():
+    # A heartbeat on every tick makes each poll produce a new frame
+    broadcaster = AsyncPositionBroadcaster(
+        port=0, rate_hz=100, queue_size=4, heartbeat_interval=0.0, keyframe_interval=60.0
+    )
+    broadcaster.update(_snapshot(1.0))
+    client = _connect(broadcaster, ClientOptions(rate_hz=100.0, encoding="binary", delta=True))
+    _run_loop(broadcaster, 0.5)
+
+    assert client.dropped > 0 and not client.closed
+    frames = [decode_frame(msg)[0] for msg in _messages(client)]
+    assert 1 <= len(frames) <= 4
+    # Whatever is left queued after the last reset applies without a gap
+    assert frames[0].is_keyframe
+    assert all(f.is_delta for f in frames[1:])
+    state = DeltaState()
+    assert all(state.apply(f) for f in frames)
+    assert state.gaps == 0
+
+
+def test_overflowing_full_snapshot_client_drops_messages():
+    broadcaster = AsyncPositionBroadcaster(port=0, rate_hz=100, queue_size=4, heartbeat_interval=0.0)
+    broadcaster.update(_snapshot(1.0))
+    client = _connect(broadcaster, ClientOptions(rate_hz=100.0, encoding="binary"))
+    _run_loop(broadcaster, 0.3)
+
+    assert client.dropped > 0
+    assert len(client.queue) == 4
+    assert all(decode_frame(msg)[0] is not None for msg in _messages(client))
+
+
+def test_unchanged_snapshot_is_resent_as_a_heartbeat():
+    broadcaster = AsyncPositionBroadcaster(port=0, rate_hz=100, queue_size=100)
+    assert broadcaster.heartbeat_interval == 1.0
+    broadcaster.heartbeat_interval = 0.2
+    broadcaster.update(_snapshot(1.0))
+    client = _connect(broadcaster, ClientOptions(rate_hz=100.0))
+    _run_loop(broadcaster, 0.5)
+
+    # The first send plus a heartbeat every 0.2 s, not one message per tick
+    assert 2 <= len(client.queue) <= 3
+    assert len(set(_messages(client))) == 1
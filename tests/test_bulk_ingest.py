@@ -0,0 +1,97 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from benchmarks.loggen import header, rows
+from src import bulk_ingest
+from src.log_parser import parse_position_records
+from src.position_tracker import PositionTracker
+
+MOBILES = (5, 6, 7, 8)
+ANCHORS = (1, 2, 3, 4)
+
+
+def _tracker(tmp_path, **kwargs):
+    tracker = PositionTracker(logs_dir=tmp_path, use_inotify=False, clock=lambda: 100.0, **kwargs)
+    path = tmp_path / "header.txt"
+    path.write_text(header(MOBILES, ANCHORS))
+    tracker.beacon_types, _ = tracker._parse_header(path)
+    return tracker
+
+
+def _state(tracker):
+    positions = {**tracker.get_mobile_positions(), **tracker.get_stationary_map()}
+    beacons = {
+        bid: (b.beacon_type, list(b.history), (b.ema_x, b.ema_y, b.ema_z))
+        for bid, b in tracker.beacons.items()
+    }
+    return positions, beacons
+
+
+def _log(seconds, seed=1):
+    data = "".join(rows(seconds, MOBILES, ANCHORS, seed=seed)).encode()
+    assert len(data) >= PositionTracker.BULK_INGEST_BYTES
+    return data
+
+
+@pytest.mark.parametrize("use_ema", [True, False])
+def test_bulk_ingest_matches_row_by_row(tmp_path, use_ema):
+    first = _log(300.0, seed=1)
+    # Written after the tracker already holds state from the first chunk
+    second = _log(300.0, seed=2)
+    assert bulk_ingest.load_position_arrays(first) is not None
+
+    bulk = _tracker(tmp_path, use_ema=use_ema)
+    bulk._ingest_bulk(first)
+    bulk._ingest_bulk(second)
+
+    by_row = _tracker(tmp_path, use_ema=use_ema)
+    by_row._process_records(parse_position_records(first))
+    by_row._process_records(parse_position_records(second))
+
+    assert _state(bulk) == _state(by_row)
+    assert len(bulk.beacons) == len(MOBILES) + len(ANCHORS)
+
+
+def test_bulk_ingest_falls_back_on_empty_timestamp(tmp_path):
+    lines = list(rows(300.0, MOBILES, ANCHORS))
+    lines.insert(len(lines) // 2, "2024_01_01__00_00_00,,41,17,5,1.0,2.0,0.5\n")
+    data = "".join(lines).encode()
+    assert bulk_ingest.load_position_arrays(data) is None
+
+    bulk = _tracker(tmp_path)
+    bulk._ingest(data)
+
+    by_row = _tracker(tmp_path)
+    by_row._process_records(parse_position_records(data))
+
+    assert _state(bulk) == _state(by_row)
+
+
+def test_bulk_ingest_accepts_the_same_rows(tmp_path):
+    lines = list(rows(300.0, MOBILES, ANCHORS))
+    edge = [
+        "2024_01_01__00_00_00,{ts}, 41,17,5,1.0,2.0,0.5\n",
+        "2024_01_01__00_00_00,{ts},041 ,129,6,1.5,2.5,0.5\n",
+        "2024_01_01__00_00_00,{ts},+41,18,1,3.0,4.0,0.0\n",
+        "2024_01_01__00_00_00,{ts},41,17,5,1.0,2.0,0.5,extra,fields\n",
+        "2024_01_01__00_00_00,{ts},41,17,5,1.0,2.0,0.5\r\n",
+        "2024_01_01__00_00_00,{ts},41,17.0,5,9.0,9.0,9.0\n",
+        "2024_01_01__00_00_00,{ts},41,17,5.0,9.0,9.0,9.0\n",
+        "2024_01_01__00_00_00,{ts},41,17,x,9.0,9.0,9.0\n",
+        "2024_01_01__00_00_00,{ts},41,19,5,9.0,9.0,9.0\n",
+    ]
+    for i, line in enumerate(edge):
+        at = (i + 1) * len(lines) // (len(edge) + 1)
+        ts = lines[at].split(",")[1]
+        lines.insert(at, line.format(ts=ts))
+    data = "".join(lines).encode()
+    assert bulk_ingest.load_position_arrays(data) is not None
+
+    bulk = _tracker(tmp_path)
+    bulk._ingest_bulk(data)
+
+    by_row = _tracker(tmp_path)
+    by_row._process_records(parse_position_records(data))
+
+    assert _state(bulk) == _state(by_row)
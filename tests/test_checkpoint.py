@@ -0,0 +1,168 @@
+import json
+import os
+import time
+
+import pytest
+
+from src.position_tracker import PositionTracker
+from tests.logs import rows, write_log
+
+MOBILES = (5, 6)
+ANCHORS = (1, 2)
+
+
+def _tracker(logs_dir, checkpoint_path, **kwargs):
+    tracker = PositionTracker(use_inotify=False, checkpoint_path=checkpoint_path, **kwargs)
+    tracker.log_tracker.logs_dir = logs_dir
+    return tracker
+
+
+def _positions(tracker):
+    return {
+        bid: (b.beacon_type, [(s.ts_mm, s.x, s.y, s.z) for s in b.history], (b.ema_x, b.ema_y, b.ema_z))
+        for bid, b in tracker.beacons.items()
+    }
+
+
+def _ages(tracker):
+    now = time.monotonic()
+    return {bid: (now - b.last_seen, [now - s.ts_read for s in b.history]) for bid, b in tracker.beacons.items()}
+
+
+@pytest.fixture
+def logs(tmp_path):
+    logs_dir = tmp_path / "logs"
+    logs_dir.mkdir()
+    log = write_log(logs_dir, rows(200, MOBILES, ANCHORS), MOBILES, ANCHORS)
+    return logs_dir, log, tmp_path / "checkpoint.json"
+
+
+def test_resume_from_checkpoint(logs):
+    logs_dir, log, checkpoint = logs
+    first = _tracker(logs_dir, checkpoint)
+    first.update()
+    assert len(first.beacons) == 4
+    first.close()
+    assert checkpoint.exists()
+
+    second = _tracker(logs_dir, checkpoint)
+    second.update()
+    assert second.file_offset == first.file_offset == log.stat().st_size
+    assert _positions(second) == _positions(first)
+    second.close()
+
+
+def test_resume_continues_from_the_saved_offset(logs):
+    logs_dir, log, checkpoint = logs
+    first = _tracker(logs_dir, checkpoint)
+    first.update()
+    first.close()
+
+    with log.open("a") as f:
+        f.write("".join(rows(50, MOBILES, ANCHORS, start_ms=1_800_000_000_000, seed=2)))
+    second = _tracker(logs_dir, checkpoint)
+    second.update()
+
+    reference = _tracker(logs_dir, None)
+    reference.update()
+    assert second.file_offset == log.stat().st_size
+    assert _positions(second) == _positions(reference)
+    second.close()
+    reference.close()
+
+
+def test_restored_times_are_rebased_onto_this_clock(logs):
+    logs_dir, log, checkpoint = logs
+    first = _tracker(logs_dir, checkpoint)
+    first.update()
+    first.close()
+    ages = _ages(first)
+
+    # Saved by a process whose monotonic clock was far ahead (e.g. before a reboot)
+    state = json.loads(checkpoint.read_text())
+    ahead = 1e6
+    state["clock"] += ahead
+    for b in state["beacons"]:
+        b["last_seen"] += ahead
+        for sample in b["history"]:
+            sample[1] += ahead
+    checkpoint.write_text(json.dumps(state))
+
+    second = _tracker(logs_dir, checkpoint)
+    second.update()
+    restored = _ages(second)
+    assert restored.keys() == ages.keys()
+    for bid, (age, history) in restored.items():
+        assert 0.0 <= age - ages[bid][0] < 1.0
+        assert all(0.0 <= a - b < 1.0 for a, b in zip(history, ages[bid][1]))
+    second.close()
+
+
+def test_restored_times_keep_ages_across_wall_time(logs):
+    logs_dir, log, checkpoint = logs
+    first = _tracker(logs_dir, checkpoint)
+    first.update()
+    first.close()
+    ages = _ages(first)
+
+    # The checkpoint was written 30 s ago
+    state = json.loads(checkpoint.read_text())
+    state["wall"] -= 30.0
+    checkpoint.write_text(json.dumps(state))
+
+    second = _tracker(logs_dir, checkpoint)
+    second.update()
+    for bid, (age, _) in _ages(second).items():
+        assert 30.0 <= age - ages[bid][0] < 31.0
+    second.close()
+
+
+@pytest.mark.parametrize("change", ["replaced", "truncated"])
+def test_checkpoint_ignored_when_the_log_changed(logs, change):
+    logs_dir, log, checkpoint = logs
+    first = _tracker(logs_dir, checkpoint)
+    first.update()
+    first.close()
+
+    if change == "replaced":
+        # Same name and a larger size, but a different file
+        replacement = write_log(logs_dir, rows(300, MOBILES, ANCHORS, seed=3), MOBILES, ANCHORS, name="new.tmp")
+        os.replace(replacement, log)
+    else:
+        write_log(logs_dir, rows(40, MOBILES, ANCHORS, seed=3), MOBILES, ANCHORS, name=log.name)
+
+    second = _tracker(logs_dir, checkpoint)
+    second.update()
+    reference = _tracker(logs_dir, None)
+    reference.update()
+    assert second.file_offset == log.stat().st_size
+    assert _positions(second) == _positions(reference)
+    second.close()
+    reference.close()
+
+
+def test_silence_restart_resumes_from_checkpoint(logs):
+    logs_dir, log, checkpoint = logs
+    tracker = _tracker(logs_dir, checkpoint)
+    tracker.update()
+    tracker._save_checkpoint()
+    saved_offset = tracker.file_offset
+    saved = _positions(tracker)
+
+    with log.open("a") as f:
+        f.write("".join(rows(50, MOBILES, ANCHORS, start_ms=1_800_000_000_000, seed=2)))
+    tracker.update()
+    assert tracker.file_offset > saved_offset
+    after = _positions(tracker)
+    assert after != saved
+
+    tracker.last_data_time = time.monotonic() - tracker.RESTART_TIMEOUT - 1.0
+    tracker._check_timeouts()
+    assert tracker.file_offset == saved_offset
+    assert _positions(tracker) == saved
+
+    # The rows after the checkpoint are read again
+    tracker.update()
+    assert tracker.file_offset == log.stat().st_size
+    assert _positions(tracker) == after
+    tracker.close()
@@ -0,0 +1,119 @@
+import gzip
+import threading
+import time
+
+import pytest
+
+from src.position_tracker import BeaconType, PositionSample
+from utils import csv_writer
+from utils.csv_writer import PositionCSVWriter
+
+
+def _snapshot(x):
+    return [(BeaconType.MOBILE, 7, PositionSample(None, 1.0, x, 0.0, 0.0))]
+
+
+def _xs(path):
+    lines = path.read_text().splitlines()[1:]
+    return [float(line.split(",")[5]) for line in lines]
+
+
+def _wait_for(path, n, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and len(_xs(path)) < n:
+        time.sleep(0.01)
+
+
+@pytest.mark.parametrize("background", [False, True])
+def test_throttled_snapshot_written_when_period_ends(tmp_path, background):
+    path = tmp_path / "positions.csv"
+    writer = PositionCSVWriter(path, rate_hz=10.0, background=background)
+    try:
+        writer.write_snapshot(1.0, _snapshot(1.0))
+        writer.write_snapshot(2.0, _snapshot(2.0))
+        writer.write_snapshot(3.0, _snapshot(3.0))
+        _wait_for(path, 2)
+        # The held-back snapshot is replaced by the newer one, not queued behind it
+        assert _xs(path) == [1.0, 3.0]
+
+        time.sleep(0.25)
+        assert _xs(path) == [1.0, 3.0]
+    finally:
+        writer.close()
+
+
+@pytest.mark.parametrize("background", [False, True])
+def test_close_writes_pending_snapshot(tmp_path, background):
+    path = tmp_path / "positions.csv"
+    writer = PositionCSVWriter(path, rate_hz=0.1, background=background)
+    writer.write_snapshot(1.0, _snapshot(1.0))
+    writer.write_snapshot(2.0, _snapshot(2.0))
+    writer.close()
+    assert _xs(path) == [1.0, 2.0]
+
+    # Nothing is written after close
+    writer.write_snapshot(3.0, _snapshot(3.0))
+    assert _xs(path) == [1.0, 2.0]
+
+
+@pytest.mark.parametrize("background", [False, True])
+def test_rotated_segments_compressed_off_the_writing_thread(tmp_path, monkeypatch, background):
+    threads = []
+    compress = csv_writer.PositionCSVWriter._compress_segment
+
+    def record_thread(self, segment):
+        threads.append(threading.current_thread())
+        compress(self, segment)
+
+    monkeypatch.setattr(csv_writer.PositionCSVWriter, "_compress_segment", record_thread)
+
+    path = tmp_path / "positions.csv"
+    writer = PositionCSVWriter(path, rate_hz=1e6, background=background, rotate_bytes=1, compression="gzip")
+    writing = {threading.current_thread(), writer._thread}
+    writer.write_snapshot(1.0, _snapshot(1.0))
+    writer.write_snapshot(2.0, _snapshot(2.0))
+    writer.close()
+
+    # The background writer may batch both snapshots into one segment
+    segments = list(tmp_path.glob("positions.*.csv.gz"))
+    assert segments
+    assert not list(tmp_path.glob("positions.*.csv"))
+    rows = [line for s in segments for line in gzip.open(s, "rt").read().splitlines()[1:]]
+    assert sorted(float(line.split(",")[5]) for line in rows) == [1.0, 2.0]
+
+    assert len(threads) == len(segments)
+    assert not writing & set(threads)
+
+
+@pytest.mark.parametrize("background", [False, True])
+@pytest.mark.parametrize("policy", ["time", "fsync"])
+def test_time_flush_while_idle(tmp_path, background, policy):
+    path = tmp_path / "positions.csv"
+    writer = PositionCSVWriter(path, background=background, flush_policy=policy, flush_interval=0.1)
+    try:
+        writer.write_snapshot(1.0, _snapshot(1.0))
+        # No further writes: the row must still reach the file
+        _wait_for(path, 1)
+        assert _xs(path) == [1.0]
+    finally:
+        writer.close()
+
+
+@pytest.mark.parametrize("background", [False, True])
+def test_rotate_interval_while_idle(tmp_path, background):
+    path = tmp_path / "positions.csv"
+    writer = PositionCSVWriter(path, background=background, rotate_interval=0.1)
+    try:
+        writer.write_snapshot(1.0, _snapshot(1.0))
+        deadline = time.monotonic() + 2.0
+        while time.monotonic() < deadline and not list(tmp_path.glob("positions.*.csv")):
+            time.sleep(0.01)
+        segments = list(tmp_path.glob("positions.*.csv"))
+        assert segments
+        assert [float(line.split(",")[5]) for line in segments[0].read_text().splitlines()[1:]] == [1.0]
+
+        # Idle rotation does not leave empty segments behind
+        time.sleep(0.35)
+        assert len(list(tmp_path.glob("positions.*.csv"))) == 1
+    finally:
+        writer.close()
@@ -0,0 +1,234 @@
+import json
+import random
+import socket
+import struct
+import time
+
+import pytest
+
+from src.position_tracker import BeaconType, PositionSample
+from utils.broadcaster import PositionBroadcaster
+from utils.snapshot import DeltaEncoder, Snapshot
+from utils.wire import (
+    ENCODING_BINARY,
+    ENCODINGS,
+    TYPE_REMOVED,
+    DeltaState,
+    FrameReader,
+    decode_frame,
+    handshake_line,
+    payload_to_frame,
+    resync_line,
+)
+
+
+def _f32(value):
+    return struct.unpack("<f", struct.pack("<f", value))[0]
+
+
+def _snapshots(count, seed=1):
+    """
+    Snapshots in which beacons move, stand still, appear and disappear.
+    """
+    rng = random.Random(seed)
+    live = {bid: [rng.uniform(0, 10), rng.uniform(0, 10), 0.5, 100.0] for bid in range(1, 6)}
+    snapshots = []
+    for i in range(count):
+        for bid, state in live.items():
+            if rng.random() < 0.5:
+                state[0] += rng.uniform(-0.2, 0.2)
+                state[3] += 0.05
+        if rng.random() < 0.2 and len(live) > 1:
+            del live[rng.choice(sorted(live))]
+        if rng.random() < 0.2:
+            live[rng.randint(1, 12)] = [rng.uniform(0, 10), rng.uniform(0, 10), 0.5, 100.0]
+        beacons = [
+            (BeaconType.MOBILE if bid < 8 else BeaconType.STATIONARY, bid, PositionSample(None, ts, x, y, z))
+            for bid, (x, y, z, ts) in sorted(live.items())
+        ]
+        snapshots.append(Snapshot(1000.0 + i, beacons, i))
+    return snapshots
+
+
+def _decode(msg, encoding):
+    if encoding == ENCODING_BINARY:
+        frame, used = decode_frame(msg)
+        assert used == len(msg)
+        return frame
+    return payload_to_frame(json.loads(msg))
+
+
+def _expected(snapshot, encoding):
+    records = {r[0]: r for r in snapshot.records}
+    if encoding == ENCODING_BINARY:
+        records = {
+            bid: (bid, btype, _f32(x), _f32(y), _f32(z), ts_mm, ts_read)
+            for bid, (_, btype, x, y, z, ts_mm, ts_read) in records.items()
+        }
+    return records
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_deltas_rebuild_every_snapshot(encoding):
+    encoder = DeltaEncoder()
+    state = DeltaState()
+    removed_seen = False
+    for i, snapshot in enumerate(_snapshots(200)):
+        frames = encoder.advance(snapshot)
+        assert frames.seq == i + 1
+        # A keyframe every 25 frames, deltas in between
+        frame = _decode(frames.encoded(encoding, keyframe=i % 25 == 0), encoding)
+        assert frame.seq == frames.seq
+        assert frame.is_keyframe == (i % 25 == 0) and frame.is_delta == (i % 25 != 0)
+        removed_seen |= any(r[1] == TYPE_REMOVED for r in frame.records)
+
+        assert state.apply(frame)
+        assert state.beacons == _expected(snapshot, encoding)
+    assert removed_seen
+    assert state.gaps == 0
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_deltas_only_carry_changes(encoding):
+    encoder = DeltaEncoder()
+    snapshots = _snapshots(2)
+    encoder.advance(snapshots[0])
+    frames = encoder.advance(snapshots[0])
+    frame = _decode(frames.encoded(encoding, keyframe=False), encoding)
+    assert frame.records == []
+
+    # The encodings are built once and shared
+    assert frames.encoded(encoding, keyframe=False) is frames.encoded(encoding, keyframe=False)
+    assert encoder.frames_for(snapshots[0]) is frames
+    assert encoder.seq == 2
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_gap_needs_a_keyframe(encoding):
+    encoder = DeltaEncoder()
+    state = DeltaState()
+    snapshots = _snapshots(10)
+
+    assert not state.apply(_decode(encoder.advance(snapshots[0]).encoded(encoding, False), encoding))
+    assert state.gaps == 0
+    assert state.apply(_decode(encoder.advance(snapshots[1]).encoded(encoding, True), encoding))
+    assert state.apply(_decode(encoder.advance(snapshots[2]).encoded(encoding, False), encoding))
+
+    # Frame 4 is lost
+    encoder.advance(snapshots[3])
+    assert not state.apply(_decode(encoder.advance(snapshots[4]).encoded(encoding, False), encoding))
+    assert state.gaps == 1
+    # Deltas stay unusable until the next keyframe
+    assert not state.apply(_decode(encoder.advance(snapshots[5]).encoded(encoding, False), encoding))
+    assert state.gaps == 1
+
+    assert state.apply(_decode(encoder.advance(snapshots[6]).encoded(encoding, True), encoding))
+    assert state.beacons == _expected(snapshots[6], encoding)
+    assert state.apply(_decode(encoder.advance(snapshots[7]).encoded(encoding, False), encoding))
+    assert state.beacons == _expected(snapshots[7], encoding)
+
+
+def test_sequence_wraps():
+    encoder = DeltaEncoder()
+    encoder.seq = 0xFFFFFFFE
+    state = DeltaState()
+    snapshots = _snapshots(3)
+    assert state.apply(_decode(encoder.advance(snapshots[0]).encoded(ENCODING_BINARY, True), ENCODING_BINARY))
+    frames = encoder.advance(snapshots[1])
+    assert frames.seq == 0
+    assert state.apply(_decode(frames.encoded(ENCODING_BINARY, False), ENCODING_BINARY))
+    assert state.beacons == _expected(snapshots[1], ENCODING_BINARY)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class _DeltaClient:
+    """
+    Runs a delta-mode broadcaster that publishes a new snapshot every time
+    the client polls, and rebuilds the beacon set from what arrives.
+    """
+
+    def __init__(self, keyframe_interval):
+        port = _free_port()
+        self.broadcaster = PositionBroadcaster(
+            host="127.0.0.1", port=port, rate_hz=50, delta=True, keyframe_interval=keyframe_interval
+        )
+        self.snapshots = _snapshots(1000, seed=5)
+        self.by_ts = {s.ts_pub: s for s in self.snapshots}
+        self.next = 0
+        self.publish()
+        self.broadcaster.start()
+
+        deadline = time.monotonic() + 5.0
+        while True:
+            try:
+                self.sock = socket.create_connection(("127.0.0.1", port), timeout=5.0)
+                break
+            except ConnectionRefusedError:
+                assert time.monotonic() < deadline
+                time.sleep(0.05)
+        self.sock.sendall(handshake_line(ENCODING_BINARY, delta=True))
+        self.reader = FrameReader()
+        self.state = DeltaState()
+        self.keyframes = []
+
+    def publish(self):
+        self.broadcaster.update(self.snapshots[min(self.next, len(self.snapshots) - 1)])
+        self.next += 1
+
+    def poll(self, seconds):
+        """
+        Apply what arrives for `seconds`; returns how many frames applied.
+        """
+        applied = 0
+        end = time.monotonic() + seconds
+        while time.monotonic() < end:
+            self.publish()
+            self.sock.settimeout(0.02)
+            try:
+                data = self.sock.recv(65536)
+            except socket.timeout:
+                continue
+            for frame in self.reader.feed(data):
+                if frame.is_keyframe:
+                    self.keyframes.append(time.monotonic())
+                if self.state.apply(frame):
+                    applied += 1
+                    assert self.state.beacons == _expected(self.by_ts[frame.ts_pub], ENCODING_BINARY)
+        return applied
+
+    def close(self):
+        self.sock.close()
+        self.broadcaster.stop()
+
+
+def test_broadcaster_sends_keyframes_at_the_interval():
+    client = _DeltaClient(keyframe_interval=0.25)
+    try:
+        assert client.poll(1.5) > 20
+    finally:
+        client.close()
+
+    # Keyframes recur at the interval, not with every frame
+    gaps = [b - a for a, b in zip(client.keyframes, client.keyframes[1:])]
+    assert 4 <= len(client.keyframes) <= 10
+    assert min(gaps) > 0.15 and max(gaps) < 0.6
+
+
+def test_broadcaster_answers_resync_with_a_keyframe():
+    client = _DeltaClient(keyframe_interval=60.0)
+    try:
+        assert client.poll(0.3) > 5
+        assert len(client.keyframes) == 1
+
+        # Pretend a frame went missing: deltas no longer apply until a keyframe
+        client.state.seq = None
+        client.sock.sendall(resync_line())
+        assert client.poll(0.3) > 5
+        assert len(client.keyframes) == 2
+    finally:
+        client.close()
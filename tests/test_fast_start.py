@@ -0,0 +1,78 @@
+import io
+
+import pytest
+
+from src.log_parser import iter_reverse_chunks
+from src.position_tracker import HISTORY_LEN, BeaconType, PositionTracker
+from tests.logs import rows, write_log
+
+MOBILES = (5, 6, 7)
+ANCHORS = (1, 2, 3)
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 64, 1000, 1 << 20])
+def test_reverse_chunks_cover_the_range_in_whole_lines(block_size):
+    data = "".join(rows(60, MOBILES, ANCHORS)).encode()
+    start = 10 + data[10:].index(b"\n") + 1
+    chunks = list(iter_reverse_chunks(io.BytesIO(data), start, len(data), block_size))
+
+    assert b"".join(reversed(chunks)) == data[start:]
+    assert all(chunk.endswith(b"\n") for chunk in chunks)
+    if block_size < len(data):
+        assert len(chunks) > 1
+
+
+def _tracker(logs_dir, **kwargs):
+    tracker = PositionTracker(use_inotify=False, **kwargs)
+    tracker.log_tracker.logs_dir = logs_dir
+    tracker.update()
+    return tracker
+
+
+def _samples(beacon):
+    return [(s.ts_mm, s.x, s.y, s.z) for s in beacon.history]
+
+
+@pytest.mark.parametrize("block", [97, 4096])
+def test_fast_start_recovers_the_newest_rows(tmp_path, monkeypatch, block):
+    # Blocks that cut through lines, so rows straddle chunk boundaries
+    monkeypatch.setattr(PositionTracker, "FAST_START_BLOCK", block)
+    log = write_log(tmp_path, rows(2000, MOBILES, ANCHORS), MOBILES, ANCHORS)
+
+    # Without the EMA, whose state is warmed from the recovered rows only
+    fast = _tracker(tmp_path, fast_start=True, use_ema=False)
+    full = _tracker(tmp_path, use_ema=False)
+    assert fast.file_offset == full.file_offset == log.stat().st_size
+    assert set(fast.beacons) == set(full.beacons) == set(MOBILES) | set(ANCHORS)
+
+    for bid, beacon in fast.beacons.items():
+        expected = full.beacons[bid]
+        assert beacon.beacon_type == expected.beacon_type
+        if beacon.beacon_type == BeaconType.MOBILE:
+            # A full history of the newest rows, as the full replay has
+            assert _samples(beacon) == _samples(expected)[-HISTORY_LEN:]
+            assert len(beacon.history) == HISTORY_LEN
+        else:
+            assert _samples(beacon)[-1][1:] == _samples(expected)[-1][1:]
+    fast.close()
+    full.close()
+
+
+def test_fast_start_stops_once_every_beacon_is_covered(tmp_path, monkeypatch):
+    monkeypatch.setattr(PositionTracker, "FAST_START_BLOCK", 1024)
+    log = write_log(tmp_path, rows(20000, MOBILES, ANCHORS), MOBILES, ANCHORS)
+
+    read = []
+    original = iter_reverse_chunks
+
+    def counting(*args):
+        for chunk in original(*args):
+            read.append(len(chunk))
+            yield chunk
+
+    monkeypatch.setattr("src.position_tracker.iter_reverse_chunks", counting)
+    tracker = _tracker(tmp_path, fast_start=True)
+    # Rows cycle through the beacons, so the last few hundred cover HISTORY_LEN per mobile
+    assert sum(read) < log.stat().st_size / 10
+    assert all(len(tracker.beacons[bid].history) == HISTORY_LEN for bid in MOBILES)
+    tracker.close()
@@ -0,0 +1,119 @@
+import os
+
+import pytest
+
+from src.position_tracker import PositionTracker
+from tests.logs import rows, write_log
+from utils.file_tail import FileTailer
+
+MOBILES = (5, 6)
+ANCHORS = (1, 2)
+
+
+@pytest.fixture(params=[False, True], ids=["poll", "inotify"])
+def tail(request, tmp_path):
+    path = tmp_path / "log.csv"
+    path.write_bytes(b"")
+    tailer = FileTailer(path, use_inotify=request.param)
+    assert tailer.uses_inotify == request.param
+    yield path, tailer
+    tailer.close()
+
+
+def _append(path, data):
+    with path.open("ab") as f:
+        f.write(data)
+
+
+def test_partial_lines_wait_for_their_newline(tail):
+    path, tailer = tail
+    assert tailer.read() == b""
+    assert not tailer.wait(0.01)
+
+    _append(path, b"one\ntw")
+    assert tailer.wait(1.0)
+    assert tailer.read() == b"one\n"
+    assert tailer.offset == 4
+
+    _append(path, b"o")
+    assert tailer.wait(1.0)
+    assert tailer.read() == b""
+    assert tailer.offset == 4
+
+    _append(path, b"\nthree\n")
+    assert tailer.wait(1.0)
+    assert tailer.read() == b"two\nthree\n"
+    assert tailer.offset == path.stat().st_size
+    assert tailer.read() == b""
+
+
+def test_truncated_file_is_reread(tail):
+    path, tailer = tail
+    _append(path, b"a,1\nb,2\nc,3\n")
+    assert tailer.wait(1.0)
+    assert tailer.read() == b"a,1\nb,2\nc,3\n"
+
+    # Rewritten in place, shorter than what was already read
+    with path.open("r+b") as f:
+        f.truncate(0)
+        f.write(b"d,4\n")
+    assert tailer.wait(1.0)
+    assert tailer.read() == b"d,4\n"
+    assert tailer.offset == 4
+
+
+def test_renamed_file_is_still_followed(tail):
+    path, tailer = tail
+    _append(path, b"before\n")
+    assert tailer.read() == b"before\n"
+
+    rotated = path.with_name("log.csv.1")
+    os.rename(path, rotated)
+    path.write_bytes(b"new file\n")
+    _append(rotated, b"after\n")
+    # The handle stays on the renamed file, not the new one at the old name
+    assert tailer.wait(1.0)
+    assert tailer.read() == b"after\n"
+
+
+def test_large_backlog_is_read_in_bounded_chunks(tail, monkeypatch):
+    path, tailer = tail
+    monkeypatch.setattr(FileTailer, "MAX_READ", 50)
+    lines = [b"line %03d\n" % i for i in range(40)]
+    _append(path, b"".join(lines))
+
+    chunks = []
+    assert tailer.wait(1.0)
+    while True:
+        data = tailer.read()
+        chunks.append(data)
+        # At most MAX_READ new bytes, plus the line carried over from the last read
+        assert len(data) <= 50 + len(lines[0])
+        if not tailer.more:
+            break
+        # A read that stopped at MAX_READ leaves the tailer ready for the next one
+        assert tailer.wait(0.0)
+    assert len(chunks) > 5
+    assert b"".join(chunks) == b"".join(lines)
+    assert tailer.offset == path.stat().st_size
+    assert tailer.read() == b""
+
+
+def test_seek_discards_the_partial_line(tail):
+    path, tailer = tail
+    _append(path, b"one\ntwo\nthr")
+    assert tailer.read() == b"one\ntwo\n"
+    tailer.seek(4)
+    assert tailer.read() == b"two\n"
+    assert tailer.offset == 8
+
+
+def test_tracker_drains_a_backlog_in_one_update(tmp_path, monkeypatch):
+    monkeypatch.setattr(FileTailer, "MAX_READ", 1000)
+    log = write_log(tmp_path, rows(300, MOBILES, ANCHORS), MOBILES, ANCHORS)
+    tracker = PositionTracker(use_inotify=False)
+    tracker.log_tracker.logs_dir = tmp_path
+    tracker.update()
+    assert tracker.file_offset == log.stat().st_size
+    assert set(tracker.beacons) == set(MOBILES) | set(ANCHORS)
+    tracker.close()
@@ -0,0 +1,102 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from benchmarks.loggen import header, rows
+from src import bulk_ingest
+from src.filters import AlphaBetaFilter, EmaFilter, FilterBank, KalmanFilter
+from src.log_parser import parse_position_records
+from src.position_tracker import PositionTracker
+
+MOBILES = (5, 6, 7, 8)
+ANCHORS = (1, 2)
+
+
+def _batch(seconds=20.0, seed=1):
+    arrays = bulk_ingest.load_position_arrays("".join(rows(seconds, MOBILES, ANCHORS, seed=seed)).encode())
+    mobile = np.isin(arrays.beacon_id, MOBILES)
+    return arrays.beacon_id[mobile], arrays.ts_mm[mobile], arrays.xyz[mobile]
+
+
+def _tracker(tmp_path, **kwargs):
+    tracker = PositionTracker(logs_dir=tmp_path, use_inotify=False, clock=lambda: 100.0, **kwargs)
+    path = tmp_path / "header.txt"
+    path.write_text(header(MOBILES, ANCHORS))
+    tracker.beacon_types, _ = tracker._parse_header(path)
+    return tracker
+
+
+def test_ema_bank_matches_ema_filter():
+    ids, ts, xyz = _batch()
+    out = FilterBank(EmaFilter(0.3), reset_gap=None).filter(ids, ts, xyz)
+
+    for bid in MOBILES:
+        mask = ids == bid
+        expected, _ = bulk_ingest.ema_filter(xyz[mask], 0.3, None)
+        np.testing.assert_array_equal(out[mask], expected)
+
+
+@pytest.mark.parametrize("bulk", [False, True])
+def test_ema_bank_matches_tracker_ema(tmp_path, bulk):
+    data = "".join(rows(300.0, MOBILES, ANCHORS)).encode()
+    assert len(data) >= PositionTracker.BULK_INGEST_BYTES
+
+    legacy = _tracker(tmp_path, use_ema=True)
+    banked = _tracker(tmp_path, filters=FilterBank(EmaFilter(PositionTracker.EMA_ALPHA), reset_gap=None))
+    for tracker in (legacy, banked):
+        if bulk:
+            tracker._ingest_bulk(data)
+        else:
+            tracker._process_records(parse_position_records(data))
+
+    for bid in MOBILES:
+        assert list(banked.beacons[bid].history) == list(legacy.beacons[bid].history)
+
+
+@pytest.mark.parametrize("make", [lambda: EmaFilter(0.3), AlphaBetaFilter, KalmanFilter])
+def test_batch_matches_one_row_at_a_time(make):
+    ids, ts, xyz = _batch(5.0)
+    batched = FilterBank(make()).filter(ids, ts, xyz)
+
+    bank = FilterBank(make())
+    single = np.vstack([bank.filter(ids[i : i + 1], ts[i : i + 1], xyz[i : i + 1]) for i in range(len(ids))])
+    np.testing.assert_allclose(batched, single, rtol=0, atol=1e-12)
+
+
+def test_reset_gap_restarts_the_track():
+    ids = np.array([5, 5, 5, 5])
+    ts = np.array([0.0, 0.1, 5.0, 4.0])
+    xyz = np.array([[0.0, 0.0, 0.0], [1.0, 1.0, 1.0], [10.0, 10.0, 10.0], [20.0, 20.0, 20.0]])
+
+    out = FilterBank(EmaFilter(0.5), reset_gap=2.0).filter(ids, ts, xyz)
+    np.testing.assert_array_equal(out[:, 0], [0.0, 0.5, 10.0, 15.0])
+
+    # Going back in time by more than the gap restarts as well
+    out = FilterBank(EmaFilter(0.5), reset_gap=0.5).filter(ids, ts, xyz)
+    np.testing.assert_array_equal(out[:, 0], [0.0, 0.5, 10.0, 20.0])
+
+    out = FilterBank(EmaFilter(0.5), reset_gap=None).filter(ids, ts, xyz)
+    np.testing.assert_array_equal(out[:, 0], [0.0, 0.5, 5.25, 12.625])
+
+
+@pytest.mark.parametrize("beacon_filter", [AlphaBetaFilter(0.5, 0.1), KalmanFilter()])
+def test_velocity_filters_track_constant_velocity(beacon_filter):
+    t = np.arange(0, 20.0, 1 / 16)
+    xyz = np.stack([0.5 * t, -0.25 * t, np.zeros_like(t)], axis=1)
+    bank = FilterBank(beacon_filter)
+    out = bank.filter(np.full(len(t), 5), t, xyz)
+
+    assert np.abs(out[-16:] - xyz[-16:]).max() < 1e-3
+    np.testing.assert_allclose(bank.state.vel[0], [0.5, -0.25, 0.0], atol=1e-3)
+
+
+def test_kalman_smooths_a_noisy_stationary_beacon():
+    rng = np.random.default_rng(1)
+    t = np.arange(0, 10.0, 1 / 16)
+    truth = np.array([2.0, 3.0, 0.5])
+    xyz = truth + rng.normal(0, 0.02, (len(t), 3))
+    out = FilterBank(KalmanFilter(process_noise=0.01)).filter(np.full(len(t), 5), t, xyz)
+
+    raw_error = np.abs(xyz[-80:] - truth).mean()
+    filtered_error = np.abs(out[-80:] - truth).mean()
+    assert filtered_error < 0.75 * raw_error
@@ -0,0 +1,85 @@
+import random
+import time
+
+from benchmarks.loggen import header, log_name, rows
+from src.position_tracker import BeaconType, PositionSample, PositionTracker
+from utils.latency import (
+    STAGE_MM_TO_READ,
+    STAGE_WRITE_TO_READ,
+    LatencyHistogram,
+    LatencyTracker,
+)
+from utils.snapshot import Snapshot
+from utils.subscription_classes import ClientOptions, SubscriptionClass
+
+
+def _snapshot(ts_read, ts_pub=None):
+    sample = PositionSample(ts_mm=None, ts_read=ts_read, x=1.0, y=2.0, z=0.0)
+    return Snapshot(time.time() if ts_pub is None else ts_pub, [(BeaconType.MOBILE, 5, sample)], 1)
+
+
+def test_histogram_percentiles_within_bucket_error():
+    rng = random.Random(1)
+    values = sorted(rng.expovariate(1 / 0.005) for _ in range(20000))
+    hist = LatencyHistogram()
+    for v in values:
+        hist.record(v)
+
+    for q in (50, 95, 99):
+        exact = values[int(q / 100 * len(values)) - 1]
+        assert abs(hist.percentile(q) / exact - 1) <= 1 / LatencyHistogram.SUB_BUCKETS
+    assert hist.percentile(100) == values[-1]
+    assert LatencyHistogram().percentile(50) is None
+
+
+def test_send_latency_skips_heartbeats_and_catch_up_keyframes():
+    cls = SubscriptionClass(ClientOptions(), keyframe_interval=5.0)
+    now = time.monotonic()
+    first = _snapshot(1.0)
+
+    assert cls.poll(now, first, heartbeat_interval=0.5)
+    assert cls.take_fresh() == [5]
+    assert cls.take_fresh() is None  # later members of the class
+
+    # Heartbeat resend of the same snapshot
+    assert cls.poll(now + 1.0, first, heartbeat_interval=0.5)
+    assert cls.take_fresh() is None
+
+    # Keyframe for a client that joined between sends
+    cls.prepare_pending(first)
+    assert cls.take_fresh() is None
+
+    assert cls.poll(now + 2.0, _snapshot(2.0), heartbeat_interval=0.5)
+    assert cls.take_fresh() == [5]
+
+
+def test_send_latency_skips_snapshots_older_than_the_class():
+    old = _snapshot(1.0, ts_pub=time.time() - 10.0)
+    cls = SubscriptionClass(ClientOptions(), keyframe_interval=5.0)
+    assert cls.poll(time.monotonic(), old, heartbeat_interval=None)
+    assert cls.take_fresh() is None
+
+
+def test_tracker_skips_backlog_and_records_live_reads_per_beacon(tmp_path):
+    start_ms = int(time.time() * 1000) - 3_600_000
+    log = tmp_path / log_name()
+    log.write_text(header([5, 6], [1]) + "".join(rows(20.0, mobiles=(5, 6), anchors=(1,), start_ms=start_ms)))
+
+    latency = LatencyTracker()
+    tracker = PositionTracker(logs_dir=tmp_path, use_inotify=False, latency=latency)
+    try:
+        tracker.update()
+        assert len(tracker.beacons) == 3
+        assert latency.summary()[STAGE_MM_TO_READ]["count"] == 0
+
+        with log.open("a") as f:
+            f.write(f"2024_01_01__00_00_00,{int(time.time() * 1000)},41,17,5,1.0,2.0,0.5\n")
+        tracker.update()
+    finally:
+        tracker.close()
+
+    summary = latency.summary()
+    for stage in (STAGE_WRITE_TO_READ, STAGE_MM_TO_READ):
+        assert summary[stage]["count"] == 1
+        assert list(summary[stage]["beacons"]) == [5]
+    assert latency.percentiles(STAGE_MM_TO_READ, 5)[50.0] < 60.0
@@ -0,0 +1,58 @@
+import csv
+import io
+
+import pytest
+
+from benchmarks.loggen import header, rows
+from src.log_parser import parse_position_records
+from src.position_tracker import PositionTracker
+
+# Rows the generator never writes, parsed the same way by both paths
+EDGE_ROWS = (
+    "2024_01_01__00_00_00,1700000000100, 41,17,5,1.0,2.0,0.5\n",
+    "2024_01_01__00_00_00,1700000000200,041 ,129,6,1.5,2.5,0.5\n",
+    "2024_01_01__00_00_00,1700000000300,+41,18,1,3.0,4.0,0.0\n",
+    "2024_01_01__00_00_00,1700000000400,41,17,5,1.0,2.0,0.5,extra,fields\n",
+    "2024_01_01__00_00_00,1700000000500,41,17,5,1.0,2.0,0.5\r\n",
+    "2024_01_01__00_00_00,,41,17,5,1.1,2.1,0.5\n",
+    "2024_01_01__00_00_00,bad,41,17,5,1.2,2.2,0.5\n",
+    "2024_01_01__00_00_00,1700000000600,41,17,x,1.0,2.0,0.5\n",
+    "2024_01_01__00_00_00,1700000000700,41,17,5,1.0,nan?,0.5\n",
+    "2024_01_01__00_00_00,1700000000800,41,19,5,1.0,2.0,0.5\n",
+    "2024_01_01__00_00_00,1700000000900,41,17,5,1.0,2.0\n",
+    "2024_01_01__00_00_00,1700000001000,42,17,5,1.0,2.0,0.5\n",
+    "2024_01_01__00_00_00,1700000001100,4 1,17,5,1.0,2.0,0.5\n",
+    "\n",
+)
+
+
+@pytest.fixture
+def tracker(tmp_path):
+    tracker = PositionTracker(logs_dir=tmp_path, use_inotify=False)
+    path = tmp_path / "header.txt"
+    path.write_text(header([5, 6, 7, 8], [1, 2, 3, 4]))
+    tracker.beacon_types, _ = tracker._parse_header(path)
+    yield tracker
+    tracker.close()
+
+
+def _applied(tracker, feed):
+    calls = []
+    tracker._apply_position = lambda *args: calls.append(args)
+    feed()
+    return calls
+
+
+def test_byte_parser_matches_csv_rows(tracker):
+    text = "".join(rows(30.0)) + "".join(EDGE_ROWS)
+
+    by_csv = _applied(tracker, lambda: [tracker._process_row(row) for row in csv.reader(io.StringIO(text))])
+    by_bytes = _applied(tracker, lambda: tracker._process_records(parse_position_records(text.encode())))
+
+    assert len(by_csv) > 500
+    assert by_bytes == by_csv
+
+
+def test_padded_line_type_is_accepted():
+    records = parse_position_records(b"d,1700000000000, 41 ,17,5,1.0,2.0,0.5\n")
+    assert records == [(5, 17, 1700000000.0, 1.0, 2.0, 0.5)]
@@ -0,0 +1,91 @@
+import os
+
+import pytest
+
+from utils import log_watcher
+from utils.log_watcher import LOG_SUFFIX, LogTracker
+
+
+def _log(directory, stamp):
+    path = directory / f"2024_01_0{stamp}__00_00_00{LOG_SUFFIX}"
+    path.write_text("")
+    return path
+
+
+def _touch_dir(directory):
+    # Coarse directory timestamps could hide a change from the mtime fallback
+    st = os.stat(directory)
+    os.utime(directory, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture(params=[False, True], ids=["mtime", "inotify"])
+def watcher(request, tmp_path):
+    tracker = LogTracker(tmp_path, use_inotify=request.param)
+    seen = []
+    tracker.add_listener(seen.append)
+    yield tmp_path, tracker, seen
+    tracker.close()
+
+
+def test_listeners_hear_about_newer_logs(watcher):
+    logs_dir, tracker, seen = watcher
+    assert tracker.update() is None
+    assert tracker.current_log is None
+
+    first = _log(logs_dir, 1)
+    _touch_dir(logs_dir)
+    assert tracker.update() == first
+    assert tracker.current_log == first
+    assert seen == [first]
+    assert tracker.update() is None
+
+    second = _log(logs_dir, 2)
+    _touch_dir(logs_dir)
+    assert tracker.update() == second
+    assert seen == [first, second]
+
+    # An older log showing up is listed but does not switch
+    older = _log(logs_dir, 0)
+    _touch_dir(logs_dir)
+    assert tracker.update() is None
+    assert tracker.log_files() == [older, first, second]
+    assert seen == [first, second]
+
+    tracker.remove_listener(seen.append)
+    third = _log(logs_dir, 3)
+    _touch_dir(logs_dir)
+    assert tracker.update() == third
+    assert seen == [first, second]
+
+
+def test_listing_is_cached_until_the_directory_changes(watcher, monkeypatch):
+    logs_dir, tracker, _ = watcher
+    first = _log(logs_dir, 1)
+    (logs_dir / "notes.txt").write_text("")
+    assert tracker.update() == first
+    assert tracker.log_files() == [first]
+
+    scans = []
+    listing = log_watcher.list_log_files
+
+    def count_listing(path):
+        scans.append(path)
+        return listing(path)
+
+    monkeypatch.setattr(log_watcher, "list_log_files", count_listing)
+    for _ in range(5):
+        assert tracker.update() is None
+    assert scans == []
+
+    second = _log(logs_dir, 2)
+    _touch_dir(logs_dir)
+    assert tracker.update() == second
+    assert len(scans) == 1
+    assert tracker.log_files() == [first, second]
+
+    # Removing the newest log falls back to the one before it
+    second.unlink()
+    _touch_dir(logs_dir)
+    assert tracker.update() == first
+    assert tracker.log_files() == [first]
+    assert len(scans) == 2
@@ -0,0 +1,67 @@
+import os
+import types
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("matplotlib")
+
+# Must be set before utils.plotter is imported, or it selects TkAgg
+os.environ["MPLBACKEND"] = "Agg"
+
+from utils import plotter as plotter_module  # noqa: E402
+from utils.plotter import PositionPlotter  # noqa: E402
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = types.SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(plotter_module, "time", types.SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+@pytest.fixture
+def plotter(clock):
+    plotter = PositionPlotter(decay_seconds=5.0, trail_seconds=3.0, refresh_interval=0.0, show_pos=True)
+    yield plotter
+    plotter.close()
+
+
+def _artists(plotter):
+    ax = plotter.ax
+    return len(ax.lines), len(ax.collections), len(ax.texts)
+
+
+def test_artists_follow_beacons_appearing_and_expiring(plotter, clock):
+    assert plotter_module.matplotlib.get_backend().lower() == "agg"
+    assert _artists(plotter) == (2, 1, 0)
+
+    for cycle in range(5):
+        # Two anchors and a mobile, then a second mobile joins
+        for step in range(10):
+            clock.now += 0.1
+            plotter.update("STATIONARY", 1, 0.0, 0.0, 0.0)
+            plotter.update("STATIONARY", 2, 4.0, 0.0, 0.0)
+            plotter.update("MOBILE", 10, step * 0.1, 1.0, 0.0)
+        assert _artists(plotter) == (2, 2, 3)
+
+        for step in range(10):
+            clock.now += 0.1
+            plotter.update("MOBILE", 10, 1.0, 1.0 + step * 0.1, 0.0)
+            plotter.update("MOBILE", 11 + cycle, -step * 0.2, 2.0, 0.0)
+        assert _artists(plotter) == (2, 2, 4)
+
+        # Only the newest mobile keeps reporting, everything else expires
+        clock.now += 6.0
+        plotter.update("MOBILE", 11 + cycle, 0.0, 2.0, 0.0)
+        assert _artists(plotter) == (2, 2, 1)
+        assert sorted(plotter._labels) == [("MOBILE", 11 + cycle)]
+
+        # Then it goes quiet too
+        clock.now += 6.0
+        plotter.refresh()
+        assert _artists(plotter) == (2, 1, 0)
+        assert not plotter._trails
+
+    assert plotter.frames > 0
+    assert plotter.is_open
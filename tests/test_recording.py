@@ -0,0 +1,240 @@
+import json
+import types
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src.position_tracker import BeaconType, PositionSample
+from utils import recording
+from utils.recording import COLUMNS, INDEX_NAME, PositionRecorder, Recording
+
+
+def _record(directory, snapshots, **kwargs):
+    kwargs.setdefault("flush_interval", 0.0)
+    recorder = PositionRecorder(directory, **kwargs)
+    for ts_pub, beacons in snapshots:
+        recorder.write_snapshot(ts_pub, beacons)
+    recorder.close()
+
+
+def _snapshots(n, start=0):
+    """
+    n snapshots of a mobile (no ts_mm on odd rows) and an anchor, plus the
+    expected columns of each beacon.
+    """
+    snapshots = []
+    expected = {("mobile", 5): [], ("stationary", 1): []}
+    for i in range(start, start + n):
+        ts_pub = 1000.0 + i * 0.05
+        mobile = PositionSample(None if i % 2 else 500.0 + i, 10.0 + i, i * 0.1, -i * 0.2, 1.5)
+        anchor = PositionSample(400.0, 5.0, 0.0, 3.0, 2.0)
+        snapshots.append((ts_pub, [(BeaconType.MOBILE, 5, mobile), (BeaconType.STATIONARY, 1, anchor)]))
+        for key, pos in ((("mobile", 5), mobile), (("stationary", 1), anchor)):
+            ts_mm = np.nan if pos.ts_mm is None else pos.ts_mm
+            expected[key].append((ts_pub, ts_mm, pos.ts_read, pos.x, pos.y, pos.z))
+    return snapshots, {key: np.array(rows).T for key, rows in expected.items()}
+
+
+def _assert_columns(arrays, expected):
+    assert set(arrays) == set(COLUMNS)
+    for col, values in zip(COLUMNS, expected):
+        np.testing.assert_array_equal(arrays[col], values)
+
+
+def test_round_trip_single_segment(tmp_path):
+    snapshots, expected = _snapshots(20)
+    _record(tmp_path, snapshots)
+
+    rec = Recording(tmp_path)
+    assert rec.segments == ["seg-000000"]
+    assert rec.beacons() == [("mobile", 5), ("stationary", 1)]
+    assert rec.rows("mobile", 5) == 20
+
+    arrays = rec.arrays("mobile", 5)
+    _assert_columns(arrays, expected["mobile", 5])
+    # A single segment is served straight from the memory map
+    assert isinstance(arrays["x"], np.memmap)
+    assert not arrays["x"].flags.writeable
+    _assert_columns(rec.arrays("stationary", 1), expected["stationary", 1])
+    _assert_columns(rec.arrays("mobile", 99), np.empty((len(COLUMNS), 0)))
+
+
+def test_round_trip_across_segments(tmp_path):
+    snapshots, expected = _snapshots(23)
+    # Two beacons per snapshot: a segment rolls over every 5 snapshots
+    _record(tmp_path, snapshots, segment_rows=10)
+
+    rec = Recording(tmp_path)
+    assert len(rec.segments) >= 5
+    assert rec.rows("mobile", 5) == 23
+    _assert_columns(rec.arrays("mobile", 5), expected["mobile", 5])
+    _assert_columns(rec.arrays("stationary", 1), expected["stationary", 1])
+
+    parts = [rec.segment_arrays(segment, "mobile", 5) for segment in rec.segments]
+    assert all(len(p["ts_pub"]) <= 5 for p in parts)
+    stitched = {col: np.concatenate([p[col] for p in parts]) for col in COLUMNS}
+    _assert_columns(stitched, expected["mobile", 5])
+
+    for segment, part in zip(rec.index["segments"], parts):
+        if len(part["ts_pub"]):
+            assert segment["ts_pub"] == [part["ts_pub"][0], part["ts_pub"][-1]]
+
+
+def test_reopen_appends_a_new_segment(tmp_path):
+    first, expected_first = _snapshots(4)
+    second, expected_second = _snapshots(3, start=4)
+    _record(tmp_path, first)
+    _record(tmp_path, second)
+
+    rec = Recording(tmp_path)
+    assert rec.segments == ["seg-000000", "seg-000001"]
+    expected = np.concatenate([expected_first["mobile", 5], expected_second["mobile", 5]], axis=1)
+    _assert_columns(rec.arrays("mobile", 5), expected)
+
+
+def test_rows_are_published_only_when_flushed(tmp_path):
+    snapshots, expected = _snapshots(6)
+    recorder = PositionRecorder(tmp_path, flush_interval=3600.0)
+    for ts_pub, beacons in snapshots:
+        recorder.write_snapshot(ts_pub, beacons)
+    assert Recording(tmp_path).rows("mobile", 5) == 0
+
+    recorder.flush()
+    _assert_columns(Recording(tmp_path).arrays("mobile", 5), expected["mobile", 5])
+    recorder.close()
+
+
+def test_big_endian_hosts_write_little_endian(tmp_path, monkeypatch):
+    monkeypatch.setattr(recording, "sys", types.SimpleNamespace(byteorder="big"))
+    snapshots, expected = _snapshots(8)
+    _record(tmp_path, snapshots)
+
+    # On this (little-endian) host the swap shows up as big-endian bytes on disk
+    for col, values in zip(COLUMNS, expected["mobile", 5]):
+        raw = np.fromfile(tmp_path / "seg-000000" / f"mobile-5.{col}.f8", dtype=">f8")
+        np.testing.assert_array_equal(raw, values)
+
+    # The index is built from the unswapped values
+    with (tmp_path / INDEX_NAME).open() as f:
+        segment = json.load(f)["segments"][0]
+    assert segment["ts_pub"] == [snapshots[0][0], snapshots[-1][0]]
+    assert segment["rows"] == {"mobile-5": 8, "stationary-1": 8}
+
+
+def _query_recording(directory, monkeypatch):
+    """
+    Three beacons over several segments with a stride of 4, repeated
+    ts_pub values, and beacon 5 re-provisioned from mobile to stationary.
+    """
+    monkeypatch.setattr(recording, "SPARSE_STRIDE", 4)
+    recorder = PositionRecorder(directory, flush_interval=0.0, segment_rows=60)
+    rng = np.random.default_rng(3)
+    ts_pub = 100.0
+    for i in range(150):
+        ts_pub += float(rng.choice([0.0, 0.05, 0.1]))
+        beacons = [(BeaconType.STATIONARY, 1, PositionSample(None, ts_pub, 0.0, 0.0, 0.0))]
+        if i % 3:
+            beacons.append((BeaconType.MOBILE, 7, PositionSample(50.0 + i, ts_pub, i, 0.0, 0.0)))
+        beacon_type = BeaconType.MOBILE if i < 90 else BeaconType.STATIONARY
+        beacons.append((beacon_type, 5, PositionSample(50.0 + i, ts_pub, -i, 0.0, 0.0)))
+        recorder.write_snapshot(ts_pub, beacons)
+        # Flushes of uneven size put the marks at every offset within a flush
+        if i % 7 == 0:
+            recorder.flush()
+    recorder.close()
+    return Recording(directory)
+
+
+def _linear_scan(rec, beacon_ids, lo, hi, time_column):
+    result = {}
+    for key in rec.beacons():
+        if beacon_ids is not None and key[1] not in beacon_ids:
+            continue
+        arrays = rec.arrays(*key)
+        times = arrays[time_column]
+        mask = (times >= (-np.inf if lo is None else lo)) & (times <= (np.inf if hi is None else hi))
+        if mask.any():
+            result[key] = {col: values[mask] for col, values in arrays.items()}
+    return result
+
+
+def test_query_matches_linear_scan(tmp_path, monkeypatch):
+    rec = _query_recording(tmp_path, monkeypatch)
+    assert len(rec.segments) > 3
+    assert rec.beacons() == [("mobile", 5), ("mobile", 7), ("stationary", 1), ("stationary", 5)]
+
+    ts = rec.arrays("stationary", 1)["ts_pub"]
+    # Every recorded time (which covers every stride boundary and repeated value),
+    # points between them and beyond both ends
+    bounds = sorted(set(ts.tolist())) + [ts[0] - 1.0, ts[-1] + 1.0, (ts[10] + ts[11]) / 2 + 1e-6]
+    windows = [(None, None), (None, ts[40]), (ts[40], None)]
+    windows += [(lo, hi) for lo in bounds[::5] for hi in bounds[::7] if lo <= hi]
+    windows += [(ts[-1] + 1.0, ts[-1] + 2.0), (ts[30], ts[20])]
+
+    for beacon_ids in (None, [5], [1, 7], [42]):
+        for lo, hi in windows:
+            for time_column in ("ts_pub", "ts_mm"):
+                got = rec.query(beacon_ids, lo, hi, time_column=time_column)
+                expected = _linear_scan(rec, beacon_ids, lo, hi, time_column)
+                if time_column == "ts_mm":
+                    # Beacon 1 has no ts_mm, so it has no time order to search
+                    got.pop(("stationary", 1), None)
+                    expected.pop(("stationary", 1), None)
+                assert got.keys() == expected.keys(), (beacon_ids, lo, hi, time_column)
+                for key in expected:
+                    _assert_columns(got[key], [expected[key][col] for col in COLUMNS])
+
+
+def test_query_keeps_retyped_beacons_apart(tmp_path, monkeypatch):
+    rec = _query_recording(tmp_path, monkeypatch)
+    result = rec.query([5])
+    assert set(result) == {("mobile", 5), ("stationary", 5)}
+    for arrays in result.values():
+        assert (np.diff(arrays["ts_pub"]) >= 0).all()
+    assert result["mobile", 5]["ts_pub"][-1] <= result["stationary", 5]["ts_pub"][0]
+
+
+def test_query_skips_segments_outside_the_window(tmp_path, monkeypatch):
+    rec = _query_recording(tmp_path, monkeypatch)
+    searched = []
+    time_range = rec._time_range
+
+    def spy(segment, *args):
+        searched.append(segment["name"])
+        return time_range(segment, *args)
+
+    monkeypatch.setattr(rec, "_time_range", spy)
+    last = rec.index["segments"][-1]
+    rec.query(None, last["ts_pub"][0], None)
+    assert set(searched) <= {s["name"] for s in rec.index["segments"] if s["ts_pub"][1] >= last["ts_pub"][0]}
+    assert len(set(searched)) < len(rec.segments)
+
+
+def test_sparse_marks_live_next_to_the_columns(tmp_path, monkeypatch):
+    rec = _query_recording(tmp_path, monkeypatch)
+    with (tmp_path / INDEX_NAME).open() as f:
+        index = json.load(f)
+    assert index["sparse_stride"] == 4
+    assert all(set(segment) == {"name", "rows", "ts_pub"} for segment in index["segments"])
+
+    for segment in rec.segments:
+        for key in rec.beacons():
+            name = f"{key[0]}-{key[1]}"
+            ts_pub = rec.segment_arrays(segment, *key)["ts_pub"]
+            path = tmp_path / segment / f"{name}.ts_pub.idx"
+            if not len(ts_pub):
+                assert not path.exists()
+                continue
+            np.testing.assert_array_equal(np.fromfile(path, dtype="<f8"), ts_pub[::4])
+
+
+def test_query_without_idx_files(tmp_path, monkeypatch):
+    rec = _query_recording(tmp_path, monkeypatch)
+    for path in tmp_path.glob("*/*.idx"):
+        path.unlink()
+    rec = Recording(tmp_path)
+    ts = rec.arrays("stationary", 1)["ts_pub"]
+    got = rec.query([7], ts[33], ts[101])
+    expected = _linear_scan(rec, [7], ts[33], ts[101], "ts_pub")
+    _assert_columns(got["mobile", 7], [expected["mobile", 7][col] for col in COLUMNS])
@@ -0,0 +1,83 @@
+import math
+
+import pytest
+
+from src.position_tracker import PositionSample, SampleRing
+
+
+def _fill(ring, n, start=0):
+    for i in range(start, start + n):
+        ring.push(float(i), 100.0 + i, i, 2.0 * i, 3.0 * i)
+
+
+def test_push_and_index():
+    ring = SampleRing(4)
+    assert len(ring) == 0
+    with pytest.raises(IndexError):
+        ring[-1]
+
+    _fill(ring, 3)
+    assert len(ring) == 3
+    assert ring[0] == PositionSample(0.0, 100.0, 0.0, 0.0, 0.0)
+    assert ring[-1] == PositionSample(2.0, 102.0, 2.0, 4.0, 6.0)
+    assert ring[-1] == ring[2]
+    assert ring.last_position() == (2.0, 4.0, 6.0)
+    with pytest.raises(IndexError):
+        ring[3]
+
+
+def test_len_at_capacity_and_wraparound():
+    ring = SampleRing(4)
+    _fill(ring, 11)
+
+    assert len(ring) == 4
+    assert [s.ts_mm for s in ring] == [7.0, 8.0, 9.0, 10.0]
+    assert ring[-1].x == 10.0
+    assert ring[-4] == ring[0]
+    with pytest.raises(IndexError):
+        ring[-5]
+
+
+def test_missing_timestamp_round_trips_as_none():
+    ring = SampleRing(2)
+    ring.push(None, 1.0, 0.0, 0.0, 0.0)
+    assert ring[-1].ts_mm is None
+    assert math.isnan(ring.array()[-1, 0])
+
+
+def test_touch_updates_only_the_latest_timestamps():
+    ring = SampleRing(3)
+    _fill(ring, 5)  # head has wrapped
+    ring.touch(50.0, 150.0)
+
+    assert ring[-1] == PositionSample(50.0, 150.0, 4.0, 8.0, 12.0)
+    assert ring[-2] == PositionSample(3.0, 103.0, 3.0, 6.0, 9.0)
+    assert ring.array()[-1].tolist() == [50.0, 150.0, 4.0, 8.0, 12.0]
+
+    ring.touch(None, 151.0)
+    assert ring[-1].ts_mm is None
+
+
+@pytest.mark.parametrize("count", [1, 3, 4, 5, 8, 9, 13])
+def test_array_is_contiguous_across_wraparound(count):
+    np = pytest.importorskip("numpy")
+    ring = SampleRing(4)
+    _fill(ring, count)
+
+    arr = ring.array()
+    expected = [[float(i), 100.0 + i, i, 2.0 * i, 3.0 * i] for i in range(max(0, count - 4), count)]
+    assert arr.shape == (min(count, 4), 5)
+    assert arr.flags["C_CONTIGUOUS"]
+    assert arr.tolist() == expected
+    assert arr.tolist() == [[s.ts_mm, s.ts_read, s.x, s.y, s.z] for s in ring]
+    assert np.shares_memory(arr, ring.array())
+
+
+def test_clear():
+    ring = SampleRing(4)
+    _fill(ring, 6)
+    ring.clear()
+    assert len(ring) == 0
+    _fill(ring, 1, start=20)
+    assert ring[-1].ts_mm == 20.0
+    assert ring.array().tolist() == [[20.0, 120.0, 20.0, 40.0, 60.0]]
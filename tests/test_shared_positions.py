@@ -0,0 +1,192 @@
+import subprocess
+import sys
+import uuid
+
+import pytest
+
+from src.position_tracker import BeaconType, PositionSample
+from utils.shared_positions import (
+    COUNT,
+    COUNT_OFFSET,
+    GENERATION,
+    GENERATION_OFFSET,
+    HEADER,
+    RECORD,
+    RECORD_SEQ,
+    WRITER,
+    WRITER_OFFSET,
+    SharedPositionReader,
+    SharedPositionTable,
+    SharedRecord,
+)
+from utils.snapshot import Snapshot
+
+
+@pytest.fixture
+def name():
+    return f"mm_test_{uuid.uuid4().hex[:12]}"
+
+
+def test_second_writer_does_not_take_a_live_table(name):
+    table = SharedPositionTable(name, capacity=4)
+    try:
+        with pytest.raises(FileExistsError, match="in use"):
+            SharedPositionTable(name, capacity=4)
+        reader = SharedPositionReader(name)
+        assert reader.capacity == 4
+        reader.close()
+    finally:
+        table.stop()
+
+
+def test_replace_takes_over_a_live_table(name):
+    first = SharedPositionTable(name, capacity=4)
+    second = SharedPositionTable(name, capacity=8, replace=True)
+    try:
+        # The replaced writer must not remove the new segment
+        first.stop()
+        reader = SharedPositionReader(name)
+        assert reader.capacity == 8
+        reader.close()
+    finally:
+        first.stop()
+        second.stop()
+    with pytest.raises(FileNotFoundError):
+        SharedPositionReader(name)
+
+
+def test_table_of_an_exited_writer_is_replaced(name):
+    table = SharedPositionTable(name, capacity=4)
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    # Simulate a writer that died without stop()
+    WRITER.pack_into(table._buf, WRITER_OFFSET, exited.pid)
+
+    replacement = SharedPositionTable(name, capacity=8)
+    try:
+        reader = SharedPositionReader(name)
+        assert reader.capacity == 8
+        reader.close()
+    finally:
+        table.stop()
+        replacement.stop()
+
+
+def _snapshot(positions, version):
+    """
+    positions: {beacon id: x}; ids below 10 are mobile, the rest stationary.
+    """
+    return Snapshot(
+        100.0 + version,
+        [
+            (
+                BeaconType.MOBILE if bid < 10 else BeaconType.STATIONARY,
+                bid,
+                PositionSample(None if bid == 2 else 1000.0 + x, 50.0 + x, x, 2 * x, 0.5),
+            )
+            for bid, x in sorted(positions.items())
+        ],
+        version,
+    )
+
+
+def _expected(positions, versions):
+    return [
+        SharedRecord(
+            bid, "mobile" if bid < 10 else "stationary", x, 2 * x, 0.5, None if bid == 2 else 1000.0 + x, 50.0 + x, versions[bid]
+        )
+        for bid, x in positions.items()
+    ]
+
+
+@pytest.fixture
+def table(name):
+    table = SharedPositionTable(name, capacity=8)
+    reader = SharedPositionReader(name)
+    yield table, reader
+    reader.close()
+    table.stop()
+
+
+def test_update_read_and_get(table):
+    table, reader = table
+    assert reader.changed()
+    assert reader.read() == []
+    assert not reader.changed()
+    assert reader.get(1) is None
+
+    positions = {1: 1.0, 2: 2.0, 11: 3.0}
+    table.update(_snapshot(positions, 1))
+    assert reader.changed()
+    assert reader.read() == _expected(positions, {1: 1, 2: 1, 11: 1})
+    assert not reader.changed()
+    assert reader.get(2) == _expected(positions, {1: 1, 2: 1, 11: 1})[1]
+    assert reader.get(5) is None
+
+    # Only beacon 1 changed: the others keep their slot and version
+    seqs = [RECORD_SEQ.unpack_from(table._buf, HEADER.size + slot * RECORD.size)[0] for slot in range(3)]
+    positions[1] = 1.5
+    table.update(_snapshot(positions, 2))
+    assert reader.changed()
+    assert reader.read() == _expected(positions, {1: 2, 2: 1, 11: 1})
+    assert reader.get(1).x == 1.5
+    assert [RECORD_SEQ.unpack_from(table._buf, HEADER.size + slot * RECORD.size)[0] for slot in range(3)] == [
+        seqs[0] + 2,
+        seqs[1],
+        seqs[2],
+    ]
+
+
+def test_removing_beacons_compacts_the_slots(table):
+    table, reader = table
+    table.update(_snapshot({1: 1.0, 2: 2.0, 3: 3.0, 11: 4.0}, 1))
+    assert reader.get(11).x == 4.0
+    generation = GENERATION.unpack_from(table._buf, GENERATION_OFFSET)[0]
+
+    table.update(_snapshot({3: 3.0, 11: 4.0}, 2))
+    # Raised twice: odd while slots moved, even again afterwards
+    assert GENERATION.unpack_from(table._buf, GENERATION_OFFSET)[0] == generation + 2
+    assert COUNT.unpack_from(table._buf, COUNT_OFFSET)[0] == 2
+    assert reader.read() == _expected({3: 3.0, 11: 4.0}, {3: 1, 11: 1})
+    # get() rebuilds its slot index for the new generation
+    assert reader.get(11) == _expected({11: 4.0}, {11: 1})[0]
+    assert reader.get(1) is None
+
+    table.update(_snapshot({3: 3.0, 11: 4.0, 12: 5.0}, 3))
+    assert [r.beacon_id for r in reader.read()] == [3, 11, 12]
+    assert reader.get(12).version == 3
+
+    table.clear()
+    assert reader.read() == []
+    assert reader.get(3) is None
+
+
+def test_array_matches_read(table):
+    np = pytest.importorskip("numpy")
+    table, reader = table
+    positions = {1: 1.0, 2: 2.0, 11: 3.0}
+    table.update(_snapshot(positions, 4))
+    arr = reader.array()
+    assert len(arr) == 3
+    assert arr["id"].tolist() == [1, 2, 11]
+    assert arr["x"].tolist() == [1.0, 2.0, 3.0]
+    assert np.isnan(arr["ts_mm"][1])
+    assert (arr["version"] == 4).all()
+    assert not (arr["seq"] & 1).any()
+    assert not reader.changed()
+
+
+def test_reads_retry_while_a_record_is_mid_write(table):
+    table, reader = table
+    table.update(_snapshot({1: 1.0}, 1))
+    reader.READ_TIMEOUT = 0.05
+    # A writer that stopped halfway through a record leaves its seq odd
+    seq = RECORD_SEQ.unpack_from(table._buf, HEADER.size)[0]
+    RECORD_SEQ.pack_into(table._buf, HEADER.size, seq + 1)
+    with pytest.raises(TimeoutError):
+        reader.get(1)
+    with pytest.raises(TimeoutError):
+        reader.read()
+
+    RECORD_SEQ.pack_into(table._buf, HEADER.size, seq + 2)
+    assert reader.get(1).x == 1.0
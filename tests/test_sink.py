@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+from src.position_tracker import BeaconType, PositionSample
+from utils.sink import PositionSink
+
+
+class _Recorder:
+    def __init__(self):
+        self.snapshots = []
+
+    def write_snapshot(self, ts_pub, beacons):
+        self.snapshots.append(beacons)
+
+    def update(self, snapshot):
+        self.snapshots.append(snapshot)
+
+
+def _tracker():
+    mobile = {5: PositionSample(1.0, 10.0, 1.0, 2.0, 0.5)}
+    stationary = {1: PositionSample(1.0, 10.0, 0.0, 0.0, 0.0)}
+    return SimpleNamespace(
+        version=1, get_mobile_positions=lambda: dict(mobile), get_stationary_map=lambda: dict(stationary)
+    )
+
+
+def test_unchanged_tracker_is_logged_but_not_rebroadcast():
+    tracker = _tracker()
+    csv_writer, broadcaster = _Recorder(), _Recorder()
+    sink = PositionSink(csv_writer=csv_writer, broadcaster=broadcaster)
+
+    for _ in range(3):
+        sink.publish(tracker)
+    assert len(csv_writer.snapshots) == 3
+    assert len(broadcaster.snapshots) == 1
+    assert [(btype, bid) for btype, bid, _ in csv_writer.snapshots[-1]] == [
+        (BeaconType.MOBILE, 5),
+        (BeaconType.STATIONARY, 1),
+    ]
+
+    tracker.version = 2
+    sink.publish(tracker)
+    assert len(csv_writer.snapshots) == 4
+    assert len(broadcaster.snapshots) == 2
+    assert broadcaster.snapshots[-1].version == 2
+
+
+def test_broadcasters_alone_skip_unchanged_publishes():
+    tracker = _tracker()
+    broadcasters = [_Recorder(), _Recorder()]
+    sink = PositionSink(broadcaster=broadcasters)
+    sink.publish(tracker)
+    sink.publish(tracker)
+    assert [len(b.snapshots) for b in broadcasters] == [1, 1]
+    # Both get the same shared snapshot
+    assert broadcasters[0].snapshots[0] is broadcasters[1].snapshots[0]
@@ -0,0 +1,152 @@
+import pytest
+
+from src.position_tracker import BeaconType, PositionSample
+from utils.snapshot import Snapshot
+from utils.subscription_classes import ClientOptions, SubscriptionClass, SubscriptionClasses
+from utils.wire import ENCODING_BINARY, decode_frame
+
+
+def _snapshot(ts_pub, positions, version=None):
+    """
+    positions: {beacon id: x}; ids below 10 are mobile, the rest stationary.
+    A sample's read time follows its x, so unmoved beacons compare equal.
+    """
+    return Snapshot(
+        ts_pub,
+        [
+            (BeaconType.MOBILE if bid < 10 else BeaconType.STATIONARY, bid, PositionSample(None, x, x, 0.0, 0.0))
+            for bid, x in sorted(positions.items())
+        ],
+        version,
+    )
+
+
+def test_handshake_updates_options():
+    options = ClientOptions()
+    updated = options.updated(
+        {"ids": [3, 1], "types": ["mobile"], "rate_hz": 5, "encoding": "binary", "delta": True}, max_rate_hz=100
+    )
+    assert updated == ClientOptions(frozenset({1, 3}), frozenset({"mobile"}), 5.0, ENCODING_BINARY, True)
+    # Unmentioned fields are kept; None clears a filter
+    assert updated.updated({"ids": None}, 100) == updated._replace(ids=None)
+    assert updated.updated({}, 100) == updated
+    assert options.updated({"resync": True}, 100) == options
+
+
+def test_rate_is_capped():
+    assert ClientOptions().updated({"rate_hz": 500}, max_rate_hz=50).rate_hz == 50.0
+    assert ClientOptions().updated({"rate_hz": 2.5}, max_rate_hz=50).rate_hz == 2.5
+
+
+@pytest.mark.parametrize(
+    "handshake",
+    [
+        {"ids": 5},
+        {"ids": [1, "2"]},
+        {"ids": [1.0]},
+        {"types": ["anchor"]},
+        {"types": "mobile"},
+        {"types": ["removed"]},
+        {"rate_hz": 0},
+        {"rate_hz": -1},
+        {"rate_hz": "fast"},
+        {"encoding": "xml"},
+    ],
+)
+def test_invalid_handshakes_are_rejected(handshake):
+    with pytest.raises(ValueError):
+        ClientOptions().updated(handshake, max_rate_hz=100)
+
+
+def test_poll_follows_the_rate():
+    # Ticks of 1/64 s and an 8 Hz rate keep the arithmetic exact
+    cls = SubscriptionClass(ClientOptions(rate_hz=8.0), keyframe_interval=5.0)
+    sent = []
+    for tick in range(128):
+        now = tick / 64
+        if cls.poll(now, _snapshot(now, {1: now}), heartbeat_interval=None):
+            sent.append(now)
+    assert sent == [i / 8 for i in range(16)]
+
+    # After a stall the schedule restarts from now instead of bursting
+    assert cls.poll(5.0, _snapshot(5.0, {1: 5.0}), None)
+    assert not cls.poll(5.0625, _snapshot(5.0625, {1: 5.0625}), None)
+    assert cls.poll(5.125, _snapshot(5.125, {1: 5.125}), None)
+
+
+def test_unchanged_snapshots_wait_for_the_heartbeat():
+    cls = SubscriptionClass(ClientOptions(rate_hz=100.0), keyframe_interval=5.0)
+    snapshot = _snapshot(1.0, {1: 1.0})
+    assert cls.poll(0.0, snapshot, heartbeat_interval=0.5)
+    assert not cls.poll(0.1, snapshot, heartbeat_interval=0.5)
+    assert cls.poll(0.5, snapshot, heartbeat_interval=0.5)
+    assert not cls.poll(0.6, snapshot, heartbeat_interval=None)
+
+
+def test_filters_select_beacons_and_report_unchanged_views():
+    cls = SubscriptionClass(ClientOptions(ids=frozenset({1, 11}), types=frozenset({"mobile"})), keyframe_interval=5.0)
+    first = _snapshot(1.0, {1: 1.0, 2: 2.0, 11: 3.0})
+    assert cls.poll(0.0, first, None)
+    assert [b[1] for b in cls.current.beacons] == [1]
+
+    # Beacon 2 moved, but this class does not see it
+    other_moved = _snapshot(1.1, {1: 1.0, 2: 2.5, 11: 3.0})
+    assert not cls.poll(1.0, other_moved, None)
+    assert cls.poll(1.1, other_moved, heartbeat_interval=0.5)
+
+    mine_moved = _snapshot(1.2, {1: 1.5, 2: 2.5, 11: 3.0})
+    assert cls.poll(2.0, mine_moved, None)
+    assert cls.current.beacons[0][2].x == 1.5
+
+
+def test_message_encoding_and_deltas():
+    cls = SubscriptionClass(ClientOptions(encoding=ENCODING_BINARY, delta=True), keyframe_interval=1.0)
+    snapshot = _snapshot(1.0, {1: 1.0}, 1)
+    assert cls.poll(10.0, snapshot, None)
+    assert cls.keyframe_all
+    assert decode_frame(cls.message(pending=False))[0].is_keyframe
+
+    assert cls.poll(10.5, _snapshot(1.5, {1: 2.0}, 2), None)
+    assert not cls.keyframe_all
+    assert decode_frame(cls.message(pending=False))[0].is_delta
+    # Clients that joined since the last send get the same frame as a keyframe
+    assert decode_frame(cls.message(pending=True))[0].is_keyframe
+    assert cls.frames.seq == 2
+
+    assert cls.poll(11.0, _snapshot(2.0, {1: 3.0}, 3), None)
+    assert cls.keyframe_all
+    assert decode_frame(cls.message(pending=False))[0].is_keyframe
+
+
+def test_prepare_pending_serves_late_joiners():
+    cls = SubscriptionClass(ClientOptions(delta=True), keyframe_interval=5.0)
+    snapshot = _snapshot(1.0, {1: 1.0})
+    cls.prepare_pending(snapshot)
+    assert cls.current is not None
+    assert b'"kind": "key"' in cls.message(pending=True)
+    seq = cls.frames.seq
+    # A second late joiner gets the same frame, not a new sequence number
+    cls.prepare_pending(snapshot)
+    assert cls.frames.seq == seq
+
+
+def test_clients_rejoin_classes_when_options_change():
+    classes = SubscriptionClasses(keyframe_interval=5.0)
+    plain = ClientOptions()
+    binary = plain.updated({"encoding": "binary"}, 100)
+
+    a = classes.join(plain)
+    b = classes.join(plain)
+    assert a is b and a.members == 2 and len(classes) == 1
+
+    # Client b sends a handshake: it leaves its class and joins the matching one
+    classes.leave(b)
+    c = classes.join(binary)
+    assert c is not a and len(classes) == 2
+    assert classes.join(plain.updated({"encoding": "binary"}, 100)) is c
+    assert c.members == 2
+
+    classes.leave(a)
+    assert len(classes) == 1
+    assert classes.join(plain) is not a
+    assert classes.next_due() is not None
@@ -0,0 +1,62 @@
+import pytest
+
+from utils.udp_broadcaster import DATAGRAM_HEADER, DATAGRAM_MAGIC, UdpPositionReceiver
+
+
+def _datagram(seq, index=0, count=1, body=b""):
+    return DATAGRAM_HEADER.pack(DATAGRAM_MAGIC, seq & 0xFFFFFFFF, index, count) + (body or b"%d" % seq)
+
+
+@pytest.fixture
+def receiver():
+    receiver = UdpPositionReceiver(port=0, mode="broadcast")
+    yield receiver
+    receiver.close()
+
+
+def test_duplicates_and_older_snapshots_are_ignored(receiver):
+    assert receiver._accept(_datagram(5)) == b"5"
+    assert receiver._accept(_datagram(5)) is None
+    assert receiver._accept(_datagram(7)) == b"7"
+    assert receiver._accept(_datagram(6)) is None
+    assert receiver._accept(_datagram(7)) is None
+    assert receiver._accept(_datagram(8)) == b"8"
+
+    assert receiver.received == 3
+    assert receiver.stale == 3
+    assert receiver.lost == 1
+    assert receiver.incomplete == 0
+
+
+def test_duplicate_fragments_of_a_delivered_snapshot_are_ignored(receiver):
+    assert receiver._accept(_datagram(1, 0, 2, b"ab")) is None
+    assert receiver._accept(_datagram(1, 1, 2, b"cd")) == b"abcd"
+    assert receiver._accept(_datagram(1, 1, 2, b"cd")) is None
+    assert receiver._accept(_datagram(1, 0, 2, b"ab")) is None
+
+    # A stale datagram does not disturb a newer snapshot being reassembled
+    assert receiver._accept(_datagram(2, 0, 2, b"ef")) is None
+    assert receiver._accept(_datagram(1, 0, 2, b"ab")) is None
+    assert receiver._accept(_datagram(2, 1, 2, b"gh")) == b"efgh"
+    assert receiver.received == 2
+    assert receiver.incomplete == 0
+
+
+def test_sequence_wraparound(receiver):
+    assert receiver._accept(_datagram(0xFFFFFFFF)) is not None
+    assert receiver._accept(_datagram(0)) is not None
+    assert receiver._accept(_datagram(0xFFFFFFFF)) is None
+    assert receiver._accept(_datagram(1)) is not None
+    assert receiver.lost == 0
+    assert receiver.stale == 1
+
+
+def test_resyncs_after_broadcaster_restart(receiver):
+    assert receiver._accept(_datagram(1000)) is not None
+    for seq in range(1, UdpPositionReceiver.RESYNC_AFTER):
+        assert receiver._accept(_datagram(seq)) is None
+    seq = UdpPositionReceiver.RESYNC_AFTER
+    assert receiver._accept(_datagram(seq)) == b"%d" % seq
+    assert receiver._accept(_datagram(seq + 1)) is not None
+    assert receiver.lost == 0
+    assert receiver.incomplete == 0
@@ -0,0 +1,201 @@
+import json
+import random
+import socket
+import struct
+import time
+
+import pytest
+
+from src.position_tracker import BeaconType, PositionSample
+from utils.broadcaster import PositionBroadcaster
+from utils.snapshot import Snapshot
+from utils.wire import (
+    ENCODING_JSON,
+    HEADER,
+    MAGIC,
+    RECORD,
+    FrameReader,
+    decode_frame,
+    encode_frame,
+    encode_payload,
+    frame_to_payload,
+    handshake_line,
+    parse_handshake,
+)
+
+
+def _f32(value):
+    return struct.unpack("<f", struct.pack("<f", value))[0]
+
+
+def _beacons(n=5, seed=1):
+    rng = random.Random(seed)
+    beacons = []
+    for bid in range(1, n + 1):
+        btype = BeaconType.MOBILE if bid % 2 else BeaconType.STATIONARY
+        ts_mm = None if bid == 2 else 1_700_000_000.0 + rng.random()
+        pos = PositionSample(ts_mm, 100.0 + bid, rng.uniform(-50, 50), rng.uniform(-50, 50), rng.random())
+        beacons.append((btype, bid, pos))
+    return beacons
+
+
+def _binary_payload(snapshot):
+    """
+    The JSON payload as it survives the binary encoding (positions as float32).
+    """
+    payload = json.loads(snapshot.json_bytes())
+    for b in payload["beacons"]:
+        b["pos"] = {axis: _f32(v) for axis, v in b["pos"].items()}
+    return payload
+
+
+def test_json_round_trip():
+    snapshot = Snapshot(1234.5, _beacons(), 7)
+    line = snapshot.json_bytes()
+    assert line.endswith(b"\n") and line.count(b"\n") == 1
+    assert json.loads(line) == snapshot.payload
+    assert json.loads(line)["beacons"][1]["ts_mm"] is None
+
+
+def test_binary_round_trip():
+    beacons = _beacons()
+    snapshot = Snapshot(1234.5, beacons, 7)
+    data = snapshot.binary_bytes()
+    assert data[:4] == MAGIC
+    assert len(data) == HEADER.size + RECORD.size * len(beacons)
+
+    frame, used = decode_frame(data)
+    assert used == len(data)
+    assert frame.seq == 7 and frame.ts_pub == 1234.5
+    for (btype, bid, pos), record in zip(beacons, frame.records):
+        assert record == (bid, btype.value, _f32(pos.x), _f32(pos.y), _f32(pos.z), pos.ts_mm, pos.ts_read)
+    assert frame_to_payload(frame) == _binary_payload(snapshot)
+
+
+def test_payload_dicts_encode_like_beacons():
+    snapshot = Snapshot(99.0, _beacons(), 3)
+    from_dict = Snapshot.from_payload(json.loads(snapshot.json_bytes()))
+    assert encode_payload(from_dict.payload, 3) == encode_frame(99.0, snapshot.beacons, 3)
+
+
+def test_frame_reader_reassembles_partial_reads():
+    snapshots = [Snapshot(float(i), _beacons(i + 1, seed=i), i) for i in range(6)]
+    stream = b"".join(s.binary_bytes() for s in snapshots)
+    expected = [decode_frame(s.binary_bytes())[0] for s in snapshots]
+
+    rng = random.Random(4)
+    for _ in range(20):
+        reader = FrameReader()
+        frames = []
+        pos = 0
+        while pos < len(stream):
+            step = rng.randint(1, 2 * RECORD.size)
+            frames.extend(reader.feed(stream[pos : pos + step]))
+            pos += step
+        assert frames == expected
+
+    reader = FrameReader()
+    assert reader.feed(stream[: HEADER.size - 1]) == []
+    assert reader.feed(stream[HEADER.size - 1 :]) == expected
+
+
+def test_bad_magic_and_version_are_rejected():
+    data = bytearray(Snapshot(1.0, _beacons(1), 1).binary_bytes())
+    data[:4] = b"XXXX"
+    with pytest.raises(ValueError):
+        decode_frame(bytes(data))
+
+    data = bytearray(Snapshot(1.0, _beacons(1), 1).binary_bytes())
+    data[4] = 99
+    with pytest.raises(ValueError):
+        decode_frame(bytes(data))
+
+
+def test_handshake_parsing():
+    assert parse_handshake(handshake_line()) == {"encoding": "binary"}
+    assert parse_handshake(handshake_line(ENCODING_JSON)) == {"encoding": "json"}
+    assert parse_handshake(b'{"encoding": "binary"}') == {"encoding": "binary"}
+
+    assert parse_handshake(b"hello") is None
+    assert parse_handshake(b"[1, 2]") is None
+    assert parse_handshake(b'{"encoding": "xml"}') is None
+    assert parse_handshake(b"\xff\xfe") is None
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class _Client:
+    def __init__(self, port):
+        deadline = time.monotonic() + 5.0
+        while True:
+            try:
+                self.sock = socket.create_connection(("127.0.0.1", port), timeout=5.0)
+                break
+            except ConnectionRefusedError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+        self.buf = b""
+
+    def line(self):
+        while b"\n" not in self.buf:
+            self._recv()
+        line, self.buf = self.buf.split(b"\n", 1)
+        return line
+
+    def frame(self):
+        # Skips JSON lines still in flight from before the handshake took effect
+        while True:
+            while len(self.buf) < 4:
+                self._recv()
+            if self.buf[:4] != MAGIC:
+                self.line()
+                continue
+            frame, used = decode_frame(self.buf)
+            if frame is not None:
+                self.buf = self.buf[used:]
+                return frame
+            self._recv()
+
+    def _recv(self):
+        data = self.sock.recv(65536)
+        assert data, "server closed the connection"
+        self.buf += data
+
+
+def test_broadcaster_negotiates_binary():
+    port = _free_port()
+    broadcaster = PositionBroadcaster(host="127.0.0.1", port=port, rate_hz=50)
+    broadcaster.update(Snapshot(1.0, _beacons(), 1))
+    broadcaster.start()
+    client = _Client(port)
+    try:
+        # No handshake: newline-delimited JSON
+        assert json.loads(client.line())["beacons"][0]["id"] == 1
+
+        # An invalid handshake is ignored and the connection stays up
+        client.sock.sendall(b"not json\n")
+        snapshot = Snapshot(2.0, _beacons(seed=2), 2)
+        broadcaster.update(snapshot)
+        while True:
+            payload = json.loads(client.line())
+            if payload["ts_pub"] == 2.0:
+                break
+        assert payload == snapshot.payload
+
+        client.sock.sendall(handshake_line())
+        time.sleep(0.2)
+        snapshot = Snapshot(3.0, _beacons(seed=3), 3)
+        broadcaster.update(snapshot)
+        while True:
+            frame = client.frame()
+            if frame.ts_pub == 3.0:
+                break
+        assert frame_to_payload(frame) == _binary_payload(snapshot)
+    finally:
+        client.sock.close()
+        broadcaster.stop()
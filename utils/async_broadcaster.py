@@ -0,0 +1,376 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from utils.latency import STAGE_PUBLISH_TO_SEND
+from utils.logging_setup import get_logger
+from utils.snapshot import Snapshot
+from utils.subscription_classes import ClientOptions, SubscriptionClass, SubscriptionClasses
+from utils.wire import MAX_HANDSHAKE_LINE, parse_handshake
+
+logger = get_logger(__name__)
+
+SLOW_CLIENT_POLICIES = ("drop_oldest", "latest_only", "disconnect")
+
+
+class _Client:
+    def __init__(
+        self,
+        writer: asyncio.StreamWriter,
+        queue_size: int,
+        options: ClientOptions,
+        cls: SubscriptionClass,
+    ):
+        self.writer = writer
+        peer = writer.get_extra_info("peername") or ("?", 0)
+        self.addr = f"{peer[0]}:{peer[1]}"
+
+        # (message, ts_pub, ids) triples; ids lists the beacons to sample
+        # send latency for, and is None for all but one send per new snapshot
+        self.queue: deque = deque()
+        self.queue_size = queue_size
+        self.ready = asyncio.Event()
+        self.closed = False
+        self.options = options
+        self.cls = cls
+        # Nothing sent yet (or resync requested): next message is a full snapshot
+        self.pending = True
+        self.task: Optional[asyncio.Task] = None
+        self.reader_task: Optional[asyncio.Task] = None
+
+        self.sent_messages = 0
+        self.sent_bytes = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def metrics(self) -> Dict[str, object]:
+        return {
+            "addr": self.addr,
+            "encoding": self.options.encoding,
+            "delta": self.options.delta,
+            "rate_hz": self.options.rate_hz,
+            "queue_depth": len(self.queue),
+            "max_queue_depth": self.max_depth,
+            "dropped": self.dropped,
+            "sent_messages": self.sent_messages,
+            "sent_bytes": self.sent_bytes,
+            "write_buffer": self.writer.transport.get_write_buffer_size(),
+        }
+
+
+class AsyncPositionBroadcaster:
+    """
+    asyncio variant of PositionBroadcaster with the same start/stop/update API.
+
+    Each client has a bounded outgoing queue drained by its own writer task,
+    so a slow client only ever fills its own queue. When a queue is full the
+    slow client policy decides what happens:
+
+        drop_oldest   drop the oldest queued message
+        latest_only   drop everything queued and keep only the newest message
+        disconnect    close the client
+
+    Delta-mode clients are never left with a gap: when their queue
+    overflows it is replaced by a keyframe instead.
+
+    Clients negotiate beacon filters, rate, encoding and delta mode with
+    the same handshake as PositionBroadcaster, and are served per
+    subscription class.
+    """
+
+    WRITE_BUFFER_HIGH = 64 * 1024
+
+    def __init__(
+        self,
+        host="0.0.0.0",
+        port=5555,
+        rate_hz=20,
+        queue_size=8,
+        slow_client_policy="drop_oldest",
+        metrics_interval=5.0,
+        heartbeat_interval=1.0,
+        delta=False,
+        keyframe_interval=5.0,
+        max_rate_hz=100,
+        latency=None,
+    ):
+        if slow_client_policy not in SLOW_CLIENT_POLICIES:
+            raise ValueError(
+                f"slow_client_policy must be one of {SLOW_CLIENT_POLICIES}, got {slow_client_policy!r}"
+            )
+
+        self.host = host
+        self.port = port
+        self.period = 1.0 / rate_hz
+        self.queue_size = queue_size
+        self.slow_client_policy = slow_client_policy
+        self.metrics_interval = metrics_interval
+        # Resend an unchanged snapshot after this many seconds, so clients can tell
+        # a quiet tracker from a dead link; None never resends
+        self.heartbeat_interval = heartbeat_interval
+        self.max_rate_hz = max_rate_hz
+        # For clients that send no handshake
+        self.default_options = ClientOptions(rate_hz=min(float(rate_hz), max_rate_hz), delta=delta)
+        # LatencyTracker for publish-to-send times, if set
+        self.latency = latency
+
+        self._clients: List[_Client] = []
+        self._latest_payload: Optional[Snapshot] = None
+        self._classes = SubscriptionClasses(keyframe_interval)
+        self._disconnected_slow = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._started = threading.Event()
+        self._stop: Optional[asyncio.Event] = None
+        self._error: Optional[BaseException] = None
+
+        self._last_broadcast_log = 0.0
+        self._last_metrics_log = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._started.wait()
+        if self._error is not None:
+            raise self._error
+        logger.info(
+            "Async broadcaster started on %s:%d at %.1f Hz (policy %s, queue %d)",
+            self.host,
+            self.port,
+            1.0 / self.period,
+            self.slow_client_policy,
+            self.queue_size,
+        )
+
+    def stop(self):
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        logger.info("Async broadcaster stopped")
+
+    def update(self, payload):
+        """
+        Set the snapshot to broadcast. Accepts a Snapshot or a payload dict.
+        """
+        if not isinstance(payload, Snapshot):
+            payload = Snapshot.from_payload(payload)
+        self._latest_payload = payload
+
+    def metrics(self) -> Dict[str, object]:
+        """
+        Backpressure metrics: totals plus per-client queue depth, drops and bytes sent.
+        """
+        clients = [c.metrics() for c in list(self._clients)]
+        return {
+            "clients": len(clients),
+            "subscription_classes": len(self._classes),
+            "dropped": sum(c["dropped"] for c in clients),
+            "disconnected_slow": self._disconnected_slow,
+            "max_queue_depth": max((c["queue_depth"] for c in clients), default=0),
+            "per_client": clients,
+        }
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._serve())
+        except Exception as e:
+            logger.exception("Async broadcaster failed")
+            self._error = e
+        finally:
+            self._loop.close()
+            self._started.set()
+
+    async def _serve(self):
+        self._stop = asyncio.Event()
+        server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        if self.port == 0:
+            self.port = server.sockets[0].getsockname()[1]
+        self._started.set()
+        logger.info("Async broadcaster listening for clients")
+
+        broadcast = asyncio.create_task(self._broadcast_loop())
+        try:
+            await self._stop.wait()
+        finally:
+            broadcast.cancel()
+            server.close()
+            tasks = [t for c in self._clients for t in (c.task, c.reader_task) if t is not None]
+            for c in list(self._clients):
+                self._close_client(c)
+            if tasks:
+                await asyncio.wait(tasks, timeout=1.0)
+            await server.wait_closed()
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        writer.transport.set_write_buffer_limits(high=self.WRITE_BUFFER_HIGH)
+        options = self.default_options
+        client = _Client(writer, self.queue_size, options, self._classes.join(options))
+        client.task = asyncio.current_task()
+        client.reader_task = asyncio.create_task(self._read_handshakes(client, reader))
+        self._clients.append(client)
+        logger.info("Client connected from %s", client.addr)
+
+        try:
+            while not client.closed:
+                if not client.queue:
+                    client.ready.clear()
+                    await client.ready.wait()
+                    continue
+
+                msg, ts_pub, fresh = client.queue.popleft()
+                writer.write(msg)
+                # Waits only on this client's socket; other clients keep being served
+                await writer.drain()
+                client.sent_messages += 1
+                client.sent_bytes += len(msg)
+                if fresh is not None:
+                    self.latency.record_beacons(STAGE_PUBLISH_TO_SEND, time.time() - ts_pub, fresh)
+        except (ConnectionError, OSError) as e:
+            if not client.closed:
+                logger.warning("Client %s disconnected: %s", client.addr, e)
+        finally:
+            self._close_client(client)
+
+    async def _read_handshakes(self, client: _Client, reader: asyncio.StreamReader):
+        """
+        Apply handshake lines (filters, rate, encoding, delta mode, resync
+        requests) sent by the client until it disconnects.
+        """
+        try:
+            while not client.closed:
+                line = await reader.readline()
+                if not line:
+                    break
+                if len(line) > MAX_HANDSHAKE_LINE:
+                    logger.warning("Ignoring oversized handshake from %s", client.addr)
+                    continue
+                handshake = parse_handshake(line)
+                try:
+                    if handshake is None:
+                        raise ValueError("not a JSON object")
+                    options = client.options.updated(handshake, self.max_rate_hz)
+                except ValueError as e:
+                    logger.warning("Ignoring invalid handshake from %s: %r (%s)", client.addr, line[:80], e)
+                    continue
+
+                if options != client.options and not client.closed:
+                    self._classes.leave(client.cls)
+                    client.options = options
+                    client.cls = self._classes.join(options)
+                    client.pending = True
+                    logger.info("Client %s subscribed with %s", client.addr, options)
+                if handshake.get("resync"):
+                    client.pending = True
+        except (ConnectionError, OSError, ValueError):
+            pass
+        finally:
+            # The peer closed its side; stop writing to it as well
+            self._close_client(client)
+
+    def _close_client(self, client: _Client):
+        if client.closed:
+            return
+        client.closed = True
+        client.ready.set()
+        self._classes.leave(client.cls)
+        try:
+            self._clients.remove(client)
+        except ValueError:
+            pass
+        # abort() rather than close(): never wait to flush a slow client's buffer
+        client.writer.transport.abort()
+
+    def _offer(self, client: _Client, msg: bytes, ts_pub: float, fresh: Optional[List[int]] = None):
+        queue = client.queue
+
+        if len(queue) >= client.queue_size:
+            if self.slow_client_policy == "disconnect":
+                logger.warning("Disconnecting slow client %s (queue full)", client.addr)
+                self._disconnected_slow += 1
+                self._close_client(client)
+                return
+            if self.slow_client_policy == "latest_only":
+                client.dropped += len(queue)
+                queue.clear()
+            else:
+                client.dropped += 1
+                queue.popleft()
+
+        queue.append((msg, ts_pub, fresh))
+        if len(queue) > client.max_depth:
+            client.max_depth = len(queue)
+        client.ready.set()
+
+    async def _broadcast_loop(self):
+        next_tick = time.monotonic()
+        while True:
+            source = self._latest_payload
+            sent = False
+            if source is not None and self._clients:
+                now = time.monotonic()
+                members = {}
+                for c in self._clients:
+                    members.setdefault(c.cls, []).append(c)
+
+                for cls, clients in members.items():
+                    if cls.poll(now, source, self.heartbeat_interval):
+                        targets = clients
+                    else:
+                        # Nothing due: only clients still waiting for a full snapshot
+                        targets = [c for c in clients if c.pending]
+                        if not targets:
+                            continue
+                        cls.prepare_pending(source)
+
+                    # Sampled on the first member's send only
+                    fresh = cls.take_fresh() if self.latency is not None else None
+                    for c in targets:
+                        overflow = len(c.queue) >= c.queue_size
+                        if cls.options.delta and overflow and self.slow_client_policy != "disconnect":
+                            # Dropping any delta would leave a gap; restart from a keyframe
+                            c.dropped += len(c.queue)
+                            c.queue.clear()
+                            c.pending = True
+                        # Encoded once per class and shared by its members
+                        self._offer(c, cls.message(c.pending), source.ts_pub, fresh)
+                        c.pending = False
+                        fresh = None
+                    sent = True
+
+                if sent and now - self._last_broadcast_log >= 1.0:
+                    logger.info(
+                        "Broadcasted %d beacons to %d clients in %d subscription classes",
+                        source.beacon_count,
+                        len(self._clients),
+                        len(self._classes),
+                    )
+                    self._last_broadcast_log = now
+
+            now = time.monotonic()
+            if self._clients and now - self._last_metrics_log >= self.metrics_interval:
+                m = self.metrics()
+                logger.info(
+                    "Broadcaster backpressure: %d clients, %d dropped, %d slow disconnects, max queue %d",
+                    m["clients"],
+                    m["dropped"],
+                    m["disconnected_slow"],
+                    m["max_queue_depth"],
+                )
+                self._last_metrics_log = now
+
+            next_tick += self.period
+            if next_tick < now:
+                # Fell behind; resynchronise instead of bursting to catch up
+                next_tick = now
+            # Wake for the next class that is due, and at least every period
+            wake = next_tick
+            next_due = self._classes.next_due() if source is not None else None
+            if next_due is not None and next_due < wake:
+                wake = next_due
+            await asyncio.sleep(max(0.0, wake - time.monotonic()))
@@ -1,20 +1,64 @@
-import json
+import select
 import socket
 import threading
 import time
 
+from utils.latency import STAGE_PUBLISH_TO_SEND
 from utils.logging_setup import get_logger
+from utils.snapshot import Snapshot
+from utils.subscription_classes import ClientOptions, SubscriptionClass, SubscriptionClasses
+from utils.wire import MAX_HANDSHAKE_LINE, parse_handshake
 
 logger = get_logger(__name__)
 
 
+class _ClientState:
+    __slots__ = ("options", "cls", "pending", "buf")
+
+    def __init__(self, options: ClientOptions, cls: SubscriptionClass):
+        self.options = options
+        self.cls = cls
+        # Nothing sent yet (or resync requested): next message is a full snapshot
+        self.pending = True
+        self.buf = b""
+
+
 class PositionBroadcaster:
-    def __init__(self, host="0.0.0.0", port=5555, rate_hz=20):
+    """
+    Streams snapshots to TCP clients.
+
+    A client may send handshake lines to pick the beacons it wants ("ids",
+    "types"), its maximum rate ("rate_hz", capped at max_rate_hz), its
+    encoding and delta mode. Clients with the same choices form one
+    subscription class, which is scheduled, filtered and encoded once.
+    """
+
+    def __init__(
+        self,
+        host="0.0.0.0",
+        port=5555,
+        rate_hz=20,
+        heartbeat_interval=1.0,
+        delta=False,
+        keyframe_interval=5.0,
+        max_rate_hz=100,
+        latency=None,
+    ):
         self.host = host
         self.port = port
         self.period = 1.0 / rate_hz
+        # Resend an unchanged snapshot after this many seconds, so clients can tell
+        # a quiet tracker from a dead link; None never resends
+        self.heartbeat_interval = heartbeat_interval
+        self.max_rate_hz = max_rate_hz
+        # For clients that send no handshake
+        self.default_options = ClientOptions(rate_hz=min(float(rate_hz), max_rate_hz), delta=delta)
+        # LatencyTracker for publish-to-send times, if set
+        self.latency = latency
 
         self._clients = []
+        self._state = {}  # client socket -> _ClientState
+        self._classes = SubscriptionClasses(keyframe_interval)
         self._lock = threading.Lock()
         self._running = False
         self._latest_payload = None
@@ -35,12 +79,16 @@ class PositionBroadcaster:
     def stop(self):
         self._running = False
         with self._lock:
-            for c in self._clients:
-                c.close()
-            self._clients.clear()
+            for c in list(self._clients):
+                self._drop_client(c)
         logger.info("Broadcaster stopped")
 
-    def update(self, payload: dict):
+    def update(self, payload):
+        """
+        Set the snapshot to broadcast. Accepts a Snapshot or a payload dict.
+        """
+        if not isinstance(payload, Snapshot):
+            payload = Snapshot.from_payload(payload)
         self._latest_payload = payload
 
     def _accept_loop(self):
@@ -57,39 +105,128 @@ class PositionBroadcaster:
                 conn.setblocking(False)
                 with self._lock:
                     self._clients.append(conn)
+                    options = self.default_options
+                    self._state[conn] = _ClientState(options, self._classes.join(options))
                 logger.info("Client connected from %s:%d", addr[0], addr[1])
             except Exception:
                 time.sleep(0.1)
 
+    def _drop_client(self, c):
+        c.close()
+        self._clients.remove(c)
+        state = self._state.pop(c, None)
+        if state is not None:
+            self._classes.leave(state.cls)
+
+    def _read_handshakes(self):
+        """
+        Apply handshake lines (filters, rate, encoding, delta mode, resync
+        requests) sent by clients. Must be called with the lock held.
+        """
+        if not self._clients:
+            return
+        try:
+            readable, _, _ = select.select(self._clients, [], [], 0)
+        except (OSError, ValueError):
+            return
+
+        for c in readable:
+            try:
+                data = c.recv(MAX_HANDSHAKE_LINE)
+            except BlockingIOError:
+                continue
+            except OSError:
+                data = b""
+            if not data:
+                self._drop_client(c)
+                logger.info("Client disconnected")
+                continue
+
+            state = self._state[c]
+            buf = state.buf + data
+            while b"\n" in buf:
+                line, buf = buf.split(b"\n", 1)
+                handshake = parse_handshake(line)
+                try:
+                    if handshake is None:
+                        raise ValueError("not a JSON object")
+                    options = state.options.updated(handshake, self.max_rate_hz)
+                except ValueError as e:
+                    logger.warning("Ignoring invalid client handshake %r: %s", line[:80], e)
+                    continue
+
+                if options != state.options:
+                    self._classes.leave(state.cls)
+                    state.options = options
+                    state.cls = self._classes.join(options)
+                    state.pending = True
+                    logger.info("Client subscribed with %s", options)
+                if handshake.get("resync"):
+                    state.pending = True
+            state.buf = buf[-MAX_HANDSHAKE_LINE:]
+
     def _broadcast_loop(self):
         while self._running:
-            if self._latest_payload is not None:
-                msg = json.dumps(self._latest_payload).encode() + b"\n"
+            source = self._latest_payload
+            sent = 0
 
-                with self._lock:
-                    dead = []
+            with self._lock:
+                self._read_handshakes()
+
+                if source is not None:
+                    now = time.monotonic()
+                    members = {}
                     for c in self._clients:
-                        try:
-                            c.sendall(msg)
-                        except Exception:
-                            dead.append(c)
+                        members.setdefault(self._state[c].cls, []).append(c)
+
+                    dead = []
+                    for cls, clients in members.items():
+                        if cls.poll(now, source, self.heartbeat_interval):
+                            targets = clients
+                        else:
+                            # Nothing due: only clients still waiting for a full snapshot
+                            targets = [c for c in clients if self._state[c].pending]
+                            if not targets:
+                                continue
+                            cls.prepare_pending(source)
+
+                        for c in targets:
+                            state = self._state[c]
+                            try:
+                                c.sendall(cls.message(state.pending))
+                                state.pending = False
+                                sent += 1
+                            except Exception:
+                                dead.append(c)
+                                continue
+                            if self.latency is not None:
+                                fresh = cls.take_fresh()
+                                if fresh is not None:
+                                    self.latency.record_beacons(
+                                        STAGE_PUBLISH_TO_SEND, time.time() - source.ts_pub, fresh
+                                    )
 
                     for c in dead:
-                        c.close()
-                        self._clients.remove(c)
+                        self._drop_client(c)
                         logger.warning("Client disconnected due to send failure")
 
-                    client_count = len(self._clients)
-
-                # Throttled broadcast logging (once per second) if we have clients
-                now = time.monotonic()
-                if now - self._last_broadcast_log >= 1.0 and client_count > 0:
-                    beacon_count = len(self._latest_payload.get("beacons", []))
-                    logger.info(
-                        "Broadcasted %d beacons to %d clients",
-                        beacon_count,
-                        client_count,
-                    )
-                    self._last_broadcast_log = now
-
-            time.sleep(self.period)
+                client_count = len(self._clients)
+                class_count = len(self._classes)
+                next_due = self._classes.next_due() if source is not None else None
+
+            # Throttled broadcast logging (once per second) if we have clients
+            now = time.monotonic()
+            if sent and now - self._last_broadcast_log >= 1.0:
+                logger.info(
+                    "Broadcasted %d beacons to %d clients in %d subscription classes",
+                    source.beacon_count,
+                    client_count,
+                    class_count,
+                )
+                self._last_broadcast_log = now
+
+            # Wake for the next class that is due, and at least every period for handshakes
+            wake = now + self.period
+            if next_due is not None and next_due < wake:
+                wake = next_due
+            time.sleep(max(0.0, wake - time.monotonic()))
@@ -1,38 +1,131 @@
-import csv
+import gzip
+import os
+import queue
+import shutil
+import threading
 import time
+from datetime import datetime
 from pathlib import Path
-from typing import Iterable, Tuple
+from typing import Iterable, List, Optional, Tuple
 
 from utils.logging_setup import get_logger
 logger = get_logger(__name__)
 
 from src.position_tracker import PositionSample, BeaconType
 
+try:
+    import zstandard
+except ImportError:  # zstd compression is optional; gzip is always available
+    zstandard = None
+
+FLUSH_POLICIES = ("always", "bytes", "time", "fsync")
+COMPRESSIONS = (None, "gzip", "zstd")
+
+HEADER = "ts_pub,ts_mm,ts_read,beacon_type,beacon_id,x,y,z\r\n"
+# Same fields and precision csv.writer produced from the f-strings before
+ROW_FORMAT = "%.6f,%s,%.6f,%s,%d,%.6f,%.6f,%.6f\r\n"
+
 
 class PositionCSVWriter:
-    def __init__(self, output_path: Path, rate_hz: float = 5.0):
-        self._file = output_path.open("w", newline="")
-        self._writer = csv.writer(self._file)
+    """
+    Writes throttled position snapshots to CSV.
+
+    At most rate_hz snapshots per second are written. A snapshot that
+    arrives inside the throttle period is held back, replaced by any newer
+    one, and written when the period ends, so the last state before
+    updates stop is never lost.
+
+    With background=True snapshots are queued and formatted, written and
+    flushed in batches on a writer thread, so a slow disk never blocks the
+    caller; if the queue is full the snapshot is dropped and counted.
+
+    flush_policy decides when buffered rows reach the OS:
+
+        always  after every write (the default)
+        bytes   once flush_bytes have been written since the last flush
+        time    every flush_interval seconds
+        fsync   every flush_interval seconds, followed by os.fsync()
+
+    The time and fsync policies and rotate_interval are also checked while
+    no snapshots arrive: by the writer thread, or by a timer in inline mode.
+
+    Output rotates when the active file exceeds rotate_bytes or is older
+    than rotate_interval seconds. Closed segments are renamed with a
+    timestamp and optionally compressed with gzip or zstd on a helper
+    thread, in both modes, so rotation never stalls the caller.
+    """
+
+    def __init__(
+        self,
+        output_path: Path,
+        rate_hz: float = 5.0,
+        background: bool = False,
+        flush_policy: str = "always",
+        flush_bytes: int = 64 * 1024,
+        flush_interval: float = 1.0,
+        rotate_bytes: Optional[int] = None,
+        rotate_interval: Optional[float] = None,
+        compression: Optional[str] = None,
+        queue_size: int = 1024,
+    ):
+        if flush_policy not in FLUSH_POLICIES:
+            raise ValueError(f"flush_policy must be one of {FLUSH_POLICIES}, got {flush_policy!r}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"compression must be one of {COMPRESSIONS}, got {compression!r}")
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package")
+
+        self.output_path = output_path
+        self.flush_policy = flush_policy
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.rotate_bytes = rotate_bytes
+        self.rotate_interval = rotate_interval
+        self.compression = compression
 
         self._period = 1.0 / rate_hz
         self._last_write_ts = 0.0
+        # Newest throttled snapshot, written by the timer when the period ends
+        self._trailing: Optional[Tuple[float, list]] = None
+        self._trailing_timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        self._closed = False
 
-        self._writer.writerow([
-            "ts_pub",
-            "ts_mm",
-            "ts_read",
-            "beacon_type",
-            "beacon_id",
-            "x",
-            "y",
-            "z",
-        ])
-        self._file.flush()
+        self._compressors: List[threading.Thread] = []
+
+        # How often time-based flushing and rotation are checked when idle
+        intervals = []
+        if flush_policy in ("time", "fsync"):
+            intervals.append(flush_interval)
+        if rotate_interval is not None:
+            intervals.append(rotate_interval)
+        self._tick_interval = min(intervals) if intervals else None
+        self._tick_timer: Optional[threading.Timer] = None
+
+        self._file = None
+        self._file_bytes = 0
+        self._file_opened = 0.0
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+        self._open_segment()
+
+        self.dropped = 0
+        self._last_drop_log = 0.0
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        if background:
+            self._queue = queue.Queue(maxsize=queue_size)
+            self._thread = threading.Thread(target=self._writer_loop, daemon=True)
+            self._thread.start()
+        elif self._tick_interval is not None:
+            self._schedule_tick()
 
         logger.info(
-            "CSV writer opened at %s (rate %.1f Hz)",
+            "CSV writer opened at %s (rate %.1f Hz, %s, flush %s)",
             output_path,
             rate_hz,
+            "background" if background else "inline",
+            flush_policy,
         )
 
     def write_snapshot(
@@ -40,40 +133,228 @@ class PositionCSVWriter:
         ts_pub: float,
         beacons: Iterable[Tuple[BeaconType, int, PositionSample]],
     ) -> None:
-        now = time.monotonic()
-
-        if now - self._last_write_ts < self._period:
-            logger.debug("CSV write throttled")
-            return
-
-        rows = []
-        for beacon_type, beacon_id, pos in beacons:
-            rows.append([
-                f"{ts_pub:.6f}",
-                f"{pos.ts_mm:.6f}" if pos.ts_mm is not None else "",
-                f"{pos.ts_read:.6f}",
-                beacon_type.value,
-                beacon_id,
-                f"{pos.x:.6f}",
-                f"{pos.y:.6f}",
-                f"{pos.z:.6f}",
-            ])
-
-        if not rows:
+        beacons = list(beacons)
+        if not beacons:
             logger.debug("CSV snapshot empty, skipping")
             return
 
-        self._writer.writerows(rows)
-        self._file.flush()
+        with self._lock:
+            if self._closed:
+                return
+            now = time.monotonic()
+            wait = self._period - (now - self._last_write_ts)
+            if wait > 0:
+                logger.debug("CSV write throttled")
+                self._trailing = (ts_pub, beacons)
+                if self._trailing_timer is None:
+                    self._trailing_timer = threading.Timer(wait, self._write_trailing)
+                    self._trailing_timer.daemon = True
+                    self._trailing_timer.start()
+                return
+
+            self._trailing = None
+            self._emit(ts_pub, beacons, now)
+
+    def _write_trailing(self) -> None:
+        with self._lock:
+            self._trailing_timer = None
+            if self._closed or self._trailing is None:
+                return
+            ts_pub, beacons = self._trailing
+            self._trailing = None
+            try:
+                self._emit(ts_pub, beacons, time.monotonic())
+            except OSError:
+                logger.exception("CSV write failed, 1 snapshot lost")
 
+    def _schedule_tick(self) -> None:
+        self._tick_timer = threading.Timer(self._tick_interval, self._tick)
+        self._tick_timer.daemon = True
+        self._tick_timer.start()
+
+    def _tick(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            try:
+                # An empty batch only applies the flush policy and rotation
+                self._write_batch([])
+            except OSError:
+                logger.exception("CSV flush failed")
+            self._schedule_tick()
+
+    def _emit(self, ts_pub: float, beacons: list, now: float) -> None:
+        # Must be called with the lock held
         self._last_write_ts = now
 
-        logger.debug(
-            "CSV snapshot written: %d beacons at ts_pub=%.6f",
-            len(rows),
-            ts_pub,
-        )
+        if self._queue is None:
+            self._write_batch([(ts_pub, beacons)])
+            return
+
+        try:
+            self._queue.put_nowait((ts_pub, beacons))
+        except queue.Full:
+            self.dropped += 1
+            if now - self._last_drop_log >= 5.0:
+                logger.warning("CSV writer queue full, %d snapshots dropped so far", self.dropped)
+                self._last_drop_log = now
 
     def close(self) -> None:
         logger.info("Closing CSV writer")
+        with self._lock:
+            if self._trailing_timer is not None:
+                self._trailing_timer.cancel()
+                self._trailing_timer = None
+            if self._tick_timer is not None:
+                self._tick_timer.cancel()
+                self._tick_timer = None
+            if self._trailing is not None:
+                # The last state is written even if the throttle period has not ended
+                ts_pub, beacons = self._trailing
+                self._trailing = None
+                self._emit(ts_pub, beacons, time.monotonic())
+            self._closed = True
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self._flush(fsync=self.flush_policy == "fsync")
         self._file.close()
+        for thread in self._compressors:
+            thread.join()
+        self._compressors = []
+
+    def _writer_loop(self) -> None:
+        timeout = self._tick_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = ()
+
+            batch = []
+            stop = item is None
+            if item:
+                batch.append(item)
+            # Drain whatever else is queued so it is written in one go
+            while not stop:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+
+            try:
+                self._write_batch(batch)
+            except OSError:
+                logger.exception("CSV write failed, %d snapshots lost", len(batch))
+
+            if stop:
+                return
+
+    def _write_batch(self, batch: List[Tuple[float, list]]) -> None:
+        if batch:
+            lines = []
+            for ts_pub, beacons in batch:
+                for beacon_type, beacon_id, pos in beacons:
+                    lines.append(
+                        ROW_FORMAT
+                        % (
+                            ts_pub,
+                            "%.6f" % pos.ts_mm if pos.ts_mm is not None else "",
+                            pos.ts_read,
+                            beacon_type.value,
+                            beacon_id,
+                            pos.x,
+                            pos.y,
+                            pos.z,
+                        )
+                    )
+            data = "".join(lines)
+            self._file.write(data)
+            self._file_bytes += len(data)
+            self._unflushed += len(data)
+
+            logger.debug(
+                "CSV batch written: %d snapshots, %d rows",
+                len(batch),
+                len(lines),
+            )
+
+        now = time.monotonic()
+        policy = self.flush_policy
+        if policy == "always":
+            if batch:
+                self._flush()
+        elif policy == "bytes":
+            if self._unflushed >= self.flush_bytes:
+                self._flush()
+        elif now - self._last_flush >= self.flush_interval:
+            self._flush(fsync=policy == "fsync")
+
+        # A segment holding only the header is not rotated, so idle periods leave no empty files
+        if self._file_bytes > len(HEADER) and (
+            (self.rotate_bytes is not None and self._file_bytes >= self.rotate_bytes)
+            or (self.rotate_interval is not None and now - self._file_opened >= self.rotate_interval)
+        ):
+            self._rotate()
+
+    def _flush(self, fsync: bool = False) -> None:
+        if self._unflushed or fsync:
+            self._file.flush()
+            if fsync:
+                os.fsync(self._file.fileno())
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def _open_segment(self) -> None:
+        self._file = self.output_path.open("w", newline="", buffering=1024 * 1024)
+        self._file.write(HEADER)
+        self._file.flush()
+        self._file_bytes = len(HEADER)
+        self._file_opened = time.monotonic()
+        self._unflushed = 0
+
+    def _rotate(self) -> None:
+        self._flush(fsync=self.flush_policy == "fsync")
+        self._file.close()
+
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = self.output_path
+        segment = path.with_name(f"{path.stem}.{stamp}{path.suffix}")
+        n = 1
+        while segment.exists() or segment.with_name(segment.name + ".gz").exists() or segment.with_name(
+            segment.name + ".zst"
+        ).exists():
+            segment = path.with_name(f"{path.stem}.{stamp}-{n}{path.suffix}")
+            n += 1
+        os.replace(path, segment)
+        self._open_segment()
+        logger.info("CSV output rotated, closed segment %s", segment.name)
+
+        if self.compression is not None:
+            self._compressors = [t for t in self._compressors if t.is_alive()]
+            thread = threading.Thread(target=self._compress, args=(segment,), daemon=True)
+            thread.start()
+            self._compressors.append(thread)
+
+    def _compress(self, segment: Path) -> None:
+        try:
+            self._compress_segment(segment)
+        except OSError:
+            logger.exception("Compressing %s failed, left uncompressed", segment.name)
+
+    def _compress_segment(self, segment: Path) -> None:
+        if self.compression == "gzip":
+            target = segment.with_name(segment.name + ".gz")
+            with segment.open("rb") as src, gzip.open(target, "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        else:
+            target = segment.with_name(segment.name + ".zst")
+            with segment.open("rb") as src, target.open("wb") as dst:
+                zstandard.ZstdCompressor(level=3).copy_stream(src, dst)
+        segment.unlink()
+        logger.info("Compressed %s to %s", segment.name, target.name)
@@ -0,0 +1,143 @@
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+from utils.logging_setup import get_logger
+logger = get_logger(__name__)
+
+from utils.inotify import (
+    Inotify,
+    IN_ATTRIB,
+    IN_CLOSE_WRITE,
+    IN_DELETE_SELF,
+    IN_MODIFY,
+    IN_MOVE_SELF,
+)
+
+
+class FileTailer:
+    """
+    Follows a growing file through a persistent file handle.
+
+    Wakes on inotify events when available and falls back to polling the
+    file size otherwise. Only complete lines are returned; an incomplete
+    trailing line is buffered until its newline arrives. `more` is set when
+    read() stopped at MAX_READ with data still pending.
+    """
+
+    POLL_INTERVAL = 0.01
+    MAX_READ = 4 * 1024 * 1024
+
+    def __init__(self, path: Path, offset: int = 0, use_inotify: bool = True):
+        self.path = path
+        self._fd = os.open(path, os.O_RDONLY)
+
+        self._read_pos = offset
+        self._partial = b""
+        self._dirty = True
+        self.more = False
+        # st_mtime (wall clock) of the file as of the last read()
+        self.mtime = 0.0
+
+        self._inotify: Optional[Inotify] = None
+        if use_inotify:
+            try:
+                self._inotify = Inotify()
+                self._inotify.add_watch(
+                    path,
+                    IN_MODIFY | IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVE_SELF | IN_DELETE_SELF,
+                )
+            except OSError as e:
+                logger.info("inotify unavailable (%s), falling back to stat polling", e)
+                if self._inotify is not None:
+                    self._inotify.close()
+                self._inotify = None
+
+    @property
+    def offset(self) -> int:
+        """
+        Offset just past the last complete line returned by read().
+        """
+        return self._read_pos - len(self._partial)
+
+    @property
+    def uses_inotify(self) -> bool:
+        return self._inotify is not None
+
+    def size(self) -> int:
+        return os.fstat(self._fd).st_size
+
+    def seek(self, offset: int) -> None:
+        self._read_pos = offset
+        self._partial = b""
+        self._dirty = True
+
+    def read(self) -> bytes:
+        """
+        Return the bytes of all newly completed lines, or b"" if the file
+        has not grown by a full line since the last call.
+        """
+        if self._inotify is not None:
+            if self._inotify.read_events():
+                self._dirty = True
+            if not self._dirty:
+                return b""
+
+        st = os.fstat(self._fd)
+        size = st.st_size
+        self.mtime = st.st_mtime
+        if size < self._read_pos:
+            logger.warning("%s shrank from %d to %d bytes, rereading", self.path.name, self._read_pos, size)
+            self._read_pos = 0
+            self._partial = b""
+
+        self._dirty = False
+        self.more = False
+        if size == self._read_pos:
+            return b""
+
+        want = size - self._read_pos
+        if want > self.MAX_READ:
+            # Leave the rest for the next call so huge backlogs are consumed in bounded chunks
+            want = self.MAX_READ
+            self._dirty = True
+            self.more = True
+
+        data = os.pread(self._fd, want, self._read_pos)
+        self._read_pos += len(data)
+
+        buf = self._partial + data if self._partial else data
+        cut = buf.rfind(b"\n") + 1
+        self._partial = buf[cut:]
+        return buf[:cut]
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Block until the file may have grown or the timeout expires.
+        Returns True if there is something to read.
+        """
+        if self._dirty:
+            return True
+
+        if self._inotify is not None:
+            if self._inotify.wait(timeout):
+                self._dirty = True
+            return self._dirty
+
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.size() != self._read_pos:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.POLL_INTERVAL, remaining))
+
+    def close(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
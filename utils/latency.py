@@ -0,0 +1,236 @@
+import math
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from utils.logging_setup import get_logger
+logger = get_logger(__name__)
+
+
+# Every stage is recorded per beacon. The tracker skips reads that catch up on a backlog.
+# Wall clock at read minus the log file's mtime, for each beacon the read updated
+STAGE_WRITE_TO_READ = "write_to_read"
+# Wall clock at read minus the Marvelmind timestamp of a beacon's newest row.
+# Includes any offset between the dashboard's clock and this host's.
+STAGE_MM_TO_READ = "mm_to_read"
+# Tracker clock at publish minus the sample's ts_read
+STAGE_READ_TO_PUBLISH = "read_to_publish"
+# Wall clock after the first send of a new snapshot minus its ts_pub, for each
+# beacon whose sample changed; heartbeat resends and catch-up keyframes are not sampled
+STAGE_PUBLISH_TO_SEND = "publish_to_send"
+
+STAGES = (STAGE_WRITE_TO_READ, STAGE_MM_TO_READ, STAGE_READ_TO_PUBLISH, STAGE_PUBLISH_TO_SEND)
+
+PERCENTILES = (50.0, 95.0, 99.0)
+
+
+def fresh_beacons(records: Iterable[tuple], sent_reads: Dict[int, float]) -> List[int]:
+    """
+    Ids of the wire records (id first, ts_read last) whose ts_read differs
+    from the one in sent_reads, which is updated to the records' values.
+    """
+    ids = []
+    for rec in records:
+        bid, ts_read = rec[0], rec[-1]
+        if sent_reads.get(bid) != ts_read:
+            sent_reads[bid] = ts_read
+            ids.append(bid)
+    return ids
+
+
+class LatencyHistogram:
+    """
+    Log-linear latency histogram with constant-time record().
+
+    Values are bucketed in microseconds: bucket 0 holds everything below
+    1 us (including negative values from clock offsets), then every power
+    of two is split into SUB_BUCKETS linear buckets, so a reported
+    percentile is within 1 / SUB_BUCKETS of the true value. Values beyond
+    the last bucket are clamped into it; max is kept exactly.
+    """
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    SUB_BUCKETS = 16
+    OCTAVES = 40  # 1 us * 2**40 is about 12 days
+
+    def __init__(self):
+        self.counts = array("Q", bytes(8 * (1 + self.OCTAVES * self.SUB_BUCKETS)))
+        self.count = 0
+        self.total = 0.0
+        self.max = -math.inf
+
+    def __len__(self) -> int:
+        return self.count
+
+    def record(self, seconds: float) -> None:
+        self.counts[self._index(seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Latency in seconds below which q percent of the recorded values
+        fall (the upper edge of the bucket holding that rank, capped at
+        max), or None if nothing was recorded.
+        """
+        if not 0.0 <= q <= 100.0:
+            raise ValueError(f"percentile must be between 0 and 100, got {q}")
+        if not self.count:
+            return None
+
+        rank = max(1, math.ceil(q / 100.0 * self.count))
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(self._upper(i), self.max)
+        return self.max
+
+    def summary(self, percentiles: Iterable[float] = PERCENTILES) -> Dict[str, float]:
+        """
+        Count plus mean, max and the given percentiles in milliseconds.
+        """
+        result: Dict[str, float] = {"count": self.count}
+        if self.count:
+            for q in percentiles:
+                result[f"p{q:g}_ms"] = self.percentile(q) * 1e3
+            result["mean_ms"] = self.total / self.count * 1e3
+            result["max_ms"] = self.max * 1e3
+        return result
+
+    def clear(self) -> None:
+        self.counts = array("Q", bytes(len(self.counts) * 8))
+        self.count = 0
+        self.total = 0.0
+        self.max = -math.inf
+
+    @classmethod
+    def _index(cls, seconds: float) -> int:
+        us = seconds * 1e6
+        if not us >= 1.0:
+            return 0
+        mantissa, exponent = math.frexp(us)  # us = mantissa * 2**exponent, 0.5 <= mantissa < 1
+        if exponent > cls.OCTAVES:
+            return cls.OCTAVES * cls.SUB_BUCKETS
+        return 1 + (exponent - 1) * cls.SUB_BUCKETS + int((mantissa * 2.0 - 1.0) * cls.SUB_BUCKETS)
+
+    @classmethod
+    def _upper(cls, index: int) -> float:
+        if index == 0:
+            return 1e-6
+        octave, sub = divmod(index - 1, cls.SUB_BUCKETS)
+        return math.ldexp(1.0 + (sub + 1) / cls.SUB_BUCKETS, octave) * 1e-6
+
+
+class LatencyTracker:
+    """
+    Latency histograms per pipeline stage (see STAGES), each with a
+    per-beacon breakdown.
+
+    PositionTracker, PositionSink and the broadcasters record into a shared
+    instance passed as their `latency` argument; percentiles() and summary()
+    can be queried from any thread while they run.
+    """
+
+    def __init__(self, per_beacon: bool = True):
+        self.per_beacon = per_beacon
+        self._lock = threading.Lock()
+        self._stages: Dict[str, LatencyHistogram] = {stage: LatencyHistogram() for stage in STAGES}
+        self._beacons: Dict[Tuple[str, int], LatencyHistogram] = {}
+
+    def record(self, stage: str, seconds: float, beacon_id: Optional[int] = None) -> None:
+        hist = self._stage(stage)
+        with self._lock:
+            hist.record(seconds)
+            if beacon_id is not None and self.per_beacon:
+                self._beacon(stage, beacon_id).record(seconds)
+
+    def record_many(self, stage: str, samples: Iterable[Tuple[int, float]]) -> None:
+        """
+        Record (beacon_id, seconds) pairs for one stage under a single lock.
+        """
+        hist = self._stage(stage)
+        with self._lock:
+            for beacon_id, seconds in samples:
+                hist.record(seconds)
+                if self.per_beacon:
+                    self._beacon(stage, beacon_id).record(seconds)
+
+    def record_beacons(self, stage: str, seconds: float, beacon_ids: Sequence[int]) -> None:
+        """
+        Record one latency shared by several beacons, once for each.
+        """
+        self.record_many(stage, [(bid, seconds) for bid in beacon_ids])
+
+    def percentiles(
+        self,
+        stage: str,
+        beacon_id: Optional[int] = None,
+        percentiles: Iterable[float] = PERCENTILES,
+    ) -> Dict[float, Optional[float]]:
+        """
+        Map each requested percentile to a latency in seconds (None if the
+        stage, or the beacon within it, has no samples yet).
+        """
+        with self._lock:
+            hist = self._find(stage, beacon_id)
+            return {q: None if hist is None else hist.percentile(q) for q in percentiles}
+
+    def summary(self) -> Dict[str, dict]:
+        """
+        Per stage: the histogram summary of all samples, plus one per beacon
+        under "beacons".
+        """
+        with self._lock:
+            result = {}
+            for stage, hist in self._stages.items():
+                entry = hist.summary()
+                entry["beacons"] = {
+                    bid: h.summary() for (s, bid), h in sorted(self._beacons.items()) if s == stage
+                }
+                result[stage] = entry
+            return result
+
+    def log_summary(self) -> None:
+        with self._lock:
+            for stage, hist in self._stages.items():
+                if not hist.count:
+                    continue
+                p50, p95, p99 = (hist.percentile(q) * 1e3 for q in PERCENTILES)
+                logger.info(
+                    "Latency %s: p50 %.2f ms, p95 %.2f ms, p99 %.2f ms, max %.2f ms (%d samples)",
+                    stage,
+                    p50,
+                    p95,
+                    p99,
+                    hist.max * 1e3,
+                    hist.count,
+                )
+
+    def reset(self) -> None:
+        with self._lock:
+            for hist in self._stages.values():
+                hist.clear()
+            self._beacons.clear()
+
+    def _stage(self, stage: str) -> LatencyHistogram:
+        hist = self._stages.get(stage)
+        if hist is None:
+            raise ValueError(f"stage must be one of {STAGES}, got {stage!r}")
+        return hist
+
+    def _beacon(self, stage: str, beacon_id: int) -> LatencyHistogram:
+        # Must be called with the lock held
+        hist = self._beacons.get((stage, beacon_id))
+        if hist is None:
+            hist = self._beacons[(stage, beacon_id)] = LatencyHistogram()
+        return hist
+
+    def _find(self, stage: str, beacon_id: Optional[int]) -> Optional[LatencyHistogram]:
+        hist = self._stage(stage)
+        if beacon_id is None:
+            return hist
+        return self._beacons.get((stage, beacon_id))
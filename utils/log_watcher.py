@@ -1,55 +1,153 @@
+import os
 from pathlib import Path
-from typing import Optional
+from typing import Callable, List, Optional
 from .paths import LOGS_DIR
 
+from .logging_setup import get_logger
+logger = get_logger(__name__)
 
-def list_log_files() -> list[Path]:
+from .inotify import (
+    Inotify,
+    IN_CREATE,
+    IN_DELETE,
+    IN_DELETE_SELF,
+    IN_MOVE_SELF,
+    IN_MOVED_FROM,
+    IN_MOVED_TO,
+)
+
+LOG_SUFFIX = "__Marvelmind_log.csv"
+
+
+def list_log_files(logs_dir: Optional[Path] = None) -> list[Path]:
     """
     Return all Marvelmind log files sorted chronologically.
     """
-    if not LOGS_DIR.exists():
-        raise FileNotFoundError(f"Logs directory does not exist: {LOGS_DIR}")
+    logs_dir = LOGS_DIR if logs_dir is None else logs_dir
+    if not logs_dir.exists():
+        raise FileNotFoundError(f"Logs directory does not exist: {logs_dir}")
 
     logs = [
-        p for p in LOGS_DIR.iterdir()
-        if p.is_file() and p.name.endswith("__Marvelmind_log.csv")
+        p for p in logs_dir.iterdir()
+        if p.is_file() and p.name.endswith(LOG_SUFFIX)
     ]
 
     return sorted(logs)
 
 
-def latest_log_file() -> Optional[Path]:
+def latest_log_file(logs_dir: Optional[Path] = None) -> Optional[Path]:
     """
     Return the most recent Marvelmind log file, or None if none exist.
     """
-    logs = list_log_files()
+    logs = list_log_files(logs_dir)
     return logs[-1] if logs else None
 
 
 class LogTracker:
     """
     Tracks the currently active Marvelmind log and detects when it changes.
+
+    The directory listing is cached and only rescanned when the logs
+    directory changes, detected through inotify or, as a fallback, the
+    directory mtime. Listeners registered with add_listener() are called
+    with the new path whenever a newer log appears.
     """
 
-    def __init__(self):
+    def __init__(self, logs_dir: Optional[Path] = None, use_inotify: bool = True):
+        self.logs_dir = LOGS_DIR if logs_dir is None else logs_dir
+        self.use_inotify = use_inotify
+
         self._current_log: Optional[Path] = None
+        self._logs: List[Path] = []
+        self._listeners: List[Callable[[Path], None]] = []
+
+        self._inotify: Optional[Inotify] = None
+        self._dir_mtime_ns: Optional[int] = None
+        self._stale = True
+
+    def add_listener(self, callback: Callable[[Path], None]) -> None:
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[Path], None]) -> None:
+        self._listeners.remove(callback)
 
     def update(self) -> Optional[Path]:
         """
         Check for a new log file.
         Returns the new log path if changed, otherwise None.
         """
-        latest = latest_log_file()
+        if not self._directory_changed():
+            return None
+
+        self._refresh()
+        latest = self._logs[-1] if self._logs else None
 
         if latest is None:
             return None
 
         if self._current_log is None or latest != self._current_log:
             self._current_log = latest
+            for callback in list(self._listeners):
+                callback(latest)
             return latest
 
         return None
 
+    def log_files(self) -> List[Path]:
+        """
+        Return the cached, chronologically sorted list of log files.
+        """
+        return list(self._logs)
+
+    def close(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def _directory_changed(self) -> bool:
+        if self._stale:
+            return True
+
+        if self._inotify is not None:
+            events = self._inotify.read_events()
+            if any(mask & (IN_DELETE_SELF | IN_MOVE_SELF) for _, mask, _ in events):
+                # The watch died with the directory; re-establish it on the next refresh
+                self._inotify.close()
+                self._inotify = None
+            return bool(events)
+
+        try:
+            mtime_ns = os.stat(self.logs_dir).st_mtime_ns
+        except FileNotFoundError:
+            return True
+        return mtime_ns != self._dir_mtime_ns
+
+    def _refresh(self) -> None:
+        # Watch and record the mtime before listing so a file created mid-scan triggers another refresh
+        if self.use_inotify and self._inotify is None and self.logs_dir.exists():
+            self._watch_directory()
+        try:
+            self._dir_mtime_ns = os.stat(self.logs_dir).st_mtime_ns
+        except FileNotFoundError:
+            self._dir_mtime_ns = None
+
+        self._logs = list_log_files(self.logs_dir)
+        self._stale = False
+
+    def _watch_directory(self) -> None:
+        try:
+            self._inotify = Inotify()
+            self._inotify.add_watch(
+                self.logs_dir,
+                IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF,
+            )
+        except OSError as e:
+            logger.info("inotify unavailable for %s (%s), using mtime checks", self.logs_dir, e)
+            if self._inotify is not None:
+                self._inotify.close()
+            self._inotify = None
+            self.use_inotify = False
+
     @property
     def current_log(self) -> Optional[Path]:
         return self._current_log
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 HOME = Path.home()
@@ -5,4 +6,5 @@ HOME = Path.home()
 MARVELMIND_DIR = HOME / "Downloads" / "marvelmind_SW"
 DASHBOARD_DIR = MARVELMIND_DIR / "01_Dashboard"
 LINUX_DIR = DASHBOARD_DIR / "02_linux" / "x86"
-LOGS_DIR = LINUX_DIR / "logs"
+# MARVELMIND_LOGS_DIR overrides the dashboard's default log location
+LOGS_DIR = Path(os.environ.get("MARVELMIND_LOGS_DIR", LINUX_DIR / "logs"))
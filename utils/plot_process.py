@@ -0,0 +1,127 @@
+"""
+Out-of-process plotting: PlotProcess runs this module as
+
+    python -m utils.plot_process TABLE_NAME [--poll-interval S] [--plotter JSON]
+
+which draws the beacons of a SharedPositionTable in its own process.
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from utils.logging_setup import get_logger
+logger = get_logger(__name__)
+
+from utils.shared_positions import DEFAULT_NAME, SharedPositionReader
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+class PlotProcess:
+    """
+    Runs PositionPlotter in a separate process that polls a
+    SharedPositionTable, so rendering and the GUI event loop never run on
+    the thread calling PositionTracker.update(). A slow or frozen window
+    only delays the plot.
+
+    plotter_kwargs are passed to PositionPlotter in the plot process and
+    must be JSON-serializable.
+    """
+
+    def __init__(self, table_name: str = DEFAULT_NAME, poll_interval: float = 0.02, **plotter_kwargs):
+        self.table_name = table_name
+        self.poll_interval = poll_interval
+        self.plotter_kwargs = plotter_kwargs
+        self._process: Optional[subprocess.Popen] = None
+
+    def start(self):
+        if self._process is not None:
+            return
+        # A fresh interpreter rather than multiprocessing, which would re-run an unguarded main script
+        self._process = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "utils.plot_process",
+                self.table_name,
+                "--poll-interval",
+                str(self.poll_interval),
+                "--plotter",
+                json.dumps(self.plotter_kwargs),
+            ],
+            cwd=REPO_ROOT,
+        )
+        logger.info("Plot process started (pid %d)", self._process.pid)
+
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def stop(self, timeout: float = 2.0):
+        if self._process is None:
+            return
+        if self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                logger.warning("Plot process did not exit within %.1fs, killing it", timeout)
+                self._process.kill()
+                self._process.wait()
+        self._process = None
+        logger.info("Plot process stopped")
+
+
+def run_plotter(table_name: str, poll_interval: float = 0.02, **plotter_kwargs) -> None:
+    """
+    Plot loop of the plot process: feed beacons whose record changed to
+    PositionPlotter until the window is closed, SIGTERM arrives or the
+    parent process exits.
+    """
+    # matplotlib is only imported in the plot process
+    from utils.plotter import PositionPlotter
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    parent = os.getppid()
+
+    reader = SharedPositionReader(table_name)
+    plotter = PositionPlotter(**plotter_kwargs)
+    versions: Dict[int, int] = {}
+
+    try:
+        while not stopping and plotter.is_open and os.getppid() == parent:
+            if reader.changed():
+                for rec in reader.read():
+                    # Only beacons whose data changed extend their trail
+                    if versions.get(rec.beacon_id) == rec.version:
+                        continue
+                    versions[rec.beacon_id] = rec.version
+                    plotter.update(rec.beacon_type.upper(), rec.beacon_id, rec.x, rec.y, rec.z)
+            plotter.refresh()
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        plotter.close()
+        reader.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Plot beacons from a shared position table")
+    parser.add_argument("table_name")
+    parser.add_argument("--poll-interval", type=float, default=0.02)
+    parser.add_argument("--plotter", default="{}", help="PositionPlotter keyword arguments as JSON")
+    args = parser.parse_args()
+
+    run_plotter(args.table_name, args.poll_interval, **json.loads(args.plotter))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,95 @@
+import os
 import time
 import math
-from collections import deque
-from typing import Dict, Tuple
+import warnings
+from typing import Dict, List, Optional, Tuple
 
 import matplotlib
-matplotlib.use("TkAgg")
+# Respect an explicit backend choice (e.g. MPLBACKEND=Agg for headless use and tests)
+if "MPLBACKEND" not in os.environ:
+    matplotlib.use("TkAgg")
 
 from utils.logging_setup import get_logger
 logger = get_logger(__name__)
 
+import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from matplotlib.transforms import offset_copy
+
+MOBILE_COLOR = "red"
+STATIONARY_COLOR = "blue"
+
+
+class _Trail:
+    """
+    Growable NumPy buffer of one beacon's recent (x, y) samples and times.
+    Old samples are dropped by moving `start`, so the live region is always
+    a contiguous (n, 2) view that artists can use without copying.
+    """
+
+    __slots__ = ("xy", "ts", "start", "end")
+
+    def __init__(self, capacity: int = 256):
+        self.xy = np.empty((capacity, 2))
+        self.ts = np.empty(capacity)
+        self.start = 0
+        self.end = 0
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def append(self, x: float, y: float, t: float) -> None:
+        if self.end == len(self.ts):
+            self._make_room()
+        i = self.end
+        self.xy[i, 0] = x
+        self.xy[i, 1] = y
+        self.ts[i] = t
+        self.end = i + 1
+
+    def trim(self, oldest: float) -> None:
+        # The latest sample is kept; expiry is decided by decay_seconds
+        drop = int(np.searchsorted(self.ts[self.start : self.end], oldest, "left"))
+        self.start += min(drop, len(self) - 1)
+
+    def last(self, back: int = 1) -> Tuple[float, float, float]:
+        i = self.end - back
+        return float(self.xy[i, 0]), float(self.xy[i, 1]), float(self.ts[i])
+
+    def view(self) -> np.ndarray:
+        return self.xy[self.start : self.end]
+
+    def _make_room(self) -> None:
+        live = self.end - self.start
+        if live * 2 > len(self.ts):
+            xy = np.empty((len(self.ts) * 2, 2))
+            ts = np.empty(len(self.ts) * 2)
+            xy[:live] = self.xy[self.start : self.end]
+            ts[:live] = self.ts[self.start : self.end]
+            self.xy, self.ts = xy, ts
+        else:
+            # Mostly expired: slide the live samples back to the front
+            self.xy[:live] = self.xy[self.start : self.end]
+            self.ts[:live] = self.ts[self.start : self.end]
+        self.start = 0
+        self.end = live
 
 
 class PositionPlotter:
+    """
+    Live plot of beacon positions with trails, labels and velocity arrows.
+
+    Artists are created once and updated in place: all trails share one
+    LineCollection, markers one line per beacon kind, arrows one quiver,
+    and each beacon keeps its own label. Frames are blitted onto a cached
+    background, so a full redraw only happens when the view has to be
+    rescaled or the window is resized or zoomed. Works with any backend,
+    including Agg for headless use.
+    """
+
+    MARGIN = 0.5
+
     def __init__(
         self,
         decay_seconds: float = 15.0,
@@ -27,28 +104,98 @@ class PositionPlotter:
         self.velocity_scale = velocity_scale
         self.show_pos = show_pos
 
-        self._points: Dict[Tuple[str, int], deque] = {}
+        self._trails: Dict[Tuple[str, int], _Trail] = {}
+        self._labels: Dict[Tuple[str, int], plt.Text] = {}
+        self._order: List[Tuple[str, int]] = []
         self._last_draw = 0.0
         self._running = True
 
+        self._background = None
+        self.full_draws = 0
+        self.frames = 0
+
         plt.ion()
         self.fig, self.ax = plt.subplots()
         self._setup_axes()
-        plt.show(block=False)
-        logger.info("Plotter initialized")
-
+        self._blit = getattr(self.fig.canvas, "supports_blit", False)
+        self._setup_artists()
+        self.fig.canvas.mpl_connect("draw_event", self._on_draw)
         self.fig.canvas.mpl_connect("key_press_event", self._on_key)
 
+        with warnings.catch_warnings():
+            # Non-interactive backends (Agg) warn that show() does nothing
+            warnings.simplefilter("ignore", UserWarning)
+            plt.show(block=False)
+        self._full_draw()
+        logger.info("Plotter initialized (%s, blitting %s)", matplotlib.get_backend(), self._blit)
+
     def _on_key(self, event):
         if event.key == "p":
             self.show_pos = not self.show_pos
 
+    def _on_draw(self, event):
+        # Any full draw (resize, zoom, rescale) invalidates the cached background
+        if self._blit:
+            self._background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+            self._draw_animated()
+
     def _setup_axes(self):
         self.ax.set_xlabel("X")
         self.ax.set_ylabel("Y")
         self.ax.set_aspect("equal", adjustable="box")
         self.ax.grid(True)
 
+    def _setup_artists(self):
+        self._trail_lines = LineCollection([], alpha=0.5, animated=self._blit)
+        self.ax.add_collection(self._trail_lines, autolim=False)
+        (self._mobile_points,) = self.ax.plot([], [], "o", color=MOBILE_COLOR, animated=self._blit)
+        (self._stationary_points,) = self.ax.plot([], [], "s", color=STATIONARY_COLOR, animated=self._blit)
+        self._arrows = None
+
+        # Label offsets in points, one transform per (dx, dy)
+        self._label_offsets = {
+            (dx, dy): offset_copy(self.ax.transData, fig=self.fig, x=dx, y=dy, units="points")
+            for dx in (-5, 0, 5)
+            for dy in (-5, 0, 5)
+        }
+
+    def _rebuild_artists(self):
+        """
+        Called when beacons appear or expire: the label set, the per-trail
+        colours and the quiver (fixed size) follow the new beacon order.
+        """
+        self._order = sorted(self._trails)
+        colors = [MOBILE_COLOR if label == "MOBILE" else STATIONARY_COLOR for label, _ in self._order]
+
+        for key in list(self._labels):
+            if key not in self._trails:
+                self._labels.pop(key).remove()
+        for key, color in zip(self._order, colors):
+            if key not in self._labels:
+                self._labels[key] = self.ax.text(0.0, 0.0, "", color=color, animated=self._blit)
+
+        self._trail_lines.set_colors(colors)
+
+        if self._arrows is not None:
+            self._arrows.remove()
+            self._arrows = None
+        if self._order:
+            n = len(self._order)
+            self._arrows = self.ax.quiver(
+                np.zeros(n),
+                np.zeros(n),
+                np.zeros(n),
+                np.zeros(n),
+                color=colors,
+                alpha=0.8,
+                angles="xy",
+                scale_units="xy",
+                scale=1.0,
+                width=0.004,
+                minlength=0,
+                animated=self._blit,
+            )
+
     def update(self, label: str, beacon_id: int, x: float, y: float, z: float):
         if not self._running:
             return
@@ -56,16 +203,31 @@ class PositionPlotter:
         now = time.monotonic()
         key = (label, beacon_id)
 
-        if key not in self._points:
-            self._points[key] = deque()
+        trail = self._trails.get(key)
+        if trail is None:
+            trail = self._trails[key] = _Trail()
+        trail.append(x, y, now)
 
-        self._points[key].append((x, y, z, now))
+        if now - self._last_draw >= self.refresh_interval:
+            self._redraw(now)
 
-        while self._points[key] and now - self._points[key][0][3] > self.trail_seconds:
-            self._points[key].popleft()
+    def refresh(self):
+        """
+        Redraw if due, otherwise just process GUI events. For callers that
+        poll without calling update() for every beacon.
+        """
+        if not self._running:
+            return
 
+        now = time.monotonic()
         if now - self._last_draw >= self.refresh_interval:
             self._redraw(now)
+        else:
+            self.fig.canvas.flush_events()
+
+    @property
+    def is_open(self) -> bool:
+        return self._running and plt.fignum_exists(self.fig.number)
 
     def _label_alignment(self, x: float, y: float):
         xmin, xmax = self.ax.get_xlim()
@@ -84,88 +246,139 @@ class PositionPlotter:
 
     def _redraw(self, now: float):
         try:
-            self.ax.clear()
-            self._setup_axes()
-
-            expired = []
-
-            for (label, bid), samples in self._points.items():
-                if not samples:
-                    expired.append((label, bid))
-                    continue
-
-                last_x, last_y, last_z, last_ts = samples[-1]
-
-                if now - last_ts > self.decay_seconds:
-                    expired.append((label, bid))
-                    continue
-
-                xs = [p[0] for p in samples]
-                ys = [p[1] for p in samples]
-
-                is_mobile = label == "MOBILE"
-                color = "red" if is_mobile else "blue"
-                marker = "o" if is_mobile else "s"
-
-                if len(xs) > 1:
-                    self.ax.plot(xs, ys, color=color, alpha=0.5)
-
-                self.ax.scatter(last_x, last_y, c=color, marker=marker)
-
-                # Label rendering
-                if self.show_pos:
-                    ha, va, dx, dy = self._label_alignment(last_x, last_y)
-                    text = f"{label[0]}{bid} ({last_x:.2f}, {last_y:.2f})"
-                    self.ax.annotate(
-                        text,
-                        (last_x, last_y),
-                        xytext=(dx, dy),
-                        textcoords="offset points",
-                        ha=ha,
-                        va=va,
-                        fontsize=8,
-                        color=color,
-                        alpha=0.9,
-                    )
-                else:
-                    self.ax.text(
-                        last_x,
-                        last_y,
-                        f"{label[0]}{bid}",
-                        fontsize=9,
-                        color=color,
-                    )
-
-                # Velocity vector
-                if len(samples) >= 2:
-                    x0, y0, _, t0 = samples[-2]
-                    dt = last_ts - t0
-                    if dt > 0:
-                        vx = (last_x - x0) / dt
-                        vy = (last_y - y0) / dt
-                        if math.hypot(vx, vy) > 1e-4:
-                            self.ax.arrow(
-                                last_x,
-                                last_y,
-                                vx * self.velocity_scale,
-                                vy * self.velocity_scale,
-                                head_width=0.05,
-                                head_length=0.08,
-                                fc=color,
-                                ec=color,
-                                alpha=0.8,
-                            )
-
-            for key in expired:
-                del self._points[key]
-
-            self.fig.canvas.draw_idle()
-            plt.pause(0.001)
+            bounds = self._update_artists(now)
+            if bounds is not None and self._needs_rescale(bounds):
+                self._rescale(bounds)
+                self._full_draw()
+            elif self._blit and self._background is not None:
+                self._blit_frame()
+            else:
+                self._full_draw()
+
+            self.fig.canvas.flush_events()
+            self.frames += 1
             self._last_draw = now
 
         except KeyboardInterrupt:
             self.close()
 
+    def _update_artists(self, now: float) -> Optional[Tuple[float, float, float, float]]:
+        """
+        Push the latest trail data into the artists and return the bounds
+        (xmin, xmax, ymin, ymax) of everything visible.
+        """
+        expired = []
+        for key, trail in self._trails.items():
+            trail.trim(now - self.trail_seconds)
+            if now - trail.last()[2] > self.decay_seconds:
+                expired.append(key)
+        for key in expired:
+            del self._trails[key]
+        if expired or len(self._order) != len(self._trails):
+            self._rebuild_artists()
+
+        if not self._order:
+            self._trail_lines.set_segments([])
+            self._mobile_points.set_data([], [])
+            self._stationary_points.set_data([], [])
+            return None
+
+        n = len(self._order)
+        segments = []
+        heads = np.empty((n, 2))
+        velocity = np.zeros((n, 2))
+        mobile = np.empty(n, dtype=bool)
+
+        for i, key in enumerate(self._order):
+            trail = self._trails[key]
+            segments.append(trail.view())
+            x, y, ts = trail.last()
+            heads[i] = x, y
+            mobile[i] = key[0] == "MOBILE"
+
+            # Velocity from the last two samples
+            if len(trail) >= 2:
+                x0, y0, t0 = trail.last(2)
+                dt = ts - t0
+                if dt > 0:
+                    velocity[i] = (x - x0) / dt, (y - y0) / dt
+
+            self._update_label(self._labels[key], key, x, y)
+
+        self._trail_lines.set_segments(segments)
+        self._mobile_points.set_data(heads[mobile, 0], heads[mobile, 1])
+        self._stationary_points.set_data(heads[~mobile, 0], heads[~mobile, 1])
+
+        velocity[np.hypot(velocity[:, 0], velocity[:, 1]) <= 1e-4] = 0.0
+        velocity *= self.velocity_scale
+        self._arrows.set_offsets(heads)
+        self._arrows.set_UVC(velocity[:, 0], velocity[:, 1])
+
+        points = np.concatenate(segments)
+        lo = points.min(axis=0)
+        hi = points.max(axis=0)
+        return float(lo[0]), float(hi[0]), float(lo[1]), float(hi[1])
+
+    def _update_label(self, text, key: Tuple[str, int], x: float, y: float) -> None:
+        label, bid = key
+        text.set_x(x)
+        text.set_y(y)
+        if self.show_pos:
+            ha, va, dx, dy = self._label_alignment(x, y)
+            text.set_text(f"{label[0]}{bid} ({x:.2f}, {y:.2f})")
+            text.set_horizontalalignment(ha)
+            text.set_verticalalignment(va)
+            text.set_transform(self._label_offsets[dx, dy])
+            text.set_fontsize(8)
+            text.set_alpha(0.9)
+        else:
+            text.set_text(f"{label[0]}{bid}")
+            text.set_horizontalalignment("left")
+            text.set_verticalalignment("baseline")
+            text.set_transform(self._label_offsets[0, 0])
+            text.set_fontsize(9)
+            text.set_alpha(None)
+
+    def _needs_rescale(self, bounds: Tuple[float, float, float, float]) -> bool:
+        xmin, xmax, ymin, ymax = bounds
+        x0, x1 = self.ax.get_xlim()
+        y0, y1 = self.ax.get_ylim()
+        if xmin < x0 or xmax > x1 or ymin < y0 or ymax > y1:
+            return True
+        # Shrink again once the beacons only fill a small part of the view
+        return xmax - xmin + 2 * self.MARGIN < 0.25 * (x1 - x0) and ymax - ymin + 2 * self.MARGIN < 0.25 * (y1 - y0)
+
+    def _rescale(self, bounds: Tuple[float, float, float, float]) -> None:
+        xmin, xmax, ymin, ymax = bounds
+        self.ax.set_xlim(xmin - self.MARGIN, xmax + self.MARGIN)
+        self.ax.set_ylim(ymin - self.MARGIN, ymax + self.MARGIN)
+
+    def _animated_artists(self) -> List:
+        artists = [self._trail_lines, self._mobile_points, self._stationary_points]
+        if self._arrows is not None:
+            artists.append(self._arrows)
+        artists.extend(self._labels.values())
+        return artists
+
+    def _full_draw(self) -> None:
+        self.full_draws += 1
+        if self._blit:
+            # draw_event recaptures the background and draws the animated artists on top
+            self.fig.canvas.draw()
+            self.fig.canvas.blit(self.fig.bbox)
+        else:
+            self.fig.canvas.draw_idle()
+
+    def _blit_frame(self) -> None:
+        canvas = self.fig.canvas
+        canvas.restore_region(self._background)
+        self._draw_animated()
+        canvas.blit(self.fig.bbox)
+
+    def _draw_animated(self) -> None:
+        for artist in self._animated_artists():
+            self.ax.draw_artist(artist)
+
     def close(self):
         self._running = False
         try:
@@ -0,0 +1,366 @@
+import json
+import os
+import sys
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.logging_setup import get_logger
+logger = get_logger(__name__)
+
+from src.position_tracker import PositionSample, BeaconType
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed to read recordings back
+    np = None
+
+RECORDING_VERSION = 1
+INDEX_NAME = "index.json"
+
+# The ts_pub of every SPARSE_STRIDE-th row of each beacon is kept in a
+# <beacon>.ts_pub.idx file next to its columns
+SPARSE_STRIDE = 1024
+TIME_COLUMNS = ("ts_pub", "ts_mm")
+
+# Same fields as the CSV header; beacon_type and beacon_id are the file names
+COLUMNS = ("ts_pub", "ts_mm", "ts_read", "x", "y", "z")
+DTYPE = "<f8"
+
+BeaconKey = Tuple[str, int]
+
+
+def _beacon_name(key: BeaconKey) -> str:
+    return f"{key[0]}-{key[1]}"
+
+
+def _parse_beacon_name(name: str) -> BeaconKey:
+    beacon_type, _, beacon_id = name.rpartition("-")
+    return beacon_type, int(beacon_id)
+
+
+def _save_index(directory: Path, index: dict) -> None:
+    path = directory / INDEX_NAME
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("w") as f:
+        json.dump(index, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+class PositionRecorder:
+    """
+    Append-only columnar recording of position snapshots.
+
+    Each beacon gets one raw little-endian float64 file per column inside
+    the current segment directory, so a reader can memory-map a column and
+    use it without parsing or copying. ts_mm is NaN when missing.
+    index.json lists the segments and how many rows of each beacon are
+    complete; it is rewritten atomically after every flush, so a crash
+    never exposes a partially written row. For Recording.query() the
+    ts_pub of every SPARSE_STRIDE-th row is appended to a per-beacon .idx
+    file in the segment, so index.json stays small however long the
+    recording runs.
+
+    Has the same write_snapshot()/close() interface as PositionCSVWriter
+    and can be passed to PositionSink in its place.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        rate_hz: Optional[float] = None,
+        flush_interval: float = 1.0,
+        segment_rows: int = 10_000_000,
+    ):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.segment_rows = segment_rows
+
+        self._period = 0.0 if rate_hz is None else 1.0 / rate_hz
+        self._last_write_ts = 0.0
+        self._last_flush = time.monotonic()
+
+        directory.mkdir(parents=True, exist_ok=True)
+        index_path = directory / INDEX_NAME
+        if index_path.exists():
+            with index_path.open("r") as f:
+                self._index = json.load(f)
+            if self._index.get("version") != RECORDING_VERSION:
+                raise ValueError(f"{index_path} has unsupported version {self._index.get('version')}")
+        else:
+            self._index = {
+                "version": RECORDING_VERSION,
+                "columns": list(COLUMNS),
+                "dtype": DTYPE,
+                "sparse_stride": SPARSE_STRIDE,
+                "segments": [],
+            }
+
+        # Always start a new segment: appending to one left by a crash could
+        # follow a torn row
+        self._segment: Optional[dict] = None
+        self._segment_total = 0
+        self._files: Dict[BeaconKey, List] = {}
+        self._marks: Dict[BeaconKey, object] = {}
+        self._buffers: Dict[BeaconKey, List[array]] = {}
+        self._open_segment()
+
+        logger.info("Position recorder writing to %s", directory)
+
+    def write_snapshot(
+        self,
+        ts_pub: float,
+        beacons: Iterable[Tuple[BeaconType, int, PositionSample]],
+    ) -> None:
+        now = time.monotonic()
+        if self._period and now - self._last_write_ts < self._period:
+            return
+        self._last_write_ts = now
+
+        nan = float("nan")
+        for beacon_type, beacon_id, pos in beacons:
+            key = (beacon_type.value, beacon_id)
+            cols = self._buffers.get(key)
+            if cols is None:
+                cols = self._buffers[key] = [array("d") for _ in COLUMNS]
+            cols[0].append(ts_pub)
+            cols[1].append(pos.ts_mm if pos.ts_mm is not None else nan)
+            cols[2].append(pos.ts_read)
+            cols[3].append(pos.x)
+            cols[4].append(pos.y)
+            cols[5].append(pos.z)
+
+        if now - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Append buffered rows to the segment files and publish them in the index.
+        """
+        self._last_flush = time.monotonic()
+        if not self._buffers:
+            return
+
+        rows = self._segment["rows"]
+        stride = self._index.get("sparse_stride", SPARSE_STRIDE)
+        added = 0
+        for key, cols in self._buffers.items():
+            files = self._files.get(key)
+            if files is None:
+                files = self._files[key] = self._open_beacon(key)
+            for f, col in zip(files, cols):
+                if sys.byteorder != "little":
+                    # Swap a copy: ts_pub is still read below for the index
+                    col = array("d", col)
+                    col.byteswap()
+                f.write(col.tobytes())
+                f.flush()
+            name = _beacon_name(key)
+            start = rows.get(name, 0)
+            first_mark = -(-start // stride) * stride - start
+            marks = array("d", cols[0][first_mark::stride])
+            if marks:
+                f = self._marks.get(key)
+                if f is None:
+                    f = self._marks[key] = self._open_marks(key)
+                if sys.byteorder != "little":
+                    marks.byteswap()
+                f.write(marks.tobytes())
+                f.flush()
+            rows[name] = start + len(cols[0])
+            added += len(cols[0])
+
+            ts = self._segment["ts_pub"]
+            first, last = cols[0][0], cols[0][-1]
+            ts[0] = first if ts[0] is None else min(ts[0], first)
+            ts[1] = last if ts[1] is None else max(ts[1], last)
+        self._buffers = {}
+
+        _save_index(self.directory, self._index)
+
+        self._segment_total += added
+        if self._segment_total >= self.segment_rows:
+            self._close_files()
+            self._open_segment()
+
+    def close(self) -> None:
+        logger.info("Closing position recorder")
+        self.flush()
+        self._close_files()
+
+    def _open_segment(self) -> None:
+        segments = self._index["segments"]
+        name = f"seg-{len(segments):06d}"
+        (self.directory / name).mkdir(exist_ok=True)
+        self._segment = {"name": name, "rows": {}, "ts_pub": [None, None]}
+        segments.append(self._segment)
+        self._segment_total = 0
+        _save_index(self.directory, self._index)
+
+    def _open_beacon(self, key: BeaconKey) -> List:
+        base = self.directory / self._segment["name"] / _beacon_name(key)
+        return [base.with_name(f"{base.name}.{col}.f8").open("ab") for col in COLUMNS]
+
+    def _open_marks(self, key: BeaconKey):
+        return (self.directory / self._segment["name"] / f"{_beacon_name(key)}.ts_pub.idx").open("ab")
+
+    def _close_files(self) -> None:
+        for files in self._files.values():
+            for f in files:
+                f.close()
+        for f in self._marks.values():
+            f.close()
+        self._files = {}
+        self._marks = {}
+
+
+class Recording:
+    """
+    Reader for a PositionRecorder directory. Column arrays are read-only
+    memory maps of the segment files; nothing is parsed or copied unless a
+    beacon's data spans several segments and is requested as one array.
+    """
+
+    def __init__(self, directory: Path):
+        if np is None:
+            raise RuntimeError("Reading recordings requires NumPy")
+
+        self.directory = directory
+        with (directory / INDEX_NAME).open("r") as f:
+            self.index = json.load(f)
+        if self.index.get("version") != RECORDING_VERSION:
+            raise ValueError(f"{directory} has unsupported recording version {self.index.get('version')}")
+
+        self._maps: Dict[Tuple[str, str, str], "np.ndarray"] = {}
+        self._sparse: Dict[Tuple[str, str, str], Tuple["np.ndarray", "np.ndarray"]] = {}
+
+    @property
+    def segments(self) -> List[str]:
+        return [s["name"] for s in self.index["segments"]]
+
+    def beacons(self) -> List[BeaconKey]:
+        keys = set()
+        for segment in self.index["segments"]:
+            keys.update(_parse_beacon_name(name) for name in segment["rows"])
+        return sorted(keys)
+
+    def rows(self, beacon_type: str, beacon_id: int) -> int:
+        name = _beacon_name((beacon_type, beacon_id))
+        return sum(s["rows"].get(name, 0) for s in self.index["segments"])
+
+    def segment_arrays(self, segment: str, beacon_type: str, beacon_id: int) -> Dict[str, "np.ndarray"]:
+        """
+        Zero-copy column views for one beacon in one segment.
+        """
+        name = _beacon_name((beacon_type, beacon_id))
+        info = next(s for s in self.index["segments"] if s["name"] == segment)
+        count = info["rows"].get(name, 0)
+        return {col: self._column(segment, name, col, count) for col in COLUMNS}
+
+    def arrays(self, beacon_type: str, beacon_id: int) -> Dict[str, "np.ndarray"]:
+        """
+        All recorded rows of one beacon, one array per column. Zero-copy
+        when the beacon appears in a single segment.
+        """
+        name = _beacon_name((beacon_type, beacon_id))
+        parts = [
+            self.segment_arrays(s["name"], beacon_type, beacon_id)
+            for s in self.index["segments"]
+            if s["rows"].get(name)
+        ]
+        if not parts:
+            return {col: np.empty(0, dtype=DTYPE) for col in COLUMNS}
+        if len(parts) == 1:
+            return parts[0]
+        return {col: np.concatenate([p[col] for p in parts]) for col in COLUMNS}
+
+    def query(
+        self,
+        beacon_ids: Optional[Iterable[int]],
+        t_start: Optional[float] = None,
+        t_end: Optional[float] = None,
+        time_column: str = "ts_pub",
+    ) -> Dict[BeaconKey, Dict[str, "np.ndarray"]]:
+        """
+        Rows of the given beacon ids (None for all) with t_start <= time <= t_end,
+        keyed by (beacon_type, beacon_id), one array per column. A beacon
+        recorded under two types gets two entries.
+
+        Each beacon's rows are located by a binary search over the sparse
+        time index and then over one stride of the memory-mapped column, so
+        a lookup costs O(log N) plus the size of the result. Segments whose
+        ts_pub range misses the window are skipped. time_column must be
+        non-decreasing per beacon ("ts_mm" also requires it to be present).
+        """
+        if time_column not in TIME_COLUMNS:
+            raise ValueError(f"time_column must be one of {TIME_COLUMNS}, got {time_column!r}")
+        lo = -np.inf if t_start is None else t_start
+        hi = np.inf if t_end is None else t_end
+        wanted = None if beacon_ids is None else set(beacon_ids)
+
+        parts: Dict[BeaconKey, List[Dict[str, "np.ndarray"]]] = {}
+        for segment in self.index["segments"]:
+            first, last = segment.get("ts_pub", (None, None))
+            if time_column == "ts_pub" and first is not None and (last < lo or first > hi):
+                continue
+            for name, count in segment["rows"].items():
+                key = _parse_beacon_name(name)
+                if not count or (wanted is not None and key[1] not in wanted):
+                    continue
+                start, end = self._time_range(segment, name, count, time_column, lo, hi)
+                if end > start:
+                    cols = {col: self._column(segment["name"], name, col, count)[start:end] for col in COLUMNS}
+                    parts.setdefault(key, []).append(cols)
+
+        result = {}
+        for key, chunks in parts.items():
+            if len(chunks) == 1:
+                result[key] = chunks[0]
+            else:
+                result[key] = {col: np.concatenate([c[col] for c in chunks]) for col in COLUMNS}
+        return result
+
+    def _time_range(self, segment: dict, name: str, count: int, time_column: str, lo: float, hi: float):
+        times = self._column(segment["name"], name, time_column, count)
+        mark_rows, mark_times = self._sparse_index(segment, name, count, time_column)
+
+        def bound(t, side):
+            # Narrow to one stride with the sparse index, then search inside it
+            i = int(np.searchsorted(mark_times, t, side))
+            begin = int(mark_rows[i - 1]) if i > 0 else 0
+            stop = int(mark_rows[i]) + 1 if i < len(mark_rows) else count
+            return begin + int(np.searchsorted(times[begin:stop], t, side))
+
+        return bound(lo, "left"), bound(hi, "right")
+
+    def _sparse_index(self, segment: dict, name: str, count: int, time_column: str):
+        key = (segment["name"], name, time_column)
+        cached = self._sparse.get(key)
+        if cached is not None:
+            return cached
+
+        stride = self.index.get("sparse_stride", SPARSE_STRIDE)
+        path = self.directory / segment["name"] / f"{name}.ts_pub.idx"
+        if time_column == "ts_pub" and path.exists():
+            # Marks past the published row count belong to a flush cut short by a crash
+            mark_times = np.fromfile(path, dtype=DTYPE)[: -(-count // stride)]
+            mark_rows = np.arange(len(mark_times), dtype=np.int64) * stride
+        else:
+            # Not written by the recorder (ts_mm, or an older recording): build it now
+            mark_rows = np.arange(0, count, stride, dtype=np.int64)
+            mark_times = np.array(self._column(segment["name"], name, time_column, count)[::stride])
+
+        self._sparse[key] = (mark_rows, mark_times)
+        return mark_rows, mark_times
+
+    def _column(self, segment: str, name: str, col: str, count: int) -> "np.ndarray":
+        if count == 0:
+            return np.empty(0, dtype=DTYPE)
+        key = (segment, name, col)
+        mapped = self._maps.get(key)
+        if mapped is None or len(mapped) < count:
+            path = self.directory / segment / f"{name}.{col}.f8"
+            mapped = np.memmap(path, dtype=DTYPE, mode="r")
+            self._maps[key] = mapped
+        return mapped[:count]
@@ -0,0 +1,524 @@
+"""
+Latest beacon positions in a shared-memory table, for consumers running
+in other processes on the same machine (plot process, controller, logger,
+safety monitor). Reading never serializes anything or makes a syscall.
+
+The segment starts with a fixed little-endian header followed by
+`capacity` fixed-size records, of which the first `count` are in use:
+
+    header  magic "MMSP", layout version u16, record size u16,
+            capacity u32, count u32, generation u32, writer pid u32, seq u64
+    record  seq u32, id u16, type u8, pad, x f64, y f64, z f64,
+            ts_mm f64, ts_read f64, version u64
+
+Type codes are the wire codes (utils.wire.TYPE_CODES). ts_mm is NaN when
+the Marvelmind timestamp is missing; ts_read is the tracker's monotonic
+clock, which is system-wide on Linux. A record's version is the tracker
+version of its last change.
+
+Each beacon keeps its slot, and each record is a seqlock: the writer makes
+the record's seq odd before writing it and even again afterwards, and
+readers retry a record whose seq was odd or changed while they copied it.
+New beacons are appended before count is raised. Removing beacons moves
+slots, so it is done with the header's generation odd, and readers retry
+if the generation changed. The header seq is raised after every batch of
+writes, so polling for changes is a single 8-byte read.
+
+Readers check the seqs and also compare a second copy of what they
+read, so a write that overlaps the copy is caught whichever order its
+stores land in. CPython writes each field with a plain store and issues
+no memory barriers: the seq check is sound on x86, which keeps stores in
+order, while on weakly ordered CPUs (ARM) it rests on the second copy.
+"""
+
+import math
+import os
+import struct
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from utils.logging_setup import get_logger
+from utils.snapshot import Snapshot
+from utils.wire import TYPE_CODES, TYPE_NAMES
+
+logger = get_logger(__name__)
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; SharedPositionReader.array() then is unavailable
+    np = None
+
+MAGIC = b"MMSP"
+LAYOUT_VERSION = 2
+
+# Well-known segment name, so unrelated local processes can attach without configuration
+DEFAULT_NAME = "marvelmind_positions"
+DEFAULT_CAPACITY = 256
+
+HEADER = struct.Struct("<4sHHIIIIQ")
+RECORD = struct.Struct("<IHBxdddddQ")
+
+# Header fields written on their own
+COUNT = struct.Struct("<I")
+COUNT_OFFSET = 12
+GENERATION = struct.Struct("<I")
+GENERATION_OFFSET = 16
+WRITER = struct.Struct("<I")
+WRITER_OFFSET = 20
+SEQ = struct.Struct("<Q")
+SEQ_OFFSET = 24
+
+# Record seq, and the rest of the record after it
+RECORD_SEQ = struct.Struct("<I")
+RECORD_BODY = struct.Struct("<HBxdddddQ")
+RECORD_BODY_OFFSET = RECORD_SEQ.size
+
+assert RECORD.size == RECORD_SEQ.size + RECORD_BODY.size
+
+if np is not None:
+    RECORD_DTYPE = np.dtype(
+        [
+            ("seq", "<u4"),
+            ("id", "<u2"),
+            ("type", "u1"),
+            ("_pad", "u1"),
+            ("x", "<f8"),
+            ("y", "<f8"),
+            ("z", "<f8"),
+            ("ts_mm", "<f8"),
+            ("ts_read", "<f8"),
+            ("version", "<u8"),
+        ]
+    )
+    assert RECORD_DTYPE.itemsize == RECORD.size
+else:
+    RECORD_DTYPE = None
+
+_NAN = float("nan")
+
+# Segments created by this process, with the number of live tables on each name
+# (a replaced table and its replacement share one); readers here must leave
+# their registration alone
+_OWNED: Dict[str, int] = {}
+
+
+class SharedRecord(NamedTuple):
+    beacon_id: int
+    beacon_type: str
+    x: float
+    y: float
+    z: float
+    ts_mm: Optional[float]
+    ts_read: float
+    version: int
+
+
+# (id, type name, x, y, z, ts_mm, ts_read), as in Snapshot.records
+_Body = Tuple[int, str, float, float, float, Optional[float], float]
+
+
+def table_size(capacity: int) -> int:
+    return HEADER.size + capacity * RECORD.size
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    if shm.name not in _OWNED:
+        # Before 3.13 attaching also registers the segment with this process's
+        # resource tracker, which would unlink it when the reader exits
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+def _table_writer(name: str) -> Optional[int]:
+    """
+    Pid of the writer of the existing table `name`, or None if the segment
+    is not a table of this layout.
+    """
+    shm = _attach(name)
+    try:
+        if shm.size < HEADER.size:
+            return None
+        magic, layout = HEADER.unpack_from(shm.buf, 0)[:2]
+        if magic != MAGIC or layout != LAYOUT_VERSION:
+            return None
+        return WRITER.unpack_from(shm.buf, WRITER_OFFSET)[0]
+    finally:
+        shm.close()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, owned by another user
+        return True
+    return True
+
+
+class SharedPositionTable:
+    """
+    Writer side of the table. Publish straight from the tracker:
+
+        table = SharedPositionTable()
+        table.attach(tracker)
+
+    or, since it has the broadcaster interface (update(), start(), stop()),
+    through PositionSink alongside the other broadcasters. Only beacons
+    whose data changed are rewritten.
+
+    Readers attach by name (DEFAULT_NAME unless given). The writer's pid is
+    kept in the header: a segment left behind by a writer that exited is
+    replaced, but one whose writer is still running raises FileExistsError
+    unless replace=True. The segment is removed by stop().
+    """
+
+    def __init__(
+        self,
+        name: Optional[str] = DEFAULT_NAME,
+        capacity: int = DEFAULT_CAPACITY,
+        replace: bool = False,
+    ):
+        if capacity <= 0:
+            raise ValueError(f"capacity must be positive, got {capacity}")
+
+        self.capacity = capacity
+        size = table_size(capacity)
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            writer = _table_writer(name)
+            if not replace:
+                if writer is None:
+                    raise FileExistsError(
+                        f"{name} exists and is not a shared position table of layout {LAYOUT_VERSION}; "
+                        "pass replace=True to remove it"
+                    ) from None
+                if _pid_alive(writer):
+                    raise FileExistsError(
+                        f"Shared position table {name} is in use by process {writer}; "
+                        "pass replace=True to take it over"
+                    ) from None
+            logger.warning("Replacing shared position table %s (writer pid %s)", name, writer)
+            stale = shared_memory.SharedMemory(name=name)
+            if writer is not None:
+                # Tell a still running writer its segment was taken over, so its stop() leaves the name alone
+                WRITER.pack_into(stale.buf, WRITER_OFFSET, 0)
+            stale.close()
+            stale.unlink()
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.name = self._shm.name
+        _OWNED[self.name] = _OWNED.get(self.name, 0) + 1
+        self._buf = self._shm.buf
+
+        self._seq = 0
+        self._generation = 0
+        # Beacon id -> slot, with the record seq and last written body per slot
+        self._slots: Dict[int, int] = {}
+        self._record_seqs: List[int] = []
+        self._bodies: List[_Body] = []
+        self._reset_version: Optional[int] = None
+        self._subscription = None
+
+        HEADER.pack_into(self._buf, 0, MAGIC, LAYOUT_VERSION, RECORD.size, capacity, 0, 0, os.getpid(), 0)
+        logger.info("Shared position table %s created (%d records)", self.name, capacity)
+
+    def attach(self, tracker):
+        """
+        Write each beacon update from the tracker's ingest path.
+        """
+        self._subscription = tracker.subscribe(lambda update: self._on_update(tracker, update), coalesce=True)
+        return self._subscription
+
+    def start(self):
+        pass
+
+    def update(self, snapshot: Snapshot):
+        records = snapshot.records
+        ids = {rec[0] for rec in records}
+        if any(bid not in ids for bid in self._slots):
+            self._remove(ids)
+
+        version = snapshot.version or 0
+        for rec in records:
+            self._put(rec, version)
+        self._bump()
+
+    def clear(self):
+        """
+        Remove every beacon, e.g. after the tracker dropped them.
+        """
+        self._remove(())
+        self._bump()
+
+    def stop(self):
+        if self._buf is None:
+            return
+        if self._subscription is not None:
+            self._subscription.close()
+            self._subscription = None
+        replaced = WRITER.unpack_from(self._buf, WRITER_OFFSET)[0] != os.getpid()
+        self._buf.release()
+        self._buf = None
+        self._shm.close()
+        if _OWNED.get(self.name, 0) > 1:
+            _OWNED[self.name] -= 1
+        else:
+            _OWNED.pop(self.name, None)
+        if replaced:
+            # The name now belongs to the writer that took over; only drop the mapping,
+            # and keep this process's resource tracker from unlinking it at exit
+            if self.name not in _OWNED:
+                resource_tracker.unregister(self._shm._name, "shared_memory")
+            logger.info("Shared position table %s was taken over, not removing it", self.name)
+            return
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+        logger.info("Shared position table %s removed", self.name)
+
+    def _on_update(self, tracker, update):
+        if self._buf is None:
+            return
+        if tracker.reset_version != self._reset_version:
+            # The tracker dropped all beacons; only ones updated since then are current
+            if self._reset_version is not None:
+                self._remove(())
+            self._reset_version = tracker.reset_version
+
+        s = update.sample
+        self._put((update.beacon_id, update.beacon_type.value, s.x, s.y, s.z, s.ts_mm, s.ts_read), update.version)
+        self._bump()
+
+    def _put(self, body: _Body, version: int) -> None:
+        slot = self._slots.get(body[0])
+        if slot is None:
+            if len(self._bodies) >= self.capacity:
+                logger.warning("Shared position table is full (%d beacons), dropping beacon %s", self.capacity, body[0])
+                return
+            # Written before count is raised, so readers never see a half-written new record
+            slot = len(self._bodies)
+            self._slots[body[0]] = slot
+            if slot == len(self._record_seqs):
+                self._record_seqs.append(0)
+            self._bodies.append(body)
+            self._write(slot, body, version)
+            COUNT.pack_into(self._buf, COUNT_OFFSET, slot + 1)
+        elif self._bodies[slot] != body:
+            self._bodies[slot] = body
+            self._write(slot, body, version)
+
+    def _write(self, slot: int, body: _Body, version: int) -> None:
+        buf = self._buf
+        offset = HEADER.size + slot * RECORD.size
+        seq = self._record_seqs[slot] + 1
+        RECORD_SEQ.pack_into(buf, offset, seq & 0xFFFFFFFF)
+
+        bid, btype, x, y, z, ts_mm, ts_read = body
+        RECORD_BODY.pack_into(
+            buf,
+            offset + RECORD_BODY_OFFSET,
+            bid,
+            TYPE_CODES.get(btype, 0),
+            x,
+            y,
+            z,
+            _NAN if ts_mm is None else ts_mm,
+            ts_read,
+            version,
+        )
+
+        seq += 1
+        RECORD_SEQ.pack_into(buf, offset, seq & 0xFFFFFFFF)
+        self._record_seqs[slot] = seq
+
+    def _remove(self, keep) -> None:
+        """
+        Drop beacons not in `keep` and compact the remaining slots.
+        """
+        buf = self._buf
+        self._generation += 1
+        GENERATION.pack_into(buf, GENERATION_OFFSET, self._generation & 0xFFFFFFFF)
+
+        kept = [(body, self._read_version(slot)) for slot, body in enumerate(self._bodies) if body[0] in keep]
+        self._slots = {}
+        self._bodies = []
+        for body, version in kept:
+            slot = len(self._bodies)
+            self._slots[body[0]] = slot
+            self._bodies.append(body)
+            self._write(slot, body, version)
+        COUNT.pack_into(buf, COUNT_OFFSET, len(kept))
+
+        self._generation += 1
+        GENERATION.pack_into(buf, GENERATION_OFFSET, self._generation & 0xFFFFFFFF)
+
+    def _read_version(self, slot: int) -> int:
+        return RECORD_BODY.unpack_from(self._buf, HEADER.size + slot * RECORD.size + RECORD_BODY_OFFSET)[-1]
+
+    def _bump(self) -> None:
+        self._seq += 1
+        SEQ.pack_into(self._buf, SEQ_OFFSET, self._seq)
+
+
+class SharedPositionReader:
+    """
+    Reader side of the table, attached by name:
+
+        reader = SharedPositionReader()
+        if reader.changed():
+            for rec in reader.read():
+                ...
+        rec = reader.get(5)
+
+    changed() and get() cost a few microseconds and never block the writer.
+    """
+
+    # Give up on a consistent copy after this long (writer died mid-update)
+    READ_TIMEOUT = 1.0
+
+    def __init__(self, name: str = DEFAULT_NAME):
+        self._shm = _attach(name)
+        self.name = name
+        self._buf = self._shm.buf
+
+        magic, layout, record_size, capacity = HEADER.unpack_from(self._buf, 0)[:4]
+        if magic != MAGIC:
+            raise ValueError(f"{name} is not a shared position table")
+        if layout != LAYOUT_VERSION or record_size != RECORD.size:
+            raise ValueError(f"{name} has layout {layout} (record size {record_size}), expected {LAYOUT_VERSION}")
+
+        self.capacity = capacity
+        self._last_seq = -1
+        # Slot index for get(), valid for one (generation, count)
+        self._index: Dict[int, int] = {}
+        self._index_key: Optional[Tuple[int, int]] = None
+
+    @property
+    def seq(self) -> int:
+        return SEQ.unpack_from(self._buf, SEQ_OFFSET)[0]
+
+    def changed(self) -> bool:
+        """
+        True if the table was written since the last read().
+        """
+        return SEQ.unpack_from(self._buf, SEQ_OFFSET)[0] != self._last_seq
+
+    def read(self) -> List[SharedRecord]:
+        """
+        Consistent copy of every record.
+        """
+        return [_record(rec[1:]) for rec in RECORD.iter_unpack(self._copy())]
+
+    def get(self, beacon_id: int) -> Optional[SharedRecord]:
+        """
+        Consistent copy of one beacon's record, or None if it is not in the table.
+        """
+        buf = self._buf
+        deadline = None
+        while True:
+            generation = GENERATION.unpack_from(buf, GENERATION_OFFSET)[0]
+            if not generation & 1:
+                count = min(COUNT.unpack_from(buf, COUNT_OFFSET)[0], self.capacity)
+                if self._index_key != (generation, count):
+                    self._build_index(count)
+                    if GENERATION.unpack_from(buf, GENERATION_OFFSET)[0] != generation:
+                        deadline = self._wait(deadline)
+                        continue
+                    self._index_key = (generation, count)
+
+                slot = self._index.get(beacon_id)
+                body = None if slot is None else self._read_slot(slot)
+                if GENERATION.unpack_from(buf, GENERATION_OFFSET)[0] == generation:
+                    return None if body is None else _record(body)
+            deadline = self._wait(deadline)
+
+    def array(self) -> "np.ndarray":
+        """
+        Consistent copy of every record as a structured array (RECORD_DTYPE).
+        """
+        if np is None:
+            raise RuntimeError("SharedPositionReader.array() requires NumPy")
+
+        return np.frombuffer(self._copy(), RECORD_DTYPE)
+
+    def close(self):
+        if self._buf is None:
+            return
+        self._buf.release()
+        self._buf = None
+        self._shm.close()
+
+    def _copy(self) -> bytes:
+        """
+        The records in use as one consistent block of bytes.
+        """
+        buf = self._buf
+        deadline = None
+        while True:
+            seq = SEQ.unpack_from(buf, SEQ_OFFSET)[0]
+            generation = GENERATION.unpack_from(buf, GENERATION_OFFSET)[0]
+            if not generation & 1:
+                count = min(COUNT.unpack_from(buf, COUNT_OFFSET)[0], self.capacity)
+                end = HEADER.size + count * RECORD.size
+                data = bytes(buf[HEADER.size : end])
+                # No record was mid-write: every seq (low byte first) is even,
+                # and a second copy is identical, so no write started meanwhile
+                if (
+                    not any(b & 1 for b in data[:: RECORD.size])
+                    and buf[HEADER.size : end] == data
+                    and GENERATION.unpack_from(buf, GENERATION_OFFSET)[0] == generation
+                ):
+                    self._last_seq = seq
+                    return data
+            deadline = self._wait(deadline)
+
+    def _read_slot(self, slot: int) -> tuple:
+        buf = self._buf
+        offset = HEADER.size + slot * RECORD.size
+        deadline = None
+        end = offset + RECORD.size
+        while True:
+            data = bytes(buf[offset:end])
+            # As in _copy(): an even seq, and a second copy that is identical
+            if not data[0] & 1 and buf[offset:end] == data:
+                return RECORD_BODY.unpack_from(data, RECORD_BODY_OFFSET)
+            deadline = self._wait(deadline)
+
+    def _build_index(self, count: int) -> None:
+        buf = self._buf
+        self._index = {
+            RECORD_BODY.unpack_from(buf, HEADER.size + slot * RECORD.size + RECORD_BODY_OFFSET)[0]: slot
+            for slot in range(count)
+        }
+
+    def _wait(self, deadline: Optional[float]) -> float:
+        # The writer is mid-update; yield and retry
+        now = time.monotonic()
+        if deadline is None:
+            deadline = now + self.READ_TIMEOUT
+        elif now > deadline:
+            raise TimeoutError(f"No consistent read of {self.name} within {self.READ_TIMEOUT}s")
+        time.sleep(0)
+        return deadline
+
+
+def _record(body: tuple) -> SharedRecord:
+    bid, code, x, y, z, ts_mm, ts_read, version = body
+    return SharedRecord(
+        bid,
+        TYPE_NAMES.get(code, "unknown"),
+        x,
+        y,
+        z,
+        None if math.isnan(ts_mm) else ts_mm,
+        ts_read,
+        version,
+    )
@@ -1,14 +1,41 @@
 import time
 
 from src.position_tracker import BeaconType
+from utils.latency import STAGE_READ_TO_PUBLISH
+from utils.snapshot import Snapshot
 
 
 class PositionSink:
-    def __init__(self, csv_writer=None, broadcaster=None):
+    def __init__(self, csv_writer=None, broadcaster=None, latency=None):
         self.csv_writer = csv_writer
+        # One broadcaster or a list of them (e.g. TCP plus UDP multicast)
         self.broadcaster = broadcaster
+        if broadcaster is None:
+            self._broadcasters = []
+        elif isinstance(broadcaster, (list, tuple)):
+            self._broadcasters = list(broadcaster)
+        else:
+            self._broadcasters = [broadcaster]
+        self._last_version = None
+        # LatencyTracker for read-to-publish times, and the last ts_read published per beacon
+        self.latency = latency
+        self._published_reads = {}
+
+    def attach(self, tracker):
+        """
+        Publish from the tracker's ingest path whenever beacons update,
+        instead of calling publish() from a polling loop.
+        """
+        return tracker.subscribe(lambda update: self.publish(tracker), coalesce=True)
 
     def publish(self, tracker):
+        # Broadcasters already hold the latest snapshot when nothing moved or
+        # refreshed since the last publish; the CSV writer still logs every call
+        changed = tracker.version != self._last_version
+        if not changed and not self.csv_writer:
+            return
+        self._last_version = tracker.version
+
         ts_pub = time.time()
 
         beacons = []
@@ -19,25 +46,26 @@ class PositionSink:
         for bid, pos in tracker.get_stationary_map().items():
             beacons.append((BeaconType.STATIONARY, bid, pos))
 
+        if changed and self.latency is not None:
+            self._record_latency(tracker, beacons)
+
         if self.csv_writer:
             self.csv_writer.write_snapshot(ts_pub, beacons)
 
-        if self.broadcaster:
-            payload = {
-                "ts_pub": ts_pub,
-                "beacons": [
-                    {
-                        "type": btype.value,
-                        "id": bid,
-                        "pos": {
-                            "x": pos.x,
-                            "y": pos.y,
-                            "z": pos.z,
-                        },
-                        "ts_mm": pos.ts_mm,
-                        "ts_read": pos.ts_read,
-                    }
-                    for btype, bid, pos in beacons
-                ],
-            }
-            self.broadcaster.update(payload)
+        if changed and self._broadcasters:
+            # Payload and encodings are built lazily, once, and shared by all broadcasters
+            snapshot = Snapshot(ts_pub, beacons, tracker.version)
+            for broadcaster in self._broadcasters:
+                broadcaster.update(snapshot)
+
+    def _record_latency(self, tracker, beacons):
+        # ts_read is on the tracker's clock, not the wall clock of ts_pub
+        now = tracker.now()
+        published = self._published_reads
+        samples = []
+        for _, bid, pos in beacons:
+            # Beacons whose sample was already published are not waiting on this one
+            if published.get(bid) != pos.ts_read:
+                published[bid] = pos.ts_read
+                samples.append((bid, now - pos.ts_read))
+        self.latency.record_many(STAGE_READ_TO_PUBLISH, samples)
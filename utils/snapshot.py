@@ -0,0 +1,231 @@
+import json
+from typing import Dict, List, Optional, Tuple
+
+from src.position_tracker import BeaconType, PositionSample
+from utils.wire import (
+    ENCODING_BINARY,
+    FLAG_DELTA,
+    FLAG_KEYFRAME,
+    Record,
+    encode_frame,
+    encode_payload,
+    encode_records,
+    removed_record,
+)
+
+
+class Snapshot:
+    """
+    One published tracker state, shared by every sink output.
+
+    The payload dict and its encodings (newline-terminated JSON, binary
+    frame) are built lazily, at most once each, and then reused for every
+    client and every resend.
+    `version` is the tracker version the snapshot was taken at, or None for
+    snapshots wrapped around a ready-made payload dict.
+    """
+
+    __slots__ = ("ts_pub", "version", "beacons", "_payload", "_json", "_binary", "_records")
+
+    def __init__(
+        self,
+        ts_pub: float,
+        beacons: List[Tuple[BeaconType, int, PositionSample]],
+        version: Optional[int] = None,
+    ):
+        self.ts_pub = ts_pub
+        self.version = version
+        self.beacons = beacons
+        self._payload: Optional[dict] = None
+        self._json: Optional[bytes] = None
+        self._binary: Optional[bytes] = None
+        self._records: Optional[List[Record]] = None
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> "Snapshot":
+        snapshot = cls(payload.get("ts_pub", 0.0), [])
+        snapshot._payload = payload
+        return snapshot
+
+    def select(self, ids=None, types=None) -> "Snapshot":
+        """
+        Snapshot of just the beacons with an id in `ids` and a type value in
+        `types` (None means no restriction).
+        """
+        if ids is None and types is None:
+            return self
+        if self._payload is not None and not self.beacons:
+            selected = Snapshot.from_payload(
+                {
+                    "ts_pub": self.ts_pub,
+                    "beacons": [
+                        b
+                        for b in self._payload.get("beacons", [])
+                        if (ids is None or b["id"] in ids) and (types is None or b["type"] in types)
+                    ],
+                }
+            )
+            selected.version = self.version
+            return selected
+        return Snapshot(
+            self.ts_pub,
+            [
+                b
+                for b in self.beacons
+                if (ids is None or b[1] in ids) and (types is None or b[0].value in types)
+            ],
+            self.version,
+        )
+
+    @property
+    def beacon_count(self) -> int:
+        if self._payload is not None:
+            return len(self._payload.get("beacons", []))
+        return len(self.beacons)
+
+    @property
+    def payload(self) -> dict:
+        if self._payload is None:
+            self._payload = {
+                "ts_pub": self.ts_pub,
+                "beacons": [
+                    {
+                        "type": btype.value,
+                        "id": bid,
+                        "pos": {
+                            "x": pos.x,
+                            "y": pos.y,
+                            "z": pos.z,
+                        },
+                        "ts_mm": pos.ts_mm,
+                        "ts_read": pos.ts_read,
+                    }
+                    for btype, bid, pos in self.beacons
+                ],
+            }
+        return self._payload
+
+    @property
+    def records(self) -> List[Record]:
+        """
+        Beacons as wire Record tuples, used for delta encoding.
+        """
+        if self._records is None:
+            if self._payload is not None and not self.beacons:
+                self._records = []
+                for b in self._payload.get("beacons", []):
+                    pos = b.get("pos", {})
+                    self._records.append(
+                        (
+                            b.get("id"),
+                            b.get("type"),
+                            pos.get("x"),
+                            pos.get("y"),
+                            pos.get("z"),
+                            b.get("ts_mm"),
+                            b.get("ts_read", 0.0),
+                        )
+                    )
+            else:
+                self._records = [
+                    (bid, btype.value, pos.x, pos.y, pos.z, pos.ts_mm, pos.ts_read)
+                    for btype, bid, pos in self.beacons
+                ]
+        return self._records
+
+    def json_bytes(self) -> bytes:
+        if self._json is None:
+            self._json = json.dumps(self.payload).encode() + b"\n"
+        return self._json
+
+    def binary_bytes(self) -> bytes:
+        if self._binary is None:
+            seq = self.version or 0
+            if self._payload is not None and not self.beacons:
+                self._binary = encode_payload(self._payload, seq)
+            else:
+                self._binary = encode_frame(self.ts_pub, self.beacons, seq)
+        return self._binary
+
+    def encoded(self, encoding: str) -> bytes:
+        if encoding == ENCODING_BINARY:
+            return self.binary_bytes()
+        return self.json_bytes()
+
+
+class DeltaFrames:
+    """
+    Keyframe and delta encodings of one snapshot at frame `seq`, each built
+    at most once per encoding and shared by every delta-mode client.
+    """
+
+    __slots__ = ("seq", "snapshot", "changed", "removed", "_cache")
+
+    def __init__(self, seq: int, snapshot: Snapshot, changed: List[Record], removed: List[int]):
+        self.seq = seq
+        self.snapshot = snapshot
+        self.changed = changed
+        self.removed = removed
+        self._cache: Dict[Tuple[bool, str], bytes] = {}
+
+    def encoded(self, encoding: str, keyframe: bool) -> bytes:
+        key = (keyframe, encoding)
+        msg = self._cache.get(key)
+        if msg is None:
+            msg = self._encode(encoding, keyframe)
+            self._cache[key] = msg
+        return msg
+
+    def _encode(self, encoding: str, keyframe: bool) -> bytes:
+        snapshot = self.snapshot
+        if encoding == ENCODING_BINARY:
+            if keyframe:
+                return encode_records(snapshot.ts_pub, snapshot.records, self.seq, FLAG_KEYFRAME)
+            records = self.changed + [removed_record(bid) for bid in self.removed]
+            return encode_records(snapshot.ts_pub, records, self.seq, FLAG_DELTA)
+
+        if keyframe:
+            payload = dict(snapshot.payload, seq=self.seq, kind="key")
+        else:
+            changed_ids = {r[0] for r in self.changed}
+            payload = {
+                "seq": self.seq,
+                "kind": "delta",
+                "ts_pub": snapshot.ts_pub,
+                "beacons": [b for b in snapshot.payload["beacons"] if b["id"] in changed_ids],
+                "removed": self.removed,
+            }
+        return json.dumps(payload).encode() + b"\n"
+
+
+class DeltaEncoder:
+    """
+    Tracks what the previous frame contained and turns each new snapshot
+    into DeltaFrames with the next sequence number.
+    """
+
+    def __init__(self):
+        self.seq = 0
+        self._last: Dict[int, Record] = {}
+        self._frames: Optional[DeltaFrames] = None
+
+    def frames_for(self, snapshot: Snapshot) -> DeltaFrames:
+        """
+        The latest DeltaFrames if they are for `snapshot`, otherwise a new
+        frame. Used to send keyframes without advancing the sequence.
+        """
+        if self._frames is None or self._frames.snapshot is not snapshot:
+            self._frames = self.advance(snapshot)
+        return self._frames
+
+    def advance(self, snapshot: Snapshot) -> DeltaFrames:
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+
+        current = {r[0]: r for r in snapshot.records}
+        last = self._last
+        changed = [r for bid, r in current.items() if last.get(bid) != r]
+        removed = [bid for bid in last if bid not in current]
+        self._last = current
+
+        self._frames = DeltaFrames(self.seq, snapshot, changed, removed)
+        return self._frames
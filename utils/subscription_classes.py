@@ -0,0 +1,188 @@
+import time
+from typing import Dict, FrozenSet, List, NamedTuple, Optional
+
+from utils.latency import fresh_beacons
+from utils.snapshot import DeltaEncoder, DeltaFrames, Snapshot
+from utils.wire import ENCODING_JSON, ENCODINGS, TYPE_REMOVED, TYPE_CODES
+
+BEACON_TYPES = tuple(t for t in TYPE_CODES if t != TYPE_REMOVED)
+
+
+class ClientOptions(NamedTuple):
+    """
+    What a client asked for in its handshake. Clients with equal options
+    share one SubscriptionClass.
+    """
+
+    ids: Optional[FrozenSet[int]] = None
+    types: Optional[FrozenSet[str]] = None
+    rate_hz: float = 20.0
+    encoding: str = ENCODING_JSON
+    delta: bool = False
+
+    def updated(self, handshake: dict, max_rate_hz: float) -> "ClientOptions":
+        """
+        Apply a parsed handshake. Raises ValueError for invalid fields.
+        """
+        options = self
+        if "ids" in handshake:
+            ids = handshake["ids"]
+            if ids is not None:
+                if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+                    raise ValueError(f"ids must be a list of integers, got {ids!r}")
+                ids = frozenset(ids)
+            options = options._replace(ids=ids)
+        if "types" in handshake:
+            types = handshake["types"]
+            if types is not None:
+                if not isinstance(types, list) or not all(t in BEACON_TYPES for t in types):
+                    raise ValueError(f"types must be a list drawn from {BEACON_TYPES}, got {types!r}")
+                types = frozenset(types)
+            options = options._replace(types=types)
+        if "rate_hz" in handshake:
+            rate_hz = handshake["rate_hz"]
+            if not isinstance(rate_hz, (int, float)) or rate_hz <= 0:
+                raise ValueError(f"rate_hz must be a positive number, got {rate_hz!r}")
+            options = options._replace(rate_hz=min(float(rate_hz), max_rate_hz))
+        if "encoding" in handshake:
+            if handshake["encoding"] not in ENCODINGS:
+                raise ValueError(f"encoding must be one of {ENCODINGS}")
+            options = options._replace(encoding=handshake["encoding"])
+        if "delta" in handshake:
+            options = options._replace(delta=bool(handshake["delta"]))
+        return options
+
+
+class SubscriptionClass:
+    """
+    Schedule and encoding state shared by every client with the same
+    ClientOptions: the beacon selection, its delta stream and its encoded
+    messages are computed once per class, not once per client.
+    """
+
+    def __init__(self, options: ClientOptions, keyframe_interval: float):
+        self.options = options
+        self.period = 1.0 / options.rate_hz
+        self.keyframe_interval = keyframe_interval
+        self.members = 0
+
+        self.next_due = 0.0
+        self.current: Optional[Snapshot] = None
+        self.frames: Optional[DeltaFrames] = None
+        self.keyframe_all = False
+        # Set when poll() schedules a snapshot the class has not sent before
+        # (not a heartbeat resend); see take_fresh()
+        self.fresh = False
+        self._sent_reads: Dict[int, float] = {}
+        self._created = time.time()
+
+        self._source: Optional[Snapshot] = None
+        self._delta_encoder = DeltaEncoder()
+        self._last_send_time = 0.0
+        self._last_keyframe_time = 0.0
+
+    def select(self, source: Snapshot) -> Snapshot:
+        if source is self._source and self.current is not None:
+            return self.current
+        return source.select(self.options.ids, self.options.types)
+
+    def poll(self, now: float, source: Snapshot, heartbeat_interval: Optional[float]) -> bool:
+        """
+        Advance the schedule. Returns True if every member should be sent
+        message() this tick.
+        """
+        if now < self.next_due:
+            return False
+        self.next_due += self.period
+        if self.next_due < now:
+            # Fell behind; resynchronise instead of bursting to catch up
+            self.next_due = now + self.period
+
+        selected = self.select(source)
+        self._source = source
+        filtered = self.options.ids is not None or self.options.types is not None
+        unchanged = self.current is not None and (
+            # A filtered view can be unchanged even when other beacons moved
+            selected is self.current or (filtered and selected.records == self.current.records)
+        )
+        if unchanged and (heartbeat_interval is None or now - self._last_send_time < heartbeat_interval):
+            return False
+
+        self.fresh = not unchanged
+        self.current = selected
+        self._last_send_time = now
+        if self.options.delta:
+            # Every send is a new frame, heartbeats included
+            self.frames = self._delta_encoder.advance(selected)
+            self.keyframe_all = now - self._last_keyframe_time >= self.keyframe_interval
+            if self.keyframe_all:
+                self._last_keyframe_time = now
+        return True
+
+    def prepare_pending(self, source: Snapshot) -> None:
+        """
+        Make sure there is something to send to a client that joined (or
+        asked to resync) between scheduled sends.
+        """
+        if self.current is None:
+            self.current = self.select(source)
+            self._source = source
+        # A catch-up keyframe repeats an already scheduled snapshot
+        self.fresh = False
+        if self.options.delta:
+            self.frames = self._delta_encoder.frames_for(self.current)
+            self.keyframe_all = False
+
+    def take_fresh(self) -> Optional[List[int]]:
+        """
+        Once per snapshot scheduled by poll(): the ids of the beacons whose
+        sample changed since the previous one. None for heartbeats, catch-up
+        keyframes and every call after the first, so send latency is sampled
+        once per new snapshot. Snapshots published before the class existed
+        are not sampled either: their age is not send latency.
+        """
+        if not self.fresh:
+            return None
+        self.fresh = False
+        if self.current.ts_pub < self._created:
+            fresh_beacons(self.current.records, self._sent_reads)
+            return None
+        return fresh_beacons(self.current.records, self._sent_reads)
+
+    def message(self, pending: bool) -> bytes:
+        if not self.options.delta:
+            return self.current.encoded(self.options.encoding)
+        return self.frames.encoded(self.options.encoding, self.keyframe_all or pending)
+
+
+class SubscriptionClasses:
+    """
+    Registry of live subscription classes, keyed by ClientOptions.
+    """
+
+    def __init__(self, keyframe_interval: float):
+        self.keyframe_interval = keyframe_interval
+        self._classes: Dict[ClientOptions, SubscriptionClass] = {}
+
+    def __len__(self) -> int:
+        return len(self._classes)
+
+    def values(self):
+        return list(self._classes.values())
+
+    def join(self, options: ClientOptions) -> SubscriptionClass:
+        cls = self._classes.get(options)
+        if cls is None:
+            cls = SubscriptionClass(options, self.keyframe_interval)
+            cls.next_due = time.monotonic()
+            self._classes[options] = cls
+        cls.members += 1
+        return cls
+
+    def leave(self, cls: SubscriptionClass) -> None:
+        cls.members -= 1
+        if cls.members <= 0:
+            self._classes.pop(cls.options, None)
+
+    def next_due(self) -> Optional[float]:
+        return min((c.next_due for c in self._classes.values()), default=None)
@@ -0,0 +1,299 @@
+import json
+import socket
+import struct
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from utils.latency import STAGE_PUBLISH_TO_SEND, fresh_beacons
+from utils.logging_setup import get_logger
+from utils.snapshot import Snapshot
+from utils.wire import ENCODING_JSON, ENCODINGS, MAGIC, decode_frame, frame_to_payload
+
+logger = get_logger(__name__)
+
+UDP_MODES = ("multicast", "broadcast")
+
+# Every datagram starts with: magic, snapshot sequence, fragment index, fragment count
+DATAGRAM_MAGIC = b"MMPU"
+DATAGRAM_HEADER = struct.Struct("<4sIHH")
+
+DEFAULT_GROUP = "239.255.77.77"
+DEFAULT_PORT = 5556
+
+
+class UdpPositionBroadcaster:
+    """
+    Publishes snapshots over UDP multicast or broadcast, so the server cost
+    stays the same however many consumers listen on the LAN.
+
+    Each snapshot is sent in the same encoding the TCP broadcasters use
+    (JSON line or binary frame), as one datagram or, when larger than
+    `max_datagram`, as a numbered run of fragments. Use UdpPositionReceiver
+    to reassemble them.
+    """
+
+    def __init__(
+        self,
+        group=DEFAULT_GROUP,
+        port=DEFAULT_PORT,
+        rate_hz=20,
+        mode="multicast",
+        encoding=ENCODING_JSON,
+        ttl=1,
+        interface="0.0.0.0",
+        max_datagram=1400,
+        heartbeat_interval=1.0,
+        latency=None,
+    ):
+        if mode not in UDP_MODES:
+            raise ValueError(f"mode must be one of {UDP_MODES}, got {mode!r}")
+        if encoding not in ENCODINGS:
+            raise ValueError(f"encoding must be one of {ENCODINGS}, got {encoding!r}")
+        if max_datagram <= DATAGRAM_HEADER.size:
+            raise ValueError(f"max_datagram must be larger than {DATAGRAM_HEADER.size} bytes")
+
+        self.group = group
+        self.port = port
+        self.period = 1.0 / rate_hz
+        self.mode = mode
+        self.encoding = encoding
+        self.ttl = ttl
+        self.interface = interface
+        self.max_datagram = max_datagram
+        # Resend an unchanged snapshot after this many seconds, so clients can tell
+        # a quiet tracker from a dead link; None never resends
+        self.heartbeat_interval = heartbeat_interval
+        # LatencyTracker for publish-to-send times, if set
+        self.latency = latency
+        self._sent_reads: Dict[int, float] = {}
+
+        self._sock: Optional[socket.socket] = None
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._latest_payload: Optional[Snapshot] = None
+        self._last_sent: Optional[Snapshot] = None
+        self._last_send_time = 0.0
+        self._seq = 0
+
+        self.sent_snapshots = 0
+        self.sent_datagrams = 0
+        self._last_broadcast_log = 0.0
+
+    def start(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        if self.mode == "multicast":
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, self.ttl)
+            # Keep loopback on so consumers on this host receive too
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(self.interface))
+        else:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        self._sock = sock
+
+        self._running = True
+        self._thread = threading.Thread(target=self._broadcast_loop, daemon=True)
+        self._thread.start()
+        logger.info(
+            "UDP %s broadcaster started to %s:%d at %.1f Hz (%s)",
+            self.mode,
+            self.group,
+            self.port,
+            1.0 / self.period,
+            self.encoding,
+        )
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        logger.info("UDP broadcaster stopped")
+
+    def update(self, payload):
+        """
+        Set the snapshot to broadcast. Accepts a Snapshot or a payload dict.
+        """
+        if not isinstance(payload, Snapshot):
+            payload = Snapshot.from_payload(payload)
+        self._latest_payload = payload
+
+    def _due(self, snapshot: Snapshot) -> bool:
+        if snapshot is not self._last_sent:
+            return True
+        if self.heartbeat_interval is None:
+            return False
+        return time.monotonic() - self._last_send_time >= self.heartbeat_interval
+
+    def _send(self, data: bytes) -> bool:
+        self._seq = (self._seq + 1) & 0xFFFFFFFF
+        chunk = self.max_datagram - DATAGRAM_HEADER.size
+        count = max(1, -(-len(data) // chunk))
+        if count > 0xFFFF:
+            logger.error("Snapshot of %d bytes is too large to fragment, dropping", len(data))
+            return False
+
+        dest = (self.group, self.port)
+        for index in range(count):
+            header = DATAGRAM_HEADER.pack(DATAGRAM_MAGIC, self._seq, index, count)
+            self._sock.sendto(header + data[index * chunk : (index + 1) * chunk], dest)
+        self.sent_snapshots += 1
+        self.sent_datagrams += count
+        return True
+
+    def _broadcast_loop(self):
+        while self._running:
+            snapshot = self._latest_payload
+            if snapshot is not None and self._due(snapshot):
+                # Heartbeat resends are not sampled for send latency
+                fresh = snapshot is not self._last_sent
+                self._last_sent = snapshot
+                self._last_send_time = time.monotonic()
+                try:
+                    if self._send(snapshot.encoded(self.encoding)) and fresh and self.latency is not None:
+                        self.latency.record_beacons(
+                            STAGE_PUBLISH_TO_SEND,
+                            time.time() - snapshot.ts_pub,
+                            fresh_beacons(snapshot.records, self._sent_reads),
+                        )
+                except OSError as e:
+                    logger.warning("UDP send to %s:%d failed: %s", self.group, self.port, e)
+
+                now = time.monotonic()
+                if now - self._last_broadcast_log >= 1.0:
+                    logger.info(
+                        "UDP broadcasted %d beacons (%d snapshots, %d datagrams so far)",
+                        snapshot.beacon_count,
+                        self.sent_snapshots,
+                        self.sent_datagrams,
+                    )
+                    self._last_broadcast_log = now
+
+            time.sleep(self.period)
+
+
+class UdpPositionReceiver:
+    """
+    Receives and reassembles snapshots from UdpPositionBroadcaster.
+
+    Fragments of a snapshot that is overtaken by a newer one before it is
+    complete are discarded and counted in `incomplete`; sequence gaps are
+    counted in `lost`. Datagrams of the last delivered snapshot or an older
+    one (duplicated or reordered on the network) are ignored and counted in
+    `stale`, unless several older snapshots arrive in a row, which means the
+    broadcaster restarted its sequence.
+    """
+
+    # Distinct old sequences in a row, without a newer one, taken as a sender restart
+    RESYNC_AFTER = 3
+
+    def __init__(self, group=DEFAULT_GROUP, port=DEFAULT_PORT, mode="multicast", interface="0.0.0.0"):
+        if mode not in UDP_MODES:
+            raise ValueError(f"mode must be one of {UDP_MODES}, got {mode!r}")
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(("", port))
+        if mode == "multicast":
+            mreq = socket.inet_aton(group) + socket.inet_aton(interface)
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+        self._sock = sock
+
+        self._seq: Optional[int] = None
+        self._fragments: Dict[int, bytes] = {}
+        self._count = 0
+        self._last_complete: Optional[int] = None
+        self._stale_seq: Optional[int] = None
+        self._stale_run = 0
+
+        self.received = 0
+        self.lost = 0
+        self.incomplete = 0
+        self.stale = 0
+
+    def fileno(self) -> int:
+        return self._sock.fileno()
+
+    def recv(self, timeout: Optional[float] = None) -> Optional[bytes]:
+        """
+        Return the next complete snapshot's bytes, or None on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._sock.settimeout(remaining)
+            else:
+                self._sock.settimeout(None)
+
+            try:
+                datagram = self._sock.recv(65535)
+            except socket.timeout:
+                return None
+
+            data = self._accept(datagram)
+            if data is not None:
+                return data
+
+    def recv_payload(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """
+        Like recv(), decoded to the JSON payload shape whatever the encoding.
+        """
+        data = self.recv(timeout)
+        if data is None:
+            return None
+        if data[: len(MAGIC)] == MAGIC:
+            frame, _ = decode_frame(data)
+            return frame_to_payload(frame)
+        return json.loads(data)
+
+    def close(self) -> None:
+        self._sock.close()
+
+    def _accept(self, datagram: bytes) -> Optional[bytes]:
+        if len(datagram) < DATAGRAM_HEADER.size:
+            return None
+        magic, seq, index, count = DATAGRAM_HEADER.unpack_from(datagram)
+        if magic != DATAGRAM_MAGIC or count == 0 or index >= count:
+            return None
+
+        # The same gap as below, "negative" for the last complete sequence and older ones
+        if self._last_complete is not None and (seq - self._last_complete - 1) & 0xFFFFFFFF >= 0x80000000:
+            self.stale += 1
+            if seq != self._stale_seq:
+                self._stale_seq = seq
+                self._stale_run += 1
+            if self._stale_run < self.RESYNC_AFTER:
+                return None
+            logger.info("UDP sequence went back from %d to %d, resyncing", self._last_complete, seq)
+            self._last_complete = None
+            self._seq = None
+        self._stale_seq = None
+        self._stale_run = 0
+
+        if seq != self._seq:
+            if self._seq is not None and self._seq != self._last_complete:
+                self.incomplete += 1
+            self._seq = seq
+            self._fragments = {}
+            self._count = count
+
+        self._fragments[index] = datagram[DATAGRAM_HEADER.size :]
+        if len(self._fragments) < self._count:
+            return None
+
+        if self._last_complete is not None:
+            self.lost += (seq - self._last_complete - 1) & 0xFFFFFFFF
+        self._last_complete = seq
+        self.received += 1
+
+        data = b"".join(self._fragments[i] for i in range(self._count))
+        self._fragments = {}
+        return data
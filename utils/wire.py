@@ -0,0 +1,342 @@
+"""
+Binary framing for the position stream.
+
+A client opts in by sending one handshake line after connecting:
+
+    {"encoding": "binary"}\\n
+
+Until then (and for clients that never send one) the stream stays
+newline-delimited JSON. Each binary frame is a fixed little-endian header
+followed by `count` packed records:
+
+    header  magic "MMPB", wire version u8, flags u8, count u16,
+            seq u32 (tracker version, wrapping), ts_pub f64
+    record  id u16, type u8, pad, x f32, y f32, z f32, ts_mm f64, ts_read f64
+
+ts_mm is NaN when the Marvelmind timestamp is missing.
+
+In delta mode (handshake {"delta": true}) seq is a per-broadcaster frame
+counter and flags mark keyframes (every beacon) and deltas (only beacons
+changed since frame seq - 1; removed beacons carry type "removed"). A
+client that sees a gap in seq sends {"resync": true} and gets a keyframe.
+JSON frames carry the same information as "seq", "kind" and "removed".
+"""
+
+import json
+import math
+import struct
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; decode_records_array() then is unavailable
+    np = None
+
+
+ENCODING_JSON = "json"
+ENCODING_BINARY = "binary"
+ENCODINGS = (ENCODING_JSON, ENCODING_BINARY)
+
+MAGIC = b"MMPB"
+WIRE_VERSION = 1
+
+HEADER = struct.Struct("<4sBBHId")
+RECORD = struct.Struct("<HBxfffdd")
+
+FLAG_KEYFRAME = 0x01
+FLAG_DELTA = 0x02
+
+MAX_HANDSHAKE_LINE = 4096
+
+# Beacon type strings as used by BeaconType.value, in wire order
+TYPE_REMOVED = "removed"
+TYPE_CODES: Dict[str, int] = {"unknown": 0, "stationary": 1, "mobile": 2, TYPE_REMOVED: 255}
+TYPE_NAMES: Dict[int, str] = {code: name for name, code in TYPE_CODES.items()}
+
+if np is not None:
+    RECORD_DTYPE = np.dtype(
+        [
+            ("id", "<u2"),
+            ("type", "u1"),
+            ("_pad", "u1"),
+            ("x", "<f4"),
+            ("y", "<f4"),
+            ("z", "<f4"),
+            ("ts_mm", "<f8"),
+            ("ts_read", "<f8"),
+        ]
+    )
+    assert RECORD_DTYPE.itemsize == RECORD.size
+else:
+    RECORD_DTYPE = None
+
+
+# (id, type name, x, y, z, ts_mm, ts_read), as produced by decode_frame()
+Record = Tuple[int, str, float, float, float, Optional[float], float]
+
+
+class Frame(NamedTuple):
+    seq: int
+    flags: int
+    ts_pub: float
+    records: List[Record]
+
+    @property
+    def is_keyframe(self) -> bool:
+        return bool(self.flags & FLAG_KEYFRAME)
+
+    @property
+    def is_delta(self) -> bool:
+        return bool(self.flags & FLAG_DELTA)
+
+
+def encode_frame(ts_pub: float, beacons, seq: int = 0, flags: int = 0) -> bytes:
+    """
+    Encode (BeaconType, id, PositionSample) tuples as one binary frame.
+    """
+    buf = bytearray(HEADER.size + RECORD.size * len(beacons))
+    HEADER.pack_into(buf, 0, MAGIC, WIRE_VERSION, flags, len(beacons), seq & 0xFFFFFFFF, ts_pub)
+
+    offset = HEADER.size
+    pack_into = RECORD.pack_into
+    for btype, bid, pos in beacons:
+        ts_mm = pos.ts_mm if pos.ts_mm is not None else math.nan
+        pack_into(buf, offset, bid, TYPE_CODES.get(btype.value, 0), pos.x, pos.y, pos.z, ts_mm, pos.ts_read)
+        offset += RECORD.size
+    return bytes(buf)
+
+
+def encode_payload(payload: dict, seq: int = 0, flags: int = 0) -> bytes:
+    """
+    Encode a JSON-shaped payload dict as one binary frame.
+    """
+    beacons = payload.get("beacons", [])
+    buf = bytearray(HEADER.size + RECORD.size * len(beacons))
+    HEADER.pack_into(
+        buf, 0, MAGIC, WIRE_VERSION, flags, len(beacons), seq & 0xFFFFFFFF, payload.get("ts_pub", 0.0)
+    )
+
+    offset = HEADER.size
+    for b in beacons:
+        pos = b["pos"]
+        ts_mm = b.get("ts_mm")
+        RECORD.pack_into(
+            buf,
+            offset,
+            b["id"],
+            TYPE_CODES.get(b.get("type"), 0),
+            pos["x"],
+            pos["y"],
+            pos["z"],
+            ts_mm if ts_mm is not None else math.nan,
+            b.get("ts_read", 0.0),
+        )
+        offset += RECORD.size
+    return bytes(buf)
+
+
+def encode_records(ts_pub: float, records: List[Record], seq: int = 0, flags: int = 0) -> bytes:
+    """
+    Encode Record tuples as one binary frame.
+    """
+    buf = bytearray(HEADER.size + RECORD.size * len(records))
+    HEADER.pack_into(buf, 0, MAGIC, WIRE_VERSION, flags, len(records), seq & 0xFFFFFFFF, ts_pub)
+
+    offset = HEADER.size
+    for bid, btype, x, y, z, ts_mm, ts_read in records:
+        RECORD.pack_into(
+            buf,
+            offset,
+            bid,
+            TYPE_CODES.get(btype, 0),
+            x,
+            y,
+            z,
+            ts_mm if ts_mm is not None else math.nan,
+            ts_read,
+        )
+        offset += RECORD.size
+    return bytes(buf)
+
+
+def removed_record(bid: int) -> Record:
+    return (bid, TYPE_REMOVED, math.nan, math.nan, math.nan, None, math.nan)
+
+
+def parse_header(buf, offset: int = 0) -> Tuple[int, int, int, float]:
+    """
+    Validate and unpack a frame header. Returns (flags, count, seq, ts_pub).
+    """
+    magic, version, flags, count, seq, ts_pub = HEADER.unpack_from(buf, offset)
+    if magic != MAGIC:
+        raise ValueError(f"bad frame magic {magic!r}")
+    if version != WIRE_VERSION:
+        raise ValueError(f"unsupported wire version {version}")
+    return flags, count, seq, ts_pub
+
+
+def frame_size(count: int) -> int:
+    return HEADER.size + RECORD.size * count
+
+
+def decode_frame(buf, offset: int = 0) -> Tuple[Optional[Frame], int]:
+    """
+    Reference decoder. Returns (frame, bytes consumed), or (None, 0) if
+    `buf` does not yet hold a complete frame.
+    """
+    if len(buf) - offset < HEADER.size:
+        return None, 0
+    flags, count, seq, ts_pub = parse_header(buf, offset)
+    size = frame_size(count)
+    if len(buf) - offset < size:
+        return None, 0
+
+    records = []
+    for bid, code, x, y, z, ts_mm, ts_read in RECORD.iter_unpack(
+        memoryview(buf)[offset + HEADER.size : offset + size]
+    ):
+        records.append(
+            (bid, TYPE_NAMES.get(code, "unknown"), x, y, z, None if math.isnan(ts_mm) else ts_mm, ts_read)
+        )
+    return Frame(seq, flags, ts_pub, records), size
+
+
+def decode_records_array(buf, offset: int = 0):
+    """
+    Zero-copy NumPy view of a complete frame's records (RECORD_DTYPE).
+    Returns (frame header tuple, records array).
+    """
+    if np is None:
+        raise RuntimeError("decode_records_array requires NumPy")
+    flags, count, seq, ts_pub = parse_header(buf, offset)
+    records = np.frombuffer(buf, dtype=RECORD_DTYPE, count=count, offset=offset + HEADER.size)
+    return (flags, count, seq, ts_pub), records
+
+
+def frame_to_payload(frame: Frame) -> dict:
+    """
+    Convert a decoded frame back to the JSON payload shape.
+    """
+    return {
+        "ts_pub": frame.ts_pub,
+        "beacons": [
+            {
+                "type": btype,
+                "id": bid,
+                "pos": {"x": x, "y": y, "z": z},
+                "ts_mm": ts_mm,
+                "ts_read": ts_read,
+            }
+            for bid, btype, x, y, z, ts_mm, ts_read in frame.records
+        ],
+    }
+
+
+class FrameReader:
+    """
+    Incremental decoder for a binary stream: feed() received bytes and
+    get back the frames it completed.
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+
+    def feed(self, data: bytes) -> List[Frame]:
+        self._buf += data
+        frames = []
+        pos = 0
+        while True:
+            frame, used = decode_frame(self._buf, pos)
+            if frame is None:
+                break
+            pos += used
+            frames.append(frame)
+        if pos:
+            del self._buf[:pos]
+        return frames
+
+
+class DeltaState:
+    """
+    Client-side reconstruction of the full beacon set from keyframes and
+    deltas. apply() returns False when a frame is missing or no keyframe has
+    been seen yet; the client should then send resync_line() and keep
+    feeding frames until the next keyframe.
+    """
+
+    def __init__(self):
+        self.beacons: Dict[int, Record] = {}
+        self.seq: Optional[int] = None
+        self.gaps = 0
+
+    def apply(self, frame: Frame) -> bool:
+        if frame.is_keyframe:
+            self.beacons = {r[0]: r for r in frame.records}
+            self.seq = frame.seq
+            return True
+
+        if not frame.is_delta:
+            # Plain (non-delta) frame: always a complete snapshot
+            self.beacons = {r[0]: r for r in frame.records}
+            self.seq = None
+            return True
+
+        if self.seq is None or frame.seq != (self.seq + 1) & 0xFFFFFFFF:
+            if self.seq is not None:
+                self.gaps += 1
+            self.seq = None
+            return False
+
+        for r in frame.records:
+            if r[1] == TYPE_REMOVED:
+                self.beacons.pop(r[0], None)
+            else:
+                self.beacons[r[0]] = r
+        self.seq = frame.seq
+        return True
+
+
+def payload_to_frame(payload: dict) -> Frame:
+    """
+    Convert a JSON payload (plain, keyframe or delta) to a Frame, so JSON
+    clients can use DeltaState too.
+    """
+    kind = payload.get("kind")
+    flags = FLAG_KEYFRAME if kind == "key" else FLAG_DELTA if kind == "delta" else 0
+    records = [
+        (b["id"], b["type"], b["pos"]["x"], b["pos"]["y"], b["pos"]["z"], b.get("ts_mm"), b.get("ts_read"))
+        for b in payload.get("beacons", [])
+    ]
+    records.extend(removed_record(bid) for bid in payload.get("removed", []))
+    return Frame(payload.get("seq", 0), flags, payload.get("ts_pub", 0.0), records)
+
+
+def parse_handshake(line: bytes) -> Optional[dict]:
+    """
+    Parse one client handshake line. Returns the options dict, or None if
+    the line is not a valid handshake.
+    """
+    try:
+        options = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(options, dict):
+        return None
+    if "encoding" in options and options["encoding"] not in ENCODINGS:
+        return None
+    return options
+
+
+def handshake_line(encoding: str = ENCODING_BINARY, **options) -> bytes:
+    """
+    Build the handshake line a client sends to pick its encoding and
+    options (e.g. delta=True).
+    """
+    return json.dumps(dict(options, encoding=encoding)).encode() + b"\n"
+
+
+def resync_line() -> bytes:
+    """
+    Line a delta-mode client sends after a sequence gap to request a keyframe.
+    """
+    return b'{"resync": true}\n'